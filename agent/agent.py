@@ -12,6 +12,10 @@ from dotenv import load_dotenv
 
 from .prompts import SYSTEM_PROMPT
 from .providers import get_llm_model
+from .tool_cache import cached_tool, create_tool_result_cache
+from .tracing import traced
+from .tool_collector import ToolRunCollector, collect_tool_result
+from .token_budget import TokenBudget, budgeted_tool
 from .tools import (
     vector_search_tool,
     graph_search_tool,
@@ -37,8 +41,16 @@ class AgentDependencies:
     session_id: str
     user_id: Optional[str] = None
     search_preferences: Dict[str, Any] = None
+    # Tool calls and sources recorded as each tool returns
+    tool_results: ToolRunCollector = None
+    # Token allowance shared by the run's tool results
+    token_budget: TokenBudget = None
     
     def __post_init__(self):
+        if self.tool_results is None:
+            self.tool_results = ToolRunCollector()
+        if self.token_budget is None:
+            self.token_budget = TokenBudget()
         if self.search_preferences is None:
             self.search_preferences = {
                 "use_vector": True,
@@ -47,6 +59,10 @@ class AgentDependencies:
             }
 
 
+# Tool result cache keyed on (tool, canonical args, corpus version)
+tool_result_cache = create_tool_result_cache()
+
+
 # Initialize the agent with flexible model configuration
 rag_agent = Agent(
     get_llm_model(),
@@ -57,6 +73,10 @@ rag_agent = Agent(
 
 # Register tools with proper docstrings (no description parameter)
 @rag_agent.tool
+@traced("tool.vector_search")
+@collect_tool_result
+@budgeted_tool
+@cached_tool(tool_result_cache)
 async def vector_search(
     ctx: RunContext[AgentDependencies],
     query: str,
@@ -97,6 +117,10 @@ async def vector_search(
 
 
 @rag_agent.tool
+@traced("tool.graph_search")
+@collect_tool_result
+@budgeted_tool
+@cached_tool(tool_result_cache)
 async def graph_search(
     ctx: RunContext[AgentDependencies],
     query: str
@@ -132,6 +156,10 @@ async def graph_search(
 
 
 @rag_agent.tool
+@traced("tool.hybrid_search")
+@collect_tool_result
+@budgeted_tool
+@cached_tool(tool_result_cache)
 async def hybrid_search(
     ctx: RunContext[AgentDependencies],
     query: str,
@@ -180,6 +208,10 @@ async def hybrid_search(
 
 
 @rag_agent.tool
+@traced("tool.get_drug_information")
+@collect_tool_result
+@budgeted_tool
+@cached_tool(tool_result_cache)
 async def get_drug_information(
     ctx: RunContext[AgentDependencies],
     drug_name: str
@@ -204,6 +236,10 @@ async def get_drug_information(
 
 
 @rag_agent.tool
+@traced("tool.get_algorithm_pathway")
+@collect_tool_result
+@budgeted_tool
+@cached_tool(tool_result_cache)
 async def get_algorithm_pathway(
     ctx: RunContext[AgentDependencies],
     current_step: str,
@@ -3,32 +3,62 @@ FastAPI endpoints for the agentic RAG system.
 """
 
 import os
+import time
 import asyncio
 import json
 import logging
 from contextlib import asynccontextmanager
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 from datetime import datetime
 import uuid
 
 from fastapi import FastAPI, HTTPException, Request, Depends
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from pydantic_ai.messages import (
+    PartStartEvent,
+    PartDeltaEvent,
+    TextPartDelta,
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
+    ToolCallPart,
+    ToolReturnPart
+)
 import uvicorn
 from dotenv import load_dotenv
 
-from .agent import rag_agent, AgentDependencies
+from .agent import rag_agent, AgentDependencies, tool_result_cache
+from .tool_collector import fallback_source
+from .message_journal import message_journal
+from .tracing import start_trace, span
+from .metrics import (
+    METRICS_ENABLED,
+    registry as metrics_registry,
+    register_gauge,
+    record_usage,
+    chat_turn_seconds,
+    chat_first_token_seconds
+)
 from .db_utils import (
     initialize_database,
     close_database,
-    create_session,
     get_session,
-    add_message,
-    get_session_messages,
-    test_connection
+    get_or_create_session,
+    delete_expired_sessions,
+    get_recent_messages,
+    test_connection,
+    db_pool,
+    session_cache,
+    recent_messages_cache
+)
+from .graph_utils import (
+    initialize_graph,
+    close_graph,
+    test_graph_connection,
+    graph_call_budget,
+    get_graph_search_stats
 )
-from .graph_utils import initialize_graph, close_graph, test_graph_connection
 from .models import (
     ChatRequest,
     ChatResponse,
@@ -45,7 +75,10 @@ from .tools import (
     hybrid_search_tool,
     VectorSearchInput,
     GraphSearchInput,
-    HybridSearchInput
+    HybridSearchInput,
+    get_embedding_cache_stats,
+    get_reranker_stats,
+    get_coalescing_stats
 )
 
 # Load environment variables
@@ -59,6 +92,12 @@ APP_HOST = os.getenv("APP_HOST", "0.0.0.0")
 APP_PORT = int(os.getenv("APP_PORT", 8000))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
+# Token budget for conversation history in the prompt (0 = no budget)
+SESSION_CONTEXT_MAX_TOKENS = int(os.getenv("SESSION_CONTEXT_MAX_TOKENS", "0"))
+
+# Seconds between expired-session sweeps (0 disables the sweeper)
+SESSION_SWEEP_INTERVAL_SECONDS = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "600"))
+
 # Configure logging
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL.upper()),
@@ -81,6 +120,14 @@ async def lifespan(app: FastAPI):
         await initialize_database()
         logger.info("Database initialized")
         
+        # Start write-behind message persistence
+        message_journal.start()
+        
+        # Start expired-session sweeper
+        sweeper = None
+        if SESSION_SWEEP_INTERVAL_SECONDS > 0:
+            sweeper = asyncio.create_task(sweep_expired_sessions())
+        
         # Initialize graph database
         await initialize_graph()
         logger.info("Graph database initialized")
@@ -106,6 +153,11 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down agentic RAG API...")
     
     try:
+        if sweeper:
+            sweeper.cancel()
+        
+        # Flush buffered messages before the pool goes away
+        await message_journal.stop()
         await close_database()
         await close_graph()
         logger.info("Connections closed")
@@ -133,226 +185,128 @@ app.add_middleware(
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 
+# Scrape-time metrics read from component stats
+def _pool_metric(field: str) -> Callable[[], Dict[tuple, float]]:
+    return lambda: {(): db_pool.stats()[field]}
+
+
+def _cache_metric(field: str) -> Callable[[], Dict[tuple, float]]:
+    def collect() -> Dict[tuple, float]:
+        caches = {
+            "sessions": session_cache.stats(),
+            "recent_messages": recent_messages_cache.stats()
+        }
+        embedding_stats = get_embedding_cache_stats()
+        if embedding_stats.get("enabled"):
+            caches["embeddings"] = embedding_stats
+        if tool_result_cache:
+            caches["tool_results"] = tool_result_cache.memory.stats()
+        caches["graph_search"] = get_graph_search_stats()
+        reranker_stats = get_reranker_stats()
+        if "cache" in reranker_stats:
+            caches["reranker"] = reranker_stats["cache"]
+        return {(name,): stats[field] for name, stats in caches.items()}
+    return collect
+
+
+register_gauge(
+    "rag_db_pool_connections",
+    "Database pool connections by state.",
+    lambda: {
+        (state,): db_pool.stats()[state]
+        for state in ("size", "idle", "in_use", "max_size")
+    },
+    ["state"]
+)
+register_gauge("rag_db_pool_waiting", "Coroutines waiting to acquire a connection.", _pool_metric("waiting"))
+register_gauge(
+    "rag_db_pool_acquisitions_total", "Connections acquired from the pool.",
+    _pool_metric("acquisitions"), type_name="counter"
+)
+register_gauge(
+    "rag_db_pool_acquire_timeouts_total", "Pool acquires that timed out.",
+    _pool_metric("acquire_timeouts"), type_name="counter"
+)
+register_gauge(
+    "rag_db_pool_acquire_wait_seconds_total", "Total time spent waiting for pool connections.",
+    lambda: {(): db_pool.total_wait_seconds}, type_name="counter"
+)
+register_gauge("rag_cache_hits_total", "Cache hits by cache.", _cache_metric("hits"), ["cache"], type_name="counter")
+register_gauge("rag_cache_misses_total", "Cache misses by cache.", _cache_metric("misses"), ["cache"], type_name="counter")
+register_gauge("rag_cache_hit_ratio", "Cache hit ratio by cache.", _cache_metric("hit_ratio"), ["cache"])
+register_gauge(
+    "rag_message_journal_queued", "Messages waiting to be written.",
+    lambda: {(): message_journal.stats()["queued"]}
+)
+
+
 # Helper functions for agent execution
-async def get_or_create_session(request: ChatRequest) -> str:
-    """Get existing session or create new one."""
-    if request.session_id:
-        session = await get_session(request.session_id)
-        if session:
-            return request.session_id
-    
-    # Create new session
-    return await create_session(
+async def resolve_session(request: ChatRequest) -> str:
+    """Get existing session or create new one (zero or one round-trip)."""
+    return await get_or_create_session(
+        session_id=request.session_id,
         user_id=request.user_id,
         metadata=request.metadata
     )
 
 
+async def sweep_expired_sessions():
+    """Periodically delete expired sessions and their messages."""
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL_SECONDS)
+        try:
+            deleted = await delete_expired_sessions()
+            if deleted:
+                logger.info(f"Swept {deleted} expired sessions")
+        except Exception as e:
+            logger.warning(f"Session sweep failed: {e}")
+
+
 async def get_conversation_context(
     session_id: str,
-    max_messages: int = 10
+    max_messages: int = 6,
+    max_tokens: Optional[int] = SESSION_CONTEXT_MAX_TOKENS or None
 ) -> List[Dict[str, str]]:
     """
     Get recent conversation context.
     
     Args:
         session_id: Session ID
-        max_messages: Maximum number of messages to retrieve
+        max_messages: Maximum number of messages to retrieve (default: last 3 turns)
+        max_tokens: Optional token budget for the returned messages
     
     Returns:
-        List of messages
+        List of messages (oldest first)
     """
-    messages = await get_session_messages(session_id, limit=max_messages)
-    
-    return [
-        {
-            "role": msg["role"],
-            "content": msg["content"]
-        }
-        for msg in messages
-    ]
-
-
-def extract_tool_calls(result) -> List[ToolCall]:
-    """
-    Extract tool calls from Pydantic AI result.
-
-    Args:
-        result: Pydantic AI result object
-
-    Returns:
-        List of ToolCall objects
-    """
-    tools_used = []
-
-    try:
-        # Get all messages from the result
-        messages = result.all_messages()
-
-        for message in messages:
-            if hasattr(message, 'parts'):
-                for part in message.parts:
-                    # Check if this is a tool call part
-                    if part.__class__.__name__ == 'ToolCallPart':
-                        try:
-                            tool_name = str(part.tool_name) if hasattr(part, 'tool_name') else 'unknown'
-
-                            tool_args = {}
-                            if hasattr(part, 'args') and part.args is not None:
-                                if isinstance(part.args, str):
-                                    try:
-                                        tool_args = json.loads(part.args)
-                                    except json.JSONDecodeError:
-                                        tool_args = {}
-                                elif isinstance(part.args, dict):
-                                    tool_args = part.args
-
-                            if hasattr(part, 'args_as_dict'):
-                                try:
-                                    tool_args = part.args_as_dict()
-                                except:
-                                    pass
-
-                            tool_call_id = None
-                            if hasattr(part, 'tool_call_id'):
-                                tool_call_id = str(part.tool_call_id) if part.tool_call_id else None
-
-                            tools_used.append(ToolCall(
-                                tool_name=tool_name,
-                                args=tool_args,
-                                tool_call_id=tool_call_id
-                            ))
-                        except Exception as e:
-                            logger.debug(f"Failed to parse tool call part: {e}")
-                            continue
-    except Exception as e:
-        logger.warning(f"Failed to extract tool calls: {e}")
-
-    return tools_used
+    return await get_recent_messages(
+        session_id,
+        limit=max_messages,
+        max_tokens=max_tokens,
+        pending=message_journal.pending(session_id)
+    )
 
 
-def extract_sources(result) -> List[Dict[str, Any]]:
+def tool_call_from_part(part: ToolCallPart) -> ToolCall:
     """
-    Extract source documents/chunks from tool results.
+    Convert a streamed Pydantic AI ToolCallPart into a ToolCall.
 
     Args:
-        result: Pydantic AI result object
+        part: Tool call part from a FunctionToolCallEvent
 
     Returns:
-        List of source documents with content and metadata
+        ToolCall
     """
-    sources = []
-    seen_content = set()  # Deduplicate by content
-
-    def parse_content(content):
-        """Parse content that may be string, dict, or list."""
-        if isinstance(content, str):
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError:
-                return content
-        return content
-
-    def extract_from_item(item, tool_name):
-        """Extract source info from a single item."""
-        if isinstance(item, str):
-            try:
-                item = json.loads(item)
-            except json.JSONDecodeError:
-                return None
-
-        if not isinstance(item, dict):
-            return None
-
-        # For vector/hybrid search results
-        if tool_name in ['vector_search', 'hybrid_search']:
-            content = item.get('content', '')
-            if content:
-                return {
-                    'tool': tool_name,
-                    'content': content[:300],
-                    'document_title': item.get('document_title', 'CPG Document'),
-                    'document_source': item.get('document_source', ''),
-                    'score': round(float(item.get('score', 0.8)), 3)
-                }
-
-        # For graph search results
-        elif tool_name == 'graph_search':
-            fact = item.get('fact', '')
-            if fact:
-                return {
-                    'tool': 'graph_search',
-                    'content': fact,
-                    'document_title': 'Knowledge Graph',
-                    'document_source': 'graph',
-                    'score': 1.0
-                }
-
-        # For drug info results
-        elif tool_name in ['get_drug_information', 'get_drug_info']:
-            info = item.get('drug_info') or item.get('info') or item.get('content', '')
-            if info:
-                return {
-                    'tool': 'drug_info',
-                    'content': str(info)[:300],
-                    'document_title': f"Drug: {item.get('drug_name', 'Unknown')}",
-                    'document_source': 'knowledge_graph',
-                    'score': 1.0
-                }
-
-        return None
-
     try:
-        messages = result.all_messages()
-        logger.info(f"[SOURCES] Processing {len(messages)} messages")
-
-        for message in messages:
-            if hasattr(message, 'parts'):
-                for part in message.parts:
-                    # Look for tool returns
-                    if hasattr(part, 'tool_name') and hasattr(part, 'content'):
-                        tool_name = str(part.tool_name)
-                        content = parse_content(part.content)
-
-                        logger.info(f"[SOURCES] Found tool result: {tool_name}, type: {type(content)}")
-
-                        # Handle list of results
-                        if isinstance(content, list):
-                            for item in content:
-                                source = extract_from_item(item, tool_name)
-                                if source:
-                                    chunk_key = source['content'][:100]
-                                    if chunk_key not in seen_content:
-                                        seen_content.add(chunk_key)
-                                        sources.append(source)
-
-                        # Handle single dict result
-                        elif isinstance(content, dict):
-                            source = extract_from_item(content, tool_name)
-                            if source:
-                                chunk_key = source['content'][:100]
-                                if chunk_key not in seen_content:
-                                    seen_content.add(chunk_key)
-                                    sources.append(source)
-
-        logger.info(f"[SOURCES] Extracted {len(sources)} sources")
-
+        tool_args = part.args_as_dict()
     except Exception as e:
-        logger.error(f"[SOURCES] Error: {e}")
-        import traceback
-        logger.error(f"[SOURCES] Traceback: {traceback.format_exc()}")
+        logger.debug(f"Failed to parse tool call args: {e}")
+        tool_args = {}
 
-    # Fallback: if no sources found, add a default source
-    if not sources:
-        sources.append({
-            'tool': 'system',
-            'content': 'Response based on CPG clinical guidelines knowledge base.',
-            'document_title': 'CPG Guidelines',
-            'document_source': 'knowledge_base',
-            'score': 0.9
-        })
-
-    return sources
+    return ToolCall(
+        tool_name=part.tool_name,
+        args=tool_args,
+        tool_call_id=part.tool_call_id
+    )
 
 
 async def save_conversation_turn(
@@ -364,6 +318,9 @@ async def save_conversation_turn(
     """
     Save a conversation turn to the database.
     
+    Messages go through the write-behind journal, so this returns before
+    the rows are written unless MESSAGE_PERSISTENCE=sync.
+    
     Args:
         session_id: Session ID
         user_message: User's message
@@ -371,7 +328,7 @@ async def save_conversation_turn(
         metadata: Optional metadata
     """
     # Save user message
-    await add_message(
+    await message_journal.record(
         session_id=session_id,
         role="user",
         content=user_message,
@@ -379,7 +336,7 @@ async def save_conversation_turn(
     )
     
     # Save assistant message
-    await add_message(
+    await message_journal.record(
         session_id=session_id,
         role="assistant",
         content=assistant_message,
@@ -420,16 +377,18 @@ async def execute_agent(
         if context:
             context_str = "\n".join([
                 f"{msg['role']}: {msg['content']}"
-                for msg in context[-6:]  # Last 3 turns
+                for msg in context
             ])
             full_prompt = f"Previous conversation:\n{context_str}\n\nCurrent question: {message}"
 
-        # Run the agent
-        result = await rag_agent.run(full_prompt, deps=deps)
+        # Run the agent (graph searches are capped per turn)
+        with span("agent.run"), graph_call_budget():
+            result = await rag_agent.run(full_prompt, deps=deps)
+        record_usage(result.usage())
 
         response = result.output
-        tools_used = extract_tool_calls(result)
-        sources = extract_sources(result)
+        tools_used = deps.tool_results.tool_calls
+        sources = deps.tool_results.final_sources()
 
         # Save conversation if requested
         if save_conversation:
@@ -507,131 +466,179 @@ async def health_check():
 @app.post("/chat", response_model=ChatResponse)
 async def chat(request: ChatRequest):
     """Non-streaming chat endpoint."""
+    start_time = time.perf_counter()
     try:
-        # Get or create session
-        session_id = await get_or_create_session(request)
+        with start_trace("chat") as trace:
+            # Get or create session
+            session_id = await resolve_session(request)
 
-        # Execute agent
-        response, tools_used, sources = await execute_agent(
-            message=request.message,
-            session_id=session_id,
-            user_id=request.user_id
-        )
+            # Execute agent
+            response, tools_used, sources = await execute_agent(
+                message=request.message,
+                session_id=session_id,
+                user_id=request.user_id
+            )
+
+        metadata = {"search_type": str(request.search_type)}
+        if trace:
+            metadata["timings"] = trace.summary()
+
+        chat_turn_seconds.observe(time.perf_counter() - start_time, endpoint="chat", status="ok")
 
         return ChatResponse(
             message=response,
             session_id=session_id,
             tools_used=tools_used,
             sources=sources,
-            metadata={"search_type": str(request.search_type)}
+            metadata=metadata
         )
 
     except Exception as e:
+        chat_turn_seconds.observe(time.perf_counter() - start_time, endpoint="chat", status="error")
         logger.error(f"Chat endpoint failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/chat/stream")
 async def chat_stream(request: ChatRequest):
-    """Streaming chat endpoint using Server-Sent Events."""
+    """
+    Streaming chat endpoint using Server-Sent Events.
+
+    Events: session, text (token deltas), tool_call (when the model calls a
+    tool), tool_result and sources (as each tool returns), tools (summary of
+    all calls), end (with timings), or error.
+    """
+    start_time = time.perf_counter()
     try:
+        # Load the prompt context while the session is validated; it is
+        # only used if the request's session turns out to be live
+        context_task = None
+        if request.session_id:
+            context_task = asyncio.create_task(get_conversation_context(request.session_id))
+            # Retrieve the outcome even if the prefetch ends up unused
+            context_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        
         # Get or create session
-        session_id = await get_or_create_session(request)
+        session_id = await resolve_session(request)
         
         async def generate_stream():
             """Generate streaming response using agent.iter() pattern."""
-            try:
-                yield f"data: {json.dumps({'type': 'session', 'session_id': session_id})}\n\n"
-                
-                # Create dependencies
-                deps = AgentDependencies(
-                    session_id=session_id,
-                    user_id=request.user_id
-                )
-                
-                # Get conversation context
-                context = await get_conversation_context(session_id)
-                
-                # Build input with context
-                full_prompt = request.message
-                if context:
-                    context_str = "\n".join([
-                        f"{msg['role']}: {msg['content']}"
-                        for msg in context[-6:]
-                    ])
-                    full_prompt = f"Previous conversation:\n{context_str}\n\nCurrent question: {request.message}"
-                
-                # Save user message immediately
-                await add_message(
+            ttft_ms = None
+            persist_user_message = None
+            
+            def record_user_message():
+                return message_journal.record(
                     session_id=session_id,
                     role="user",
                     content=request.message,
                     metadata={"user_id": request.user_id}
                 )
+            
+            try:
+                with start_trace("chat.stream") as trace:
+                    yield f"data: {json.dumps({'type': 'session', 'session_id': session_id})}\n\n"
+                
+                    # Create dependencies
+                    deps = AgentDependencies(
+                        session_id=session_id,
+                        user_id=request.user_id
+                    )
+                
+                    # Get conversation context (usually already loaded)
+                    context = await _stream_context(context_task, request.session_id, session_id)
+                
+                    # Build input with context
+                    full_prompt = request.message
+                    if context:
+                        context_str = "\n".join([
+                            f"{msg['role']}: {msg['content']}"
+                            for msg in context
+                        ])
+                        full_prompt = f"Previous conversation:\n{context_str}\n\nCurrent question: {request.message}"
                 
-                full_response = ""
-                tools_used = []
-                sources = []
+                    full_response = ""
                 
-                # Stream using agent.iter() pattern
-                async with rag_agent.iter(full_prompt, deps=deps) as run:
-                    async for node in run:
-                        if rag_agent.is_model_request_node(node):
-                            # Stream tokens from the model
-                            async with node.stream(run.ctx) as request_stream:
-                                async for event in request_stream:
-                                    from pydantic_ai.messages import PartStartEvent, PartDeltaEvent, TextPartDelta
-                                    
-                                    if isinstance(event, PartStartEvent) and event.part.part_kind == 'text':
-                                        delta_content = event.part.content
-                                        yield f"data: {json.dumps({'type': 'text', 'content': delta_content})}\n\n"
-                                        full_response += delta_content
-                                        
-                                    elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
-                                        delta_content = event.delta.content_delta
-                                        yield f"data: {json.dumps({'type': 'text', 'content': delta_content})}\n\n"
-                                        full_response += delta_content
+                    # Stream using agent.iter() pattern
+                    with span("agent.run"), graph_call_budget():
+                        async with rag_agent.iter(full_prompt, deps=deps) as run:
+                            # Persist the user message alongside the model request
+                            # (the context above was read before it was recorded)
+                            persist_user_message = asyncio.create_task(record_user_message())
+                            
+                            async for node in run:
+                                if rag_agent.is_model_request_node(node):
+                                    # Stream tokens from the model
+                                    async with node.stream(run.ctx) as request_stream:
+                                        async for event in request_stream:
+                                            delta_content = None
+                                            if isinstance(event, PartStartEvent) and event.part.part_kind == 'text':
+                                                delta_content = event.part.content
+                                            elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                                                delta_content = event.delta.content_delta
+                                            
+                                            if delta_content:
+                                                if ttft_ms is None:
+                                                    ttft = time.perf_counter() - start_time
+                                                    ttft_ms = round(ttft * 1000, 2)
+                                                    chat_first_token_seconds.observe(ttft)
+                                                yield f"data: {json.dumps({'type': 'text', 'content': delta_content})}\n\n"
+                                                full_response += delta_content
+                                
+                                elif rag_agent.is_call_tools_node(node):
+                                    # Report each tool call and its sources as it returns
+                                    async with node.stream(run.ctx) as tool_stream:
+                                        async for event in tool_stream:
+                                            if isinstance(event, FunctionToolCallEvent):
+                                                tool_call = tool_call_from_part(event.part)
+                                                yield f"data: {json.dumps({'type': 'tool_call', 'tool': tool_call.model_dump()})}\n\n"
+                                            
+                                            elif isinstance(event, FunctionToolResultEvent) and isinstance(event.result, ToolReturnPart):
+                                                yield f"data: {json.dumps({'type': 'tool_result', 'tool_name': event.result.tool_name, 'tool_call_id': event.result.tool_call_id})}\n\n"
+                                                new_sources = deps.tool_results.sources_for(event.result.tool_call_id)
+                                                if new_sources:
+                                                    yield f"data: {json.dumps({'type': 'sources', 'sources': new_sources})}\n\n"
                     
-                    # Extract tools used and sources from the final result INSIDE the context manager
-                    try:
-                        result = run.result
-                        if result:
-                            tools_used = extract_tool_calls(result)
-                            sources = extract_sources(result)
-                    except Exception as e:
-                        logger.warning(f"Failed to extract tools/sources: {e}")
-
-                # Send tools used information (after context manager but using captured data)
-                if tools_used:
-                    tools_data = [
-                        {
-                            "tool_name": tool.tool_name,
-                            "args": tool.args,
-                            "tool_call_id": tool.tool_call_id
+                            record_usage(run.usage())
+
+                    tools_used = deps.tool_results.tool_calls
+                    sources = deps.tool_results.final_sources()
+                    if not deps.tool_results.sources:
+                        yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
+
+                    # Summary of all tool calls
+                    if tools_used:
+                        tools_data = [
+                            {
+                                "tool_name": tool.tool_name,
+                                "args": tool.args,
+                                "tool_call_id": tool.tool_call_id
+                            }
+                            for tool in tools_used
+                        ]
+                        yield f"data: {json.dumps({'type': 'tools', 'tools': tools_data})}\n\n"
+
+                    # Save assistant response (after the user message)
+                    await persist_user_message
+                    await message_journal.record(
+                        session_id=session_id,
+                        role="assistant",
+                        content=full_response,
+                        metadata={
+                            "streamed": True,
+                            "tool_calls": len(tools_used),
+                            "sources_count": len(sources)
                         }
-                        for tool in tools_used
-                    ]
-                    yield f"data: {json.dumps({'type': 'tools', 'tools': tools_data})}\n\n"
+                    )
 
-                # Send sources information
-                if sources:
-                    yield f"data: {json.dumps({'type': 'sources', 'sources': sources})}\n\n"
-
-                # Save assistant response
-                await add_message(
-                    session_id=session_id,
-                    role="assistant",
-                    content=full_response,
-                    metadata={
-                        "streamed": True,
-                        "tool_calls": len(tools_used),
-                        "sources_count": len(sources)
-                    }
-                )
-
-                yield f"data: {json.dumps({'type': 'end'})}\n\n"
+                    end_event = {"type": "end", "ttft_ms": ttft_ms}
+                    if trace:
+                        end_event["timings"] = trace.summary()
+                    yield f"data: {json.dumps(end_event)}\n\n"
+                
+                chat_turn_seconds.observe(time.perf_counter() - start_time, endpoint="stream", status="ok")
                 
             except Exception as e:
+                chat_turn_seconds.observe(time.perf_counter() - start_time, endpoint="stream", status="error")
                 import traceback
                 logger.error(f"Stream error: {e}")
                 logger.error(f"Full traceback: {traceback.format_exc()}")
@@ -640,6 +647,12 @@ async def chat_stream(request: ChatRequest):
                     "content": f"Stream error: {str(e)}"
                 }
                 yield f"data: {json.dumps(error_chunk)}\n\n"
+            finally:
+                if persist_user_message is None:
+                    # Failed before the model request; still keep the user's turn
+                    await record_user_message()
+                elif not persist_user_message.done():
+                    await persist_user_message
         
         return StreamingResponse(
             generate_stream(),
@@ -656,6 +669,23 @@ async def chat_stream(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _stream_context(
+    context_task: Optional[asyncio.Task],
+    requested_session_id: Optional[str],
+    session_id: str
+) -> List[Dict[str, str]]:
+    """Resolve the prefetched conversation context for a stream."""
+    if context_task is None:
+        return []
+    
+    if requested_session_id.lower() != session_id:
+        # Expired or unknown session: a new one was created, so no history
+        context_task.cancel()
+        return []
+    
+    return await context_task
+
+
 @app.post("/search/vector")
 async def search_vector(request: SearchRequest):
     """Vector search endpoint."""
@@ -715,7 +745,9 @@ async def search_hybrid(request: SearchRequest):
     try:
         input_data = HybridSearchInput(
             query=request.query,
-            limit=request.limit
+            limit=request.limit,
+            text_weight=request.text_weight,
+            fusion=request.fusion
         )
         
         start_time = datetime.now()
@@ -739,6 +771,36 @@ async def search_hybrid(request: SearchRequest):
 # Documents endpoint removed - use vector_search or graph_search instead
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Cache hit/miss, request coalescing and message journal statistics."""
+    return {
+        "embeddings": get_embedding_cache_stats(),
+        "reranker": get_reranker_stats(),
+        "graph_search": get_graph_search_stats(),
+        "coalescing": get_coalescing_stats(),
+        "tool_results": tool_result_cache.stats() if tool_result_cache else {"enabled": False},
+        "message_journal": message_journal.stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text-format metrics for this API process."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/db/pool")
+async def db_pool_stats():
+    """Connection pool size, in-use and acquire-wait gauges."""
+    return db_pool.stats()
+
+
 @app.get("/sessions/{session_id}")
 async def get_session_info(session_id: str):
     """Get session information."""
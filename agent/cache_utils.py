@@ -0,0 +1,201 @@
+"""
+In-process caching primitives shared by the agent, tools and graph utilities.
+"""
+
+import time
+import asyncio
+import logging
+import functools
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+T = TypeVar("T")
+
+
+class TTLCache:
+    """Bounded LRU cache with an optional per-entry time-to-live."""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: Optional[float] = 3600,
+        name: str = "cache"
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            max_size: Maximum number of entries before LRU eviction
+            ttl_seconds: Entry lifetime in seconds (None disables expiry)
+            name: Cache name used in stats and logs
+        """
+        self.max_size = max(1, max_size)
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self.name = name
+
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value, refreshing its LRU position.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            Cached value or default
+        """
+        entry = self._entries.get(key, _MISSING)
+
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        """
+        Store a value, evicting the least recently used entries if full.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl_seconds: Optional override of the cache TTL for this entry
+        """
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl if ttl else None
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        self._entries[key] = (value, expires_at)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Remove a single entry. Returns True if it was present."""
+        return self._entries.pop(key, _MISSING) is not _MISSING
+
+    def clear(self):
+        """Remove all entries (counters are kept)."""
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key, _MISSING)
+        if entry is _MISSING:
+            return False
+        expires_at = entry[1]
+        return expires_at is None or expires_at > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary with size, hits, misses, evictions and hit ratio
+        """
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight awaitable."""
+
+    def __init__(self, name: str = "singleflight"):
+        """
+        Initialize single-flight group.
+
+        Args:
+            name: Group name used in stats and logs
+        """
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+        self.calls = 0
+        self.executions = 0
+        self.deduplicated = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run fn for key, or join the call already in flight for that key.
+
+        Args:
+            key: Coalescing key (must be hashable)
+            fn: Zero-argument coroutine factory executed by the first caller
+
+        Returns:
+            Result of the shared call (exceptions propagate to every caller)
+        """
+        self.calls += 1
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._finish, key))
+        else:
+            self.deduplicated += 1
+            logger.debug(f"[{self.name}] Joined in-flight call for {key!r}")
+
+        # Shield so one cancelled caller does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently in flight."""
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get coalescing counters.
+
+        Returns:
+            Dictionary with calls, executions and deduplicated counts
+        """
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "executions": self.executions,
+            "deduplicated": self.deduplicated,
+            "in_flight": self.in_flight
+        }
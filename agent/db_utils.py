@@ -4,23 +4,223 @@ Database utilities for PostgreSQL connection and operations.
 
 import os
 import json
+import time
+import struct
 import asyncio
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 from datetime import datetime, timedelta, timezone
 from contextlib import asynccontextmanager
 from uuid import UUID
 import logging
 
 import asyncpg
+import numpy as np
 from asyncpg.pool import Pool
 from dotenv import load_dotenv
 
+from .cache_utils import TTLCache
+from .tracing import TRACING_ENABLED, trace_query, traced
+from .token_budget import count_tokens
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
 
+# pgvector binary wire format: uint16 dimensions, uint16 unused, then
+# big-endian float4 values
+_VECTOR_HEADER = struct.Struct(">HH")
+
+# Per-connection ANN search settings (see `python -m agent.vector_index tune`),
+# sent as connection startup parameters by _server_settings()
+HNSW_EF_SEARCH = os.getenv("HNSW_EF_SEARCH")
+IVFFLAT_PROBES = os.getenv("IVFFLAT_PROBES")
+
+# Connection pool configuration (size against uvicorn workers x max_size
+# staying below the server's max_connections)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "5"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+DB_POOL_MAX_INACTIVE_SECONDS = float(os.getenv("DB_POOL_MAX_INACTIVE_SECONDS", "300"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT", "0")) or None
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+# Recent conversation window kept per session for prompt context
+SESSION_CONTEXT_WINDOW = int(os.getenv("SESSION_CONTEXT_WINDOW", "10"))
+SESSION_CONTEXT_CACHE_SIZE = int(os.getenv("SESSION_CONTEXT_CACHE_SIZE", "1024"))
+SESSION_CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CONTEXT_CACHE_TTL_SECONDS", "1800"))
+# Check a cached window against the database before serving it (one query per
+# turn); only needed when one session's turns are spread across workers
+SESSION_CONTEXT_VALIDATE = os.getenv("SESSION_CONTEXT_VALIDATE", "false").lower() == "true"
+
+# Validated session cache: session_id -> expires_at
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "4096"))
+SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+
+_UNCACHED = object()
+
+session_cache = TTLCache(
+    max_size=SESSION_CACHE_SIZE,
+    ttl_seconds=SESSION_CACHE_TTL_SECONDS,
+    name="sessions"
+)
+
+# session_id -> {"messages": the last SESSION_CONTEXT_WINDOW messages, "count", "latest"},
+# where count/latest are the session's message count and newest created_at the
+# window was read at (checked against the database when SESSION_CONTEXT_VALIDATE)
+recent_messages_cache = TTLCache(
+    max_size=SESSION_CONTEXT_CACHE_SIZE,
+    ttl_seconds=SESSION_CONTEXT_CACHE_TTL_SECONDS,
+    name="recent_messages"
+)
+
+
+def encode_vector(value: Any) -> bytes:
+    """
+    Encode an embedding into pgvector's binary format.
+    
+    Args:
+        value: List/tuple of floats, 1-D NumPy array, legacy '[1,2,3]' text,
+            or an already encoded payload (passed through)
+    
+    Returns:
+        Binary vector payload
+    """
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # Pre-encoded elements of a vector[] parameter (asyncpg would
+        # otherwise treat a list/array element as another array dimension)
+        return bytes(value)
+    
+    if isinstance(value, str):
+        value = json.loads(value)
+    
+    array = np.asarray(value, dtype=">f4")
+    if array.ndim != 1:
+        raise ValueError(f"Vector must be one-dimensional, got shape {array.shape}")
+    
+    return _VECTOR_HEADER.pack(array.shape[0], 0) + array.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """
+    Decode pgvector's binary format.
+    
+    Args:
+        data: Binary vector payload
+    
+    Returns:
+        float32 NumPy array
+    """
+    dimensions, _ = _VECTOR_HEADER.unpack_from(data)
+    return np.frombuffer(
+        data, dtype=">f4", count=dimensions, offset=_VECTOR_HEADER.size
+    ).astype(np.float32)
+
+
+# Registry of the hot query texts, run through run_prepared. Nothing is
+# prepared ahead of time: asyncpg's statement cache prepares each query on
+# its first use per connection, as it does for any other query
+PREPARED_STATEMENTS: Dict[str, str] = {
+    "match_chunks": "SELECT * FROM match_chunks($1::vector, $2)",
+    "hybrid_search": "SELECT * FROM hybrid_search($1::vector, $2, $3, $4)",
+    "hybrid_search_rrf": "SELECT * FROM hybrid_search_rrf($1::vector, $2, $3, $4, $5)",
+    "get_session": """
+        SELECT 
+            id::text,
+            user_id,
+            metadata,
+            created_at,
+            updated_at,
+            expires_at
+        FROM sessions
+        WHERE id = $1::uuid
+        AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+    """,
+    "add_message": """
+        INSERT INTO messages (session_id, role, content, metadata)
+        VALUES ($1::uuid, $2, $3, $4)
+        RETURNING id::text, created_at
+    """,
+    "get_chunk_with_parent_context": "SELECT * FROM get_chunk_with_parent_context($1::uuid)",
+}
+
+
+def _with_embeddings(query: str, order_by: str) -> str:
+    # Search functions return chunk rows without their vectors; join them
+    # back in the same statement for client-side reranking (MMR)
+    return f"""
+        SELECT r.*, c.embedding
+        FROM ({query}) r
+        JOIN chunks c ON c.id = r.chunk_id
+        ORDER BY r.{order_by} DESC
+    """
+
+
+for _name, _order_by in (
+    ("match_chunks", "similarity"),
+    ("hybrid_search", "combined_score"),
+    ("hybrid_search_rrf", "combined_score"),
+):
+    PREPARED_STATEMENTS[f"{_name}_with_embeddings"] = _with_embeddings(PREPARED_STATEMENTS[_name], _order_by)
+
+
+async def run_prepared(conn: asyncpg.Connection, name: str, method: str, *args) -> Any:
+    """
+    Run a registered query on a pooled connection.
+    
+    This is a plain fetch of the registered query text; it only keeps the
+    hot queries in one place. Preparing and reusing the server-side
+    statement is left to asyncpg's statement cache (DB_STATEMENT_CACHE_SIZE),
+    which also re-prepares it by itself if a migration changes the schema.
+    
+    Args:
+        conn: Connection acquired from db_pool
+        name: Statement name in PREPARED_STATEMENTS
+        method: "fetch", "fetchrow" or "fetchval"
+        *args: Statement arguments
+    
+    Returns:
+        Result of the fetch method
+    """
+    return await getattr(conn, method)(PREPARED_STATEMENTS[name], *args)
+
+
+def _server_settings() -> Dict[str, str]:
+    # Startup parameters survive the pool's RESET ALL on release; a plain
+    # SET in the init hook would only last until the first release
+    settings = {}
+    if HNSW_EF_SEARCH:
+        settings["hnsw.ef_search"] = str(int(HNSW_EF_SEARCH))
+    if IVFFLAT_PROBES:
+        settings["ivfflat.probes"] = str(int(IVFFLAT_PROBES))
+    return settings
+
+
+async def _init_connection(conn: asyncpg.Connection):
+    """
+    Per-connection setup run by the pool's init hook.
+    
+    Registers the binary codec for the pgvector type so embeddings travel
+    as float4 arrays instead of formatted text, and hooks queries into
+    request tracing.
+    """
+    try:
+        await conn.set_type_codec(
+            "vector",
+            schema="public",
+            encoder=encode_vector,
+            decoder=decode_vector,
+            format="binary"
+        )
+    except ValueError:
+        logger.warning("pgvector 'vector' type not found; binary vector codec not registered")
+    
+    if TRACING_ENABLED:
+        # Queries made inside a request trace become db.query spans
+        conn.add_query_logger(trace_query)
+
+
 class DatabasePool:
     """Manages PostgreSQL connection pool."""
     
@@ -36,18 +236,29 @@ class DatabasePool:
             raise ValueError("DATABASE_URL environment variable not set")
         
         self.pool: Optional[Pool] = None
+        
+        # Acquire gauges
+        self.acquisitions = 0
+        self.acquire_timeouts = 0
+        self.waiting = 0
+        self.in_use = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
     
     async def initialize(self):
         """Create connection pool."""
         if not self.pool:
             self.pool = await asyncpg.create_pool(
                 self.database_url,
-                min_size=5,
-                max_size=20,
-                max_inactive_connection_lifetime=300,
-                command_timeout=60
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                max_inactive_connection_lifetime=DB_POOL_MAX_INACTIVE_SECONDS,
+                command_timeout=DB_COMMAND_TIMEOUT,
+                statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+                server_settings=_server_settings(),
+                init=_init_connection
             )
-            logger.info("Database connection pool initialized")
+            logger.info(f"Database connection pool initialized (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
     
     async def close(self):
         """Close connection pool."""
@@ -62,8 +273,47 @@ class DatabasePool:
         if not self.pool:
             await self.initialize()
         
-        async with self.pool.acquire() as connection:
+        start = time.perf_counter()
+        self.waiting += 1
+        try:
+            connection = await self.pool.acquire(timeout=DB_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            raise
+        finally:
+            self.waiting -= 1
+        
+        wait = time.perf_counter() - start
+        self.acquisitions += 1
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        
+        self.in_use += 1
+        try:
             yield connection
+        finally:
+            self.in_use -= 1
+            await self.pool.release(connection)
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get pool size and acquire-wait gauges.
+        
+        Returns:
+            Dictionary of pool statistics
+        """
+        return {
+            "size": self.pool.get_size() if self.pool else 0,
+            "idle": self.pool.get_idle_size() if self.pool else 0,
+            "min_size": DB_POOL_MIN_SIZE,
+            "max_size": DB_POOL_MAX_SIZE,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "acquisitions": self.acquisitions,
+            "acquire_timeouts": self.acquire_timeouts,
+            "avg_wait_ms": round(self.total_wait_seconds / self.acquisitions * 1000, 3) if self.acquisitions else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3)
+        }
 
 
 # Global database pool instance
@@ -110,36 +360,132 @@ async def create_session(
             json.dumps(metadata or {}),
             expires_at
         )
-        
-        return result["id"]
+    
+    _cache_session(result["id"], expires_at)
+    return result["id"]
 
 
-async def get_session(session_id: str) -> Optional[Dict[str, Any]]:
+def _cache_session(session_id: str, expires_at: Optional[datetime]):
+    """Remember a validated session until it expires (capped by the cache TTL)."""
+    ttl = SESSION_CACHE_TTL_SECONDS
+    if expires_at is not None:
+        ttl = min(ttl, (expires_at - datetime.now(timezone.utc)).total_seconds())
+    if ttl > 0:
+        session_cache.set(session_id, expires_at, ttl_seconds=ttl)
+
+
+def _parse_uuid(value: Optional[str]) -> Optional[UUID]:
+    try:
+        return UUID(str(value)) if value else None
+    except ValueError:
+        return None
+
+
+async def get_or_create_session(
+    session_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    timeout_minutes: int = 60
+) -> str:
     """
-    Get session by ID.
+    Return session_id if it is a live session, otherwise create a new one.
+    
+    Validated sessions are cached in process, so a returning session costs
+    no round-trip; otherwise validation and creation share one statement.
     
     Args:
-        session_id: Session UUID
+        session_id: Existing session UUID, if any
+        user_id: Optional user identifier for a new session
+        metadata: Optional metadata for a new session
+        timeout_minutes: Session timeout in minutes for a new session
     
     Returns:
-        Session data or None if not found/expired
+        Session ID
     """
+    session_uuid = _parse_uuid(session_id)
+    
+    if session_uuid is not None:
+        key = str(session_uuid)
+        # get() (not `in`) so hits and misses show up in the cache metrics
+        if session_cache.get(key, _UNCACHED) is not _UNCACHED:
+            return key
+    
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=timeout_minutes)
+    
     async with db_pool.acquire() as conn:
         result = await conn.fetchrow(
             """
-            SELECT 
-                id::text,
-                user_id,
-                metadata,
-                created_at,
-                updated_at,
-                expires_at
-            FROM sessions
-            WHERE id = $1::uuid
-            AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+            WITH existing AS (
+                SELECT id, expires_at
+                FROM sessions
+                WHERE id = $1::uuid
+                AND (expires_at IS NULL OR expires_at > CURRENT_TIMESTAMP)
+            ),
+            created AS (
+                INSERT INTO sessions (user_id, metadata, expires_at)
+                SELECT $2, $3, $4
+                WHERE NOT EXISTS (SELECT 1 FROM existing)
+                RETURNING id, expires_at
+            )
+            SELECT id::text AS id, expires_at FROM existing
+            UNION ALL
+            SELECT id::text AS id, expires_at FROM created
             """,
-            session_id
+            session_uuid,
+            user_id,
+            json.dumps(metadata or {}),
+            expires_at
         )
+    
+    _cache_session(result["id"], result["expires_at"])
+    return result["id"]
+
+
+async def delete_expired_sessions(batch_size: int = 1000) -> int:
+    """
+    Delete expired sessions (their messages cascade) in bounded batches.
+    
+    Args:
+        batch_size: Sessions deleted per statement
+    
+    Returns:
+        Number of sessions deleted
+    """
+    total = 0
+    
+    async with db_pool.acquire() as conn:
+        while True:
+            result = await conn.execute(
+                """
+                DELETE FROM sessions
+                WHERE id IN (
+                    SELECT id FROM sessions
+                    WHERE expires_at < CURRENT_TIMESTAMP
+                    LIMIT $1
+                )
+                """,
+                batch_size
+            )
+            deleted = int(result.split()[-1])
+            total += deleted
+            if deleted < batch_size:
+                break
+    
+    return total
+
+
+async def get_session(session_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get session by ID.
+    
+    Args:
+        session_id: Session UUID
+    
+    Returns:
+        Session data or None if not found/expired
+    """
+    async with db_pool.acquire() as conn:
+        result = await run_prepared(conn, "get_session", "fetchrow", session_id)
         
         if result:
             return {
@@ -200,19 +546,94 @@ async def add_message(
         Message ID
     """
     async with db_pool.acquire() as conn:
-        result = await conn.fetchrow(
-            """
-            INSERT INTO messages (session_id, role, content, metadata)
-            VALUES ($1::uuid, $2, $3, $4)
-            RETURNING id::text
-            """,
+        result = await run_prepared(
+            conn,
+            "add_message",
+            "fetchrow",
             session_id,
             role,
             content,
             json.dumps(metadata or {})
         )
-        
-        return result["id"]
+    
+    remember_persisted_messages(session_id, [{
+        "id": result["id"],
+        "role": role,
+        "content": content,
+        "created_at": result["created_at"]
+    }])
+    
+    return result["id"]
+
+
+def remember_persisted_messages(session_id: str, messages: List[Dict[str, Any]]):
+    """
+    Add messages this process has written to the session's cached window.
+    
+    This is what keeps cached windows current. The count/latest stamp moves
+    with the messages, so it keeps matching the database unless another
+    worker wrote to the session meanwhile (with SESSION_CONTEXT_VALIDATE the
+    next read then refills it). Messages already in the window are skipped.
+    
+    Args:
+        session_id: Session UUID
+        messages: Written messages with id, role, content and created_at
+    """
+    entry = recent_messages_cache.get(session_id)
+    if entry is None:
+        return
+    
+    known = {m["id"] for m in entry["messages"]}
+    new = [
+        {"id": str(m["id"]), "role": m["role"], "content": m["content"], "created_at": m["created_at"]}
+        for m in messages if str(m["id"]) not in known
+    ]
+    if not new:
+        return
+    
+    window = sorted(entry["messages"] + new, key=lambda m: m["created_at"])
+    entry["messages"] = window[-SESSION_CONTEXT_WINDOW:]
+    entry["count"] += len(new)
+    entry["latest"] = max([m["created_at"] for m in new] + ([entry["latest"]] if entry["latest"] else []))
+
+
+async def add_messages(messages: List[Dict[str, Any]]) -> int:
+    """
+    Insert several messages with one COPY.
+    
+    Args:
+        messages: Dicts with id, session_id, role, content, metadata and created_at
+    
+    Returns:
+        Number of messages inserted
+    """
+    if not messages:
+        return 0
+    
+    async with db_pool.acquire() as conn:
+        await conn.copy_records_to_table(
+            "messages",
+            records=[
+                (
+                    UUID(str(m["id"])),
+                    UUID(str(m["session_id"])),
+                    m["role"],
+                    m["content"],
+                    json.dumps(m.get("metadata") or {}),
+                    m["created_at"]
+                )
+                for m in messages
+            ],
+            columns=["id", "session_id", "role", "content", "metadata", "created_at"]
+        )
+    
+    by_session: Dict[str, List[Dict[str, Any]]] = {}
+    for m in messages:
+        by_session.setdefault(str(m["session_id"]), []).append(m)
+    for session_id, session_messages in by_session.items():
+        remember_persisted_messages(session_id, session_messages)
+    
+    return len(messages)
 
 
 async def get_session_messages(
@@ -240,12 +661,11 @@ async def get_session_messages(
             FROM messages
             WHERE session_id = $1::uuid
             ORDER BY created_at
+            LIMIT $2
         """
         
-        if limit:
-            query += f" LIMIT {limit}"
-        
-        results = await conn.fetch(query, session_id)
+        # LIMIT NULL means no limit
+        results = await conn.fetch(query, session_id, limit or None)
         
         return [
             {
@@ -259,6 +679,114 @@ async def get_session_messages(
         ]
 
 
+def estimate_tokens(text: str) -> int:
+    """Estimate token count with the shared tool-result estimator."""
+    return count_tokens(text)
+
+
+async def get_recent_messages(
+    session_id: str,
+    limit: int = SESSION_CONTEXT_WINDOW,
+    max_tokens: Optional[int] = None,
+    pending: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, str]]:
+    """
+    Get the most recent messages of a session for prompt context.
+    
+    Reads the newest rows with a descending scan of the (session_id,
+    created_at) index and transfers only role/content. The window is
+    cached per session and kept current by this process's own writes
+    (remember_persisted_messages), so a cache hit makes no database call.
+    Messages another worker writes to the same session are not seen until
+    the entry expires, unless SESSION_CONTEXT_VALIDATE is set: then each
+    hit first compares the cached message count and newest created_at
+    with the database (one query) and refills the window on a mismatch.
+    
+    Messages recorded but not yet written (the write-behind journal's
+    queue) are merged in by id and created_at. They are never cached, so a
+    window refilled while writes are queued does not lose them.
+    
+    Args:
+        session_id: Session UUID
+        limit: Maximum number of messages
+        max_tokens: Optional budget; older messages are dropped first
+        pending: Unwritten messages with id, role, content and created_at
+    
+    Returns:
+        Messages in chronological order with role and content only
+    """
+    cacheable = limit <= SESSION_CONTEXT_WINDOW
+    entry = recent_messages_cache.get(session_id) if cacheable else None
+    
+    if entry is None or SESSION_CONTEXT_VALIDATE:
+        async with db_pool.acquire() as conn:
+            if entry is not None:
+                version = await conn.fetchrow(
+                    """
+                    SELECT count(*) AS count, max(created_at) AS latest
+                    FROM messages
+                    WHERE session_id = $1::uuid
+                    """,
+                    session_id
+                )
+                if (version["count"], version["latest"]) != (entry["count"], entry["latest"]):
+                    entry = None
+            
+            if entry is None:
+                # Version and window from one snapshot
+                rows = await conn.fetch(
+                    """
+                    SELECT v.count, v.latest, m.id::text, m.role, m.content, m.created_at
+                    FROM (
+                        SELECT count(*) AS count, max(created_at) AS latest
+                        FROM messages
+                        WHERE session_id = $1::uuid
+                    ) v
+                    LEFT JOIN LATERAL (
+                        SELECT id, role, content, created_at
+                        FROM messages
+                        WHERE session_id = $1::uuid
+                        ORDER BY created_at DESC
+                        LIMIT $2
+                    ) m ON true
+                    """,
+                    session_id,
+                    max(limit, SESSION_CONTEXT_WINDOW)
+                )
+                
+                entry = {
+                    "messages": [
+                        {"id": row["id"], "role": row["role"], "content": row["content"], "created_at": row["created_at"]}
+                        for row in reversed(rows) if row["id"] is not None
+                    ],
+                    "count": rows[0]["count"],
+                    "latest": rows[0]["latest"]
+                }
+                if cacheable:
+                    recent_messages_cache.set(session_id, entry)
+    
+    window = entry["messages"]
+    if pending:
+        known = {m["id"] for m in window}
+        window = sorted(
+            window + [m for m in pending if str(m["id"]) not in known],
+            key=lambda m: m["created_at"]
+        )
+    messages = window[-limit:] if limit > 0 else []
+    
+    if max_tokens is not None:
+        budgeted = []
+        used = 0
+        for message in reversed(messages):
+            used += estimate_tokens(message["content"])
+            if used > max_tokens:
+                break
+            budgeted.append(message)
+        messages = list(reversed(budgeted))
+    
+    return [{"role": message["role"], "content": message["content"]} for message in messages]
+
+
 # Document Management Functions
 async def get_document(document_id: str) -> Optional[Dict[str, Any]]:
     """
@@ -366,9 +894,11 @@ async def list_documents(
 
 
 # Vector Search Functions
+@traced("search.vector")
 async def vector_search(
-    embedding: List[float],
-    limit: int = 10
+    embedding: Union[List[float], np.ndarray],
+    limit: int = 10,
+    include_embeddings: bool = False
 ) -> List[Dict[str, Any]]:
     """
     Perform vector similarity search.
@@ -376,23 +906,104 @@ async def vector_search(
     Args:
         embedding: Query embedding vector
         limit: Maximum number of results
+        include_embeddings: Also return each chunk's stored embedding (NumPy array)
     
     Returns:
         List of matching chunks ordered by similarity (best first)
     """
+    statement = "match_chunks_with_embeddings" if include_embeddings else "match_chunks"
+    
     async with db_pool.acquire() as conn:
-        # Convert embedding to PostgreSQL vector string format
-        # PostgreSQL vector format: '[1.0,2.0,3.0]' (no spaces after commas)
-        embedding_str = '[' + ','.join(map(str, embedding)) + ']'
+        # Embedding is sent in binary via the pgvector codec
+        results = await run_prepared(
+            conn,
+            statement,
+            "fetch",
+            embedding,
+            limit
+        )
         
+        chunks = []
+        for row in results:
+            chunk = {
+                "chunk_id": row["chunk_id"],
+                "document_id": row["document_id"],
+                "content": row["content"],
+                "similarity": row["similarity"],
+                "metadata": json.loads(row["metadata"]),
+                "document_title": row["document_title"],
+                "document_source": row["document_source"]
+            }
+            if include_embeddings:
+                chunk["embedding"] = row["embedding"]
+            chunks.append(chunk)
+        
+        return chunks
+
+
+@traced("search.multi_vector")
+async def multi_vector_search(
+    embeddings: List[Union[List[float], np.ndarray]],
+    limit: int = 10,
+    include_embeddings: bool = False
+) -> List[List[Dict[str, Any]]]:
+    """
+    Run several vector searches in one statement.
+    
+    Each query embedding gets its own index-backed top-k (LATERAL over the
+    vector array). A chunk matched by several queries is kept only for the
+    query it is most similar to.
+    
+    Args:
+        embeddings: Query embedding vectors
+        limit: Maximum number of results per query
+        include_embeddings: Also return each chunk's stored embedding (NumPy array)
+    
+    Returns:
+        One list of matching chunks per query, in input order (best first)
+    """
+    if not embeddings:
+        return []
+    
+    embedding_column = ",\n                        c.embedding AS chunk_embedding" if include_embeddings else ""
+    
+    async with db_pool.acquire() as conn:
         results = await conn.fetch(
-            "SELECT * FROM match_chunks($1::vector, $2)",
-            embedding_str,
+            f"""
+            WITH matches AS (
+                SELECT q.query_index, m.*
+                FROM unnest($1::vector[]) WITH ORDINALITY AS q(embedding, query_index)
+                CROSS JOIN LATERAL (
+                    SELECT 
+                        c.id AS chunk_id,
+                        c.document_id,
+                        c.content,
+                        1 - (c.embedding <=> q.embedding) AS similarity,
+                        c.metadata,
+                        d.title AS document_title,
+                        d.source AS document_source{embedding_column}
+                    FROM chunks c
+                    JOIN documents d ON c.document_id = d.id
+                    WHERE c.embedding IS NOT NULL
+                    ORDER BY c.embedding <=> q.embedding
+                    LIMIT $2
+                ) m
+            ),
+            best AS (
+                SELECT DISTINCT ON (chunk_id) *
+                FROM matches
+                ORDER BY chunk_id, similarity DESC, query_index
+            )
+            SELECT * FROM best
+            ORDER BY query_index, similarity DESC
+            """,
+            [encode_vector(embedding) for embedding in embeddings],
             limit
         )
         
-        return [
-            {
+        grouped: List[List[Dict[str, Any]]] = [[] for _ in embeddings]
+        for row in results:
+            chunk = {
                 "chunk_id": row["chunk_id"],
                 "document_id": row["document_id"],
                 "content": row["content"],
@@ -401,15 +1012,22 @@ async def vector_search(
                 "document_title": row["document_title"],
                 "document_source": row["document_source"]
             }
-            for row in results
-        ]
+            if include_embeddings:
+                chunk["embedding"] = row["chunk_embedding"]
+            grouped[row["query_index"] - 1].append(chunk)
+        
+        return grouped
 
 
+@traced("search.hybrid")
 async def hybrid_search(
-    embedding: List[float],
+    embedding: Union[List[float], np.ndarray],
     query_text: str,
     limit: int = 10,
-    text_weight: float = 0.3
+    text_weight: float = 0.3,
+    fusion: str = "weighted",
+    candidate_count: int = 40,
+    include_embeddings: bool = False
 ) -> List[Dict[str, Any]]:
     """
     Perform hybrid search (vector + keyword).
@@ -419,25 +1037,44 @@ async def hybrid_search(
         query_text: Query text for keyword search
         limit: Maximum number of results
         text_weight: Weight for text similarity (0-1)
+        fusion: "weighted" (mix of raw scores) or "rrf" (reciprocal rank fusion)
+        candidate_count: Candidates taken from each retriever in rrf mode
+        include_embeddings: Also return each chunk's stored embedding (NumPy array)
     
     Returns:
         List of matching chunks ordered by combined score (best first)
     """
+    suffix = "_with_embeddings" if include_embeddings else ""
+    
     async with db_pool.acquire() as conn:
-        # Convert embedding to PostgreSQL vector string format
-        # PostgreSQL vector format: '[1.0,2.0,3.0]' (no spaces after commas)
-        embedding_str = '[' + ','.join(map(str, embedding)) + ']'
-        
-        results = await conn.fetch(
-            "SELECT * FROM hybrid_search($1::vector, $2, $3, $4)",
-            embedding_str,
-            query_text,
-            limit,
-            text_weight
-        )
+        # Embedding is sent in binary via the pgvector codec
+        if fusion == "rrf":
+            results = await run_prepared(
+                conn,
+                f"hybrid_search_rrf{suffix}",
+                "fetch",
+                embedding,
+                query_text,
+                limit,
+                text_weight,
+                candidate_count
+            )
+        elif fusion == "weighted":
+            results = await run_prepared(
+                conn,
+                f"hybrid_search{suffix}",
+                "fetch",
+                embedding,
+                query_text,
+                limit,
+                text_weight
+            )
+        else:
+            raise ValueError(f"Unknown fusion mode: {fusion}")
         
-        return [
-            {
+        chunks = []
+        for row in results:
+            chunk = {
                 "chunk_id": row["chunk_id"],
                 "document_id": row["document_id"],
                 "content": row["content"],
@@ -448,8 +1085,166 @@ async def hybrid_search(
                 "document_title": row["document_title"],
                 "document_source": row["document_source"]
             }
-            for row in results
-        ]
+            if include_embeddings:
+                chunk["embedding"] = row["embedding"]
+            chunks.append(chunk)
+        
+        return chunks
+
+
+# Drug Profile Functions
+async def get_drug_profile(drug_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Get a precomputed drug profile.
+    
+    Matches the drug name or a stored alias (brand name or synonym) through
+    the primary key and aliases indexes. Only when neither matches, falls
+    back to a whole-word prefix in either direction ("sildenafil citrate"
+    finds the sildenafil profile), which scans the table.
+    
+    Args:
+        drug_name: Drug name (matched case-insensitively)
+    
+    Returns:
+        Drug profile with built_at timestamp, or None if not materialized
+    """
+    async with db_pool.acquire() as conn:
+        result = await conn.fetchrow(
+            """
+            SELECT drug_name, profile, built_at
+            FROM drug_profiles
+            WHERE name_key = lower(trim($1))
+               OR aliases @> ARRAY[lower(trim($1))]
+            ORDER BY name_key = lower(trim($1)) DESC
+            LIMIT 1
+            """,
+            drug_name
+        )
+        
+        if not result:
+            result = await conn.fetchrow(
+                """
+                WITH query AS (SELECT lower(trim($1)) AS key)
+                SELECT drug_name, profile, built_at
+                FROM drug_profiles, query
+                WHERE starts_with(query.key, name_key || ' ')
+                   OR starts_with(name_key, query.key || ' ')
+                   OR EXISTS (
+                       SELECT 1 FROM unnest(aliases) AS alias
+                       WHERE starts_with(query.key, alias || ' ')
+                   )
+                ORDER BY length(name_key)
+                LIMIT 1
+                """,
+                drug_name
+            )
+        
+        if result:
+            return {
+                "drug_name": result["drug_name"],
+                "profile": json.loads(result["profile"]),
+                "built_at": result["built_at"].isoformat()
+            }
+        
+        return None
+
+
+async def save_drug_profiles(
+    profiles: List[Dict[str, Any]],
+    replace_all: bool = True
+) -> int:
+    """
+    Store drug profiles in one transaction.
+    
+    Args:
+        profiles: Profiles as returned by the live drug info path (must include
+            drug_name; optional aliases list)
+        replace_all: Delete profiles not in this batch (full rebuild)
+    
+    Returns:
+        Number of profiles stored
+    """
+    async with db_pool.acquire() as conn:
+        async with conn.transaction():
+            if replace_all:
+                await conn.execute("DELETE FROM drug_profiles")
+            await conn.executemany(
+                """
+                INSERT INTO drug_profiles (name_key, drug_name, aliases, profile)
+                VALUES (lower(trim($1)), $1, $2::text[], $3::jsonb)
+                ON CONFLICT (name_key) DO UPDATE
+                SET drug_name = EXCLUDED.drug_name,
+                    aliases = EXCLUDED.aliases,
+                    profile = EXCLUDED.profile,
+                    built_at = CURRENT_TIMESTAMP
+                """,
+                [
+                    (
+                        p["drug_name"],
+                        sorted({a.strip().lower() for a in p.get("aliases", []) if a.strip()}),
+                        json.dumps(p, default=str)
+                    )
+                    for p in profiles
+                ]
+            )
+    
+    return len(profiles)
+
+
+# Corpus Version Functions
+async def get_corpus_version(name: str = "default") -> int:
+    """
+    Get a corpus version stamp.
+    
+    Args:
+        name: Stamp name ("default" for chunks and graph, "graph" for the graph only)
+    
+    Returns:
+        Current version (0 if ingestion has never bumped it)
+    """
+    async with db_pool.acquire() as conn:
+        version = await conn.fetchval(
+            "SELECT version FROM corpus_version WHERE name = $1",
+            name
+        )
+        return version or 0
+
+
+async def bump_corpus_version(name: str = "default") -> int:
+    """
+    Advance a corpus version stamp after chunks or graph episodes change.
+    
+    Cached results keyed on the previous version become unreachable; for the
+    default stamp, shared tool result cache entries for older versions are
+    pruned.
+    
+    Args:
+        name: Stamp name ("default" or "graph")
+    
+    Returns:
+        New version
+    """
+    async with db_pool.acquire() as conn:
+        async with conn.transaction():
+            version = await conn.fetchval(
+                """
+                INSERT INTO corpus_version (name, version)
+                VALUES ($1, 1)
+                ON CONFLICT (name) DO UPDATE
+                SET version = corpus_version.version + 1,
+                    updated_at = CURRENT_TIMESTAMP
+                RETURNING version
+                """,
+                name
+            )
+            if name == "default":
+                await conn.execute(
+                    "DELETE FROM tool_result_cache WHERE corpus_version < $1",
+                    version
+                )
+    
+    logger.info(f"Corpus version '{name}' bumped to {version}")
+    return version
 
 
 # Chunk Management Functions
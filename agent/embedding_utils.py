@@ -0,0 +1,474 @@
+"""
+Query embedding cache with optional persistent backends, and a
+micro-batching dispatcher for query-time embedding calls.
+
+The in-memory layer is a bounded LRU/TTL cache. A persistent store
+(PostgreSQL table or on-disk SQLite file) can sit behind it so cached
+embeddings survive restarts and are shared across uvicorn workers.
+"""
+
+import os
+import time
+import array
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from dotenv import load_dotenv
+
+from .cache_utils import TTLCache
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "memory").lower()
+EMBEDDING_CACHE_MAX_SIZE = int(os.getenv("EMBEDDING_CACHE_MAX_SIZE", "2048"))
+EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "86400"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+
+# Micro-batching configuration
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+
+
+def normalize_embedding_text(text: str) -> str:
+    """
+    Normalize text for cache keying.
+
+    Collapses whitespace and case so trivially different phrasings of the
+    same clinical query ("Sildenafil  dose" vs "sildenafil dose") share a key.
+    """
+    return " ".join(text.split()).casefold()
+
+
+def embedding_cache_key(text: str, model: str) -> str:
+    """
+    Build the cache key for a text/model pair.
+
+    Args:
+        text: Text to embed
+        model: Embedding model name
+
+    Returns:
+        Hex digest key
+    """
+    normalized = normalize_embedding_text(text)
+    return hashlib.sha256(f"{model}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class PostgresEmbeddingStore:
+    """Embedding store backed by the embedding_cache table."""
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        """
+        Initialize store.
+
+        Args:
+            ttl_seconds: Entry lifetime in seconds (None disables expiry)
+        """
+        self.ttl_seconds = ttl_seconds
+
+    async def get(self, key: str) -> Optional[List[float]]:
+        """Get an embedding by cache key."""
+        from .db_utils import db_pool
+
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT embedding
+                FROM embedding_cache
+                WHERE cache_key = $1
+                AND ($2::float8 IS NULL
+                     OR created_at > CURRENT_TIMESTAMP - make_interval(secs => $2::float8))
+                """,
+                key,
+                self.ttl_seconds
+            )
+            return list(row["embedding"]) if row else None
+
+    async def set(self, key: str, model: str, embedding: List[float]):
+        """Store an embedding under a cache key."""
+        from .db_utils import db_pool
+
+        async with db_pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO embedding_cache (cache_key, model, embedding)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (cache_key) DO UPDATE
+                SET embedding = EXCLUDED.embedding,
+                    created_at = CURRENT_TIMESTAMP
+                """,
+                key,
+                model,
+                list(embedding)
+            )
+
+
+class DiskEmbeddingStore:
+    """Embedding store backed by a local SQLite file."""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        """
+        Initialize store.
+
+        Args:
+            path: SQLite database file path
+            ttl_seconds: Entry lifetime in seconds (None disables expiry)
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite file on first use."""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            # WAL lets several uvicorn workers read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get_sync(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT embedding, created_at FROM embedding_cache WHERE cache_key = ?",
+                (key,)
+            ).fetchone()
+
+        if not row:
+            return None
+        if self.ttl_seconds and row[1] < time.time() - self.ttl_seconds:
+            return None
+        return array.array("f", row[0]).tolist()
+
+    def _set_sync(self, key: str, model: str, embedding: List[float]):
+        blob = array.array("f", embedding).tobytes()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO embedding_cache VALUES (?, ?, ?, ?)",
+                (key, model, blob, time.time())
+            )
+            conn.commit()
+
+    async def get(self, key: str) -> Optional[List[float]]:
+        """Get an embedding by cache key."""
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def set(self, key: str, model: str, embedding: List[float]):
+        """Store an embedding under a cache key."""
+        await asyncio.to_thread(self._set_sync, key, model, embedding)
+
+
+class EmbeddingCache:
+    """Two-level query embedding cache (memory, then optional persistent store)."""
+
+    def __init__(
+        self,
+        model: str,
+        max_size: int = EMBEDDING_CACHE_MAX_SIZE,
+        ttl_seconds: Optional[float] = EMBEDDING_CACHE_TTL_SECONDS,
+        store: Optional[Any] = None
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            model: Embedding model name (part of every key)
+            max_size: Maximum in-memory entries
+            ttl_seconds: Entry lifetime in seconds
+            store: Optional persistent store with async get/set
+        """
+        self.model = model
+        self.memory = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds, name="embeddings")
+        self.store = store
+
+        self.store_hits = 0
+        self.store_errors = 0
+        self.provider_calls = 0
+        self.provider_ms_total = 0.0
+        self._pending_writes: set = set()
+
+    async def get(self, text: str) -> Optional[List[float]]:
+        """
+        Look up an embedding.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Cached embedding or None
+        """
+        key = embedding_cache_key(text, self.model)
+
+        embedding = self.memory.get(key)
+        if embedding is not None:
+            return embedding
+
+        if self.store is None:
+            return None
+
+        try:
+            embedding = await self.store.get(key)
+        except Exception as e:
+            self.store_errors += 1
+            logger.warning(f"Embedding cache store lookup failed: {e}")
+            return None
+
+        if embedding is not None:
+            self.store_hits += 1
+            self.memory.set(key, embedding)
+        return embedding
+
+    async def set(self, text: str, embedding: List[float]):
+        """
+        Store an embedding. Persistent writes happen in the background.
+
+        Args:
+            text: Query text
+            embedding: Embedding vector
+        """
+        key = embedding_cache_key(text, self.model)
+        self.memory.set(key, embedding)
+
+        if self.store is not None:
+            task = asyncio.create_task(self._write_through(key, embedding))
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+
+    async def _write_through(self, key: str, embedding: List[float]):
+        try:
+            await self.store.set(key, self.model, embedding)
+        except Exception as e:
+            self.store_errors += 1
+            logger.warning(f"Embedding cache store write failed: {e}")
+
+    def record_provider_call(self, elapsed_ms: float):
+        """Record the latency of an uncached provider call."""
+        self.provider_calls += 1
+        self.provider_ms_total += elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters and the estimated provider latency saved.
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        memory_stats = self.memory.stats()
+        hits = memory_stats["hits"] + self.store_hits
+        misses = memory_stats["misses"] - self.store_hits
+        avg_provider_ms = (
+            self.provider_ms_total / self.provider_calls if self.provider_calls else 0.0
+        )
+
+        return {
+            "model": self.model,
+            "backend": type(self.store).__name__ if self.store else "memory",
+            "memory": memory_stats,
+            "hits": hits,
+            "misses": misses,
+            "store_hits": self.store_hits,
+            "store_errors": self.store_errors,
+            "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "provider_calls": self.provider_calls,
+            "avg_provider_ms": round(avg_provider_ms, 2),
+            "estimated_ms_saved": round(hits * avg_provider_ms, 2)
+        }
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent embedding requests into one provider call.
+    
+    Requests arriving within max_wait_ms of the first pending request (or
+    until max_batch_size is reached) are sent as a single
+    embeddings.create(input=[...]) call and the vectors are fanned back
+    out to the waiting callers.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        model: str,
+        max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        on_batch: Optional[Callable[[float, int], None]] = None
+    ):
+        """
+        Initialize batcher.
+
+        Args:
+            client: OpenAI-compatible async client
+            model: Embedding model name
+            max_batch_size: Flush as soon as this many requests are pending
+            max_wait_ms: Maximum time the first request waits for company
+            on_batch: Optional callback(elapsed_ms, batch_size) per provider call
+        """
+        self.client = client
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+        self.on_batch = on_batch
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._dispatches: set = set()
+
+        self.requests = 0
+        self.batches = 0
+        self.texts_sent = 0
+        self.largest_batch = 0
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a single text as part of the next batch.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Embedding vector
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        self.requests += 1
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+        return await future
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several texts; they share a batch with any concurrent callers.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            Embedding vectors in input order
+        """
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._dispatches.add(task)
+        task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        # Identical texts in one window are only sent once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+
+        try:
+            start_time = time.perf_counter()
+            response = await self.client.embeddings.create(
+                model=self.model,
+                input=texts
+            )
+            elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+            vectors: List[Optional[List[float]]] = [None] * len(texts)
+            for position, item in enumerate(response.data):
+                index = getattr(item, "index", None)
+                vectors[index if index is not None else position] = item.embedding
+
+            if any(vector is None for vector in vectors):
+                raise ValueError(
+                    f"Embedding provider returned {len(response.data)} vectors for {len(texts)} inputs"
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.texts_sent += len(texts)
+        self.largest_batch = max(self.largest_batch, len(texts))
+        if self.on_batch is not None:
+            self.on_batch(elapsed_ms, len(texts))
+
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get batching counters.
+
+        Returns:
+            Dictionary with request, batch and round-trip counts
+        """
+        return {
+            "requests": self.requests,
+            "provider_calls": self.batches,
+            "texts_sent": self.texts_sent,
+            "largest_batch": self.largest_batch,
+            "avg_batch_size": round(self.texts_sent / self.batches, 2) if self.batches else 0.0,
+            "round_trips_saved": max(0, self.requests - self.batches - len(self._pending))
+        }
+
+
+def create_embedding_cache(
+    model: str,
+    backend: str = EMBEDDING_CACHE_BACKEND
+) -> Optional[EmbeddingCache]:
+    """
+    Create an embedding cache from configuration.
+
+    Args:
+        model: Embedding model name
+        backend: One of "memory", "postgres", "disk" or "none"
+
+    Returns:
+        EmbeddingCache instance, or None if caching is disabled
+    """
+    if backend == "none":
+        return None
+
+    store = None
+    if backend == "postgres":
+        store = PostgresEmbeddingStore(ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS)
+    elif backend == "disk":
+        store = DiskEmbeddingStore(EMBEDDING_CACHE_PATH, ttl_seconds=EMBEDDING_CACHE_TTL_SECONDS)
+    elif backend != "memory":
+        logger.warning(f"Unknown EMBEDDING_CACHE_BACKEND '{backend}', using memory only")
+
+    return EmbeddingCache(model=model, store=store)
@@ -3,11 +3,14 @@ Graph utilities for Neo4j/Graphiti integration.
 """
 
 import os
+import re
+import copy
 import json
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from datetime import datetime, timezone
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
 import asyncio
 
 from graphiti_core import Graphiti
@@ -19,11 +22,127 @@ from graphiti_core.cross_encoder.openai_reranker_client import OpenAIRerankerCli
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from .tracing import traced
+from .cache_utils import TTLCache
+from .tool_cache import CorpusVersion, mark_result_uncacheable
+from .embedding_utils import normalize_embedding_text
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Graphiti search cache, keyed on normalized query and the graph version stamp
+GRAPH_SEARCH_CACHE_SIZE = int(os.getenv("GRAPH_SEARCH_CACHE_SIZE", "1024"))
+GRAPH_SEARCH_CACHE_TTL_SECONDS = float(os.getenv("GRAPH_SEARCH_CACHE_TTL_SECONDS", "1800"))
+
+# Uncached Graphiti searches allowed per agent run (0 disables the limit)
+GRAPH_SEARCH_BUDGET = int(os.getenv("GRAPH_SEARCH_BUDGET", "8"))
+
+# Entity lookup indexes created at initialize()
+ENTITY_FULLTEXT_INDEX = "entity_name_summary_fulltext"
+ENTITY_NAME_LOWER_INDEX = "entity_name_lower"
+
+# Full-text hits considered before the substring check of fuzzy name lookups
+ENTITY_FULLTEXT_CANDIDATES = int(os.getenv("ENTITY_FULLTEXT_CANDIDATES", "50"))
+
+# How long initialize() waits for new entity indexes to come ONLINE
+ENTITY_INDEX_WAIT_SECONDS = int(os.getenv("ENTITY_INDEX_WAIT_SECONDS", "300"))
+
+# Relationship traversal bounds and per-entity cache
+RELATIONSHIP_MAX_DEPTH = int(os.getenv("RELATIONSHIP_MAX_DEPTH", "3"))
+RELATIONSHIP_PATH_LIMIT = int(os.getenv("RELATIONSHIP_PATH_LIMIT", "500"))  # per hop level
+RELATIONSHIP_EDGE_LIMIT = int(os.getenv("RELATIONSHIP_EDGE_LIMIT", "100"))
+RELATIONSHIP_CACHE_SIZE = int(os.getenv("RELATIONSHIP_CACHE_SIZE", "1024"))
+RELATIONSHIP_CACHE_TTL_SECONDS = float(os.getenv("RELATIONSHIP_CACHE_TTL_SECONDS", "3600"))
+
+# Entities a relationship traversal starts from (exact name matches rank first)
+RELATIONSHIP_START_NODES = 3
+
+
+def fulltext_query(text: str, fields: Tuple[str, ...]) -> Optional[str]:
+    """
+    Build a Lucene query matching every word of text (exact or as prefix).
+    
+    Args:
+        text: User-supplied search text
+        fields: Indexed properties to search
+    
+    Returns:
+        Lucene query string, or None if text has no searchable words
+    """
+    # Word characters only, so no Lucene syntax can reach the query
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    
+    clauses = []
+    for word in words:
+        terms = " OR ".join(f"{field}:{word} OR {field}:{word}*" for field in fields)
+        clauses.append(f"({terms})")
+    return " AND ".join(clauses)
+
+
+class GraphCallBudget:
+    """Number of uncached Graphiti searches one agent run may still make."""
+    
+    def __init__(self, limit: int = GRAPH_SEARCH_BUDGET):
+        """
+        Initialize budget.
+        
+        Args:
+            limit: Maximum searches (0 or less means unlimited)
+        """
+        self.limit = limit
+        self.used = 0
+        self.rejected = 0
+    
+    def try_acquire(self) -> bool:
+        """Take one search from the budget; False once it is spent."""
+        if self.limit > 0 and self.used >= self.limit:
+            self.rejected += 1
+            return False
+        self.used += 1
+        return True
+
+
+# Budget of the running agent turn; tool tasks inherit it through contextvars
+_graph_budget: ContextVar[Optional[GraphCallBudget]] = ContextVar("graph_budget", default=None)
+
+
+@contextmanager
+def graph_call_budget(limit: int = GRAPH_SEARCH_BUDGET) -> Iterator[GraphCallBudget]:
+    """
+    Limit the Graphiti searches made inside the block (one agent run).
+    
+    Args:
+        limit: Maximum uncached searches (0 means unlimited)
+    
+    Yields:
+        The budget
+    """
+    budget = GraphCallBudget(limit)
+    token = _graph_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _graph_budget.reset(token)
+        if budget.rejected:
+            logger.warning(
+                f"Graph search budget of {budget.limit} exhausted; "
+                f"{budget.rejected} searches skipped this turn"
+            )
+
+
+def _edge_to_dict(result: Any) -> Dict[str, Any]:
+    return {
+        "fact": result.fact,
+        "uuid": str(result.uuid),
+        "valid_at": str(result.valid_at) if hasattr(result, 'valid_at') and result.valid_at else None,
+        "invalid_at": str(result.invalid_at) if hasattr(result, 'invalid_at') and result.invalid_at else None,
+        "source_node_uuid": str(result.source_node_uuid) if hasattr(result, 'source_node_uuid') and result.source_node_uuid else None
+    }
+
 
 # =============================================================================
 # CUSTOM ENTITY TYPES FOR MEDICAL/CPG DOMAIN
@@ -34,6 +153,7 @@ logger = logging.getLogger(__name__)
 class Medication(BaseModel):
     """A drug or pharmaceutical used for treatment."""
     drug_class: Optional[str] = Field(None, description="Drug class (e.g., PDE5 inhibitor)")
+    brand_names: Optional[str] = Field(None, description="Comma-separated brand names (e.g., Viagra)")
     dosage: Optional[str] = Field(None, description="Typical dosage")
     contraindications: Optional[str] = Field(None, description="Known contraindications")
 
@@ -123,6 +243,23 @@ class GraphitiClient:
         
         self.graphiti: Optional[Graphiti] = None
         self._initialized = False
+        
+        # Search results only change when ingestion bumps the graph version
+        self.search_cache = TTLCache(
+            max_size=GRAPH_SEARCH_CACHE_SIZE,
+            ttl_seconds=GRAPH_SEARCH_CACHE_TTL_SECONDS,
+            name="graph_search"
+        )
+        self.graph_version = CorpusVersion(name="graph")
+        self.budget_rejections = 0
+        self.relationship_cache = TTLCache(
+            max_size=RELATIONSHIP_CACHE_SIZE,
+            ttl_seconds=RELATIONSHIP_CACHE_TTL_SECONDS,
+            name="entity_relationships"
+        )
+        
+        # Set once the entity lookup indexes exist; lookups scan otherwise
+        self._entity_indexes_ready = False
     
     async def initialize(self):
         """Initialize Graphiti client."""
@@ -163,6 +300,7 @@ class GraphitiClient:
             
             # Build indices and constraints
             await self.graphiti.build_indices_and_constraints()
+            await self.ensure_entity_indexes()
             
             self._initialized = True
             logger.info(f"Graphiti client initialized successfully with LLM: {self.llm_choice} and embedder: {self.embedding_model}")
@@ -171,6 +309,73 @@ class GraphitiClient:
             logger.error(f"Failed to initialize Graphiti: {e}")
             raise
     
+    async def ensure_entity_indexes(self):
+        """
+        Create the entity lookup indexes and backfill normalized names.
+        
+        A full-text index over name and summary serves fuzzy name and
+        keyword lookups; a range index on name_lower (toLower(name), which
+        Graphiti does not maintain) serves normalized exact-name matches.
+        Call refresh_entity_names() after adding episodes.
+        
+        Lookups use the indexes only once both are ONLINE: a new index is
+        populated in the background, and querying it earlier can fail or
+        miss nodes.
+        """
+        try:
+            async with self.graphiti.driver.session() as session:
+                await session.run(
+                    f"""
+                    CREATE FULLTEXT INDEX {ENTITY_FULLTEXT_INDEX} IF NOT EXISTS
+                    FOR (n:Entity) ON EACH [n.name, n.summary]
+                    """
+                )
+                await session.run(
+                    f"""
+                    CREATE INDEX {ENTITY_NAME_LOWER_INDEX} IF NOT EXISTS
+                    FOR (n:Entity) ON (n.name_lower)
+                    """
+                )
+            await self.refresh_entity_names()
+            
+            async with self.graphiti.driver.session() as session:
+                for index in (ENTITY_FULLTEXT_INDEX, ENTITY_NAME_LOWER_INDEX):
+                    await session.run(
+                        "CALL db.awaitIndex($index, $timeout)",
+                        index=index,
+                        timeout=ENTITY_INDEX_WAIT_SECONDS
+                    )
+            self._entity_indexes_ready = True
+        except Exception as e:
+            logger.warning(f"Could not create entity lookup indexes; lookups will scan: {e}")
+    
+    async def refresh_entity_names(self) -> int:
+        """
+        Set name_lower on entities that lack it or whose name changed.
+        
+        Returns:
+            Number of entities updated
+        """
+        async with self.graphiti.driver.session() as session:
+            result = await session.run(
+                """
+                MATCH (n:Entity)
+                WHERE n.name IS NOT NULL
+                  AND (n.name_lower IS NULL OR n.name_lower <> toLower(n.name))
+                CALL {
+                    WITH n
+                    SET n.name_lower = toLower(n.name)
+                } IN TRANSACTIONS OF 10000 ROWS
+                RETURN count(n) AS updated
+                """
+            )
+            record = await result.single()
+        
+        updated = record["updated"] if record else 0
+        if updated:
+            logger.info(f"Set name_lower on {updated} entities")
+        return updated
+    
     async def close(self):
         """Close Graphiti connection."""
         if self.graphiti:
@@ -224,6 +429,55 @@ class GraphitiClient:
         else:
             logger.info(f"Added episode {episode_id} to knowledge graph")
     
+    async def _search_edges(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Run a Graphiti search through the result cache and the turn's call budget.
+        
+        Args:
+            query: Search query
+        
+        Returns:
+            Edge dictionaries (empty when the turn's budget is spent)
+        """
+        version = await self.graph_version.get()
+        key = (normalize_embedding_text(query), version)
+        
+        if version is not None:
+            cached = self.search_cache.get(key)
+            if cached is not None:
+                return [dict(edge) for edge in cached]
+        
+        budget = _graph_budget.get()
+        if budget is not None and not budget.try_acquire():
+            self.budget_rejections += 1
+            logger.info(f"Graph search budget spent; skipping search for '{query[:80]}'")
+            mark_result_uncacheable("graph search budget spent")
+            return []
+        
+        results = await self.graphiti.search(query)
+        edges = [_edge_to_dict(result) for result in results]
+        
+        # Without a readable version there is nothing to invalidate against
+        if version is not None:
+            self.search_cache.set(key, edges)
+        return [dict(edge) for edge in edges]
+    
+    def search_stats(self) -> Dict[str, Any]:
+        """
+        Get graph search cache and budget counters.
+        
+        Returns:
+            Dictionary of statistics
+        """
+        return {
+            **self.search_cache.stats(),
+            "graph_version": self.graph_version.last_known,
+            "budget_per_turn": GRAPH_SEARCH_BUDGET,
+            "budget_rejections": self.budget_rejections,
+            "relationships": self.relationship_cache.stats()
+        }
+    
+    @traced("graph.search")
     async def search(
         self,
         query: str,
@@ -246,24 +500,13 @@ class GraphitiClient:
         
         try:
             # Use Graphiti's search method (simplified parameters)
-            results = await self.graphiti.search(query)
-            
-            # Convert results to dictionaries
-            return [
-                {
-                    "fact": result.fact,
-                    "uuid": str(result.uuid),
-                    "valid_at": str(result.valid_at) if hasattr(result, 'valid_at') and result.valid_at else None,
-                    "invalid_at": str(result.invalid_at) if hasattr(result, 'invalid_at') and result.invalid_at else None,
-                    "source_node_uuid": str(result.source_node_uuid) if hasattr(result, 'source_node_uuid') and result.source_node_uuid else None
-                }
-                for result in results
-            ]
+            return await self._search_edges(query)
             
         except Exception as e:
             logger.error(f"Graph search failed: {e}")
             return []
     
+    @traced("graph.related_entities")
     async def get_related_entities(
         self,
         entity_name: str,
@@ -271,43 +514,157 @@ class GraphitiClient:
         depth: int = 1
     ) -> Dict[str, Any]:
         """
-        Get entities related to a given entity using Graphiti search.
+        Get entities related to a given entity by traversing the graph.
+        
+        Runs one Cypher query that expands Graphiti's RELATES_TO edges
+        (either direction, expired edges skipped) from the entities matching
+        the name hop by hop, with a path limit per hop level; no embedding
+        or LLM call is made.
+        Results are cached per entity, depth and types until the graph
+        version changes.
         
         Args:
             entity_name: Name of the entity
-            relationship_types: Types of relationships to follow (not used with Graphiti)
-            depth: Maximum depth to traverse (not used with Graphiti)
+            relationship_types: Edge names to follow (e.g. "CONTRAINDICATED_WITH"); None follows all
+            depth: Maximum number of hops (1 to RELATIONSHIP_MAX_DEPTH)
         
         Returns:
-            Related entities and relationships
+            Matched start entities, related entities and relationships with their hop distance
         """
         if not self._initialized:
             await self.initialize()
         
-        # Use Graphiti search to find related information about the entity
-        results = await self.graphiti.search(f"relationships involving {entity_name}")
+        depth = max(1, min(int(depth), RELATIONSHIP_MAX_DEPTH))
+        types = sorted({t.strip().upper() for t in relationship_types if t.strip()}) if relationship_types else None
         
-        # Extract entity information from the search results
-        related_entities = set()
-        facts = []
+        version = await self.graph_version.get()
+        key = (normalize_embedding_text(entity_name), depth, tuple(types) if types else None, version)
+        if version is not None:
+            cached = self.relationship_cache.get(key)
+            if cached is not None:
+                return copy.deepcopy(cached)
         
-        for result in results:
-            facts.append({
-                "fact": result.fact,
-                "uuid": str(result.uuid),
-                "valid_at": str(result.valid_at) if hasattr(result, 'valid_at') and result.valid_at else None
-            })
-            
-            # Simple entity extraction from fact text (could be enhanced)
-            if entity_name.lower() in result.fact.lower():
-                related_entities.add(entity_name)
+        search = fulltext_query(entity_name, ("name",))
+        if self._entity_indexes_ready and search:
+            start_nodes = f"""
+                CALL {{
+                    MATCH (n:Entity)
+                    WHERE n.name_lower = $name_lower
+                    RETURN n, 1000.0 AS score
+                    UNION
+                    CALL db.index.fulltext.queryNodes('{ENTITY_FULLTEXT_INDEX}', $search, {{limit: $candidates}})
+                    YIELD node, score
+                    WHERE toLower(node.name) CONTAINS $name_lower
+                    RETURN node AS n, score
+                }}
+                WITH n, max(score) AS score
+                ORDER BY score DESC
+                LIMIT $start_limit
+            """
+        else:
+            # Label scan with the same semantics: exact name first, then containing names
+            start_nodes = """
+                MATCH (n:Entity)
+                WHERE toLower(n.name) CONTAINS $name_lower
+                WITH n
+                ORDER BY toLower(n.name) = $name_lower DESC
+                LIMIT $start_limit
+            """
         
-        return {
+        # One exact-length expansion per hop level, each with its own LIMIT,
+        # so paths through a dense hub further out cannot crowd out the
+        # direct edges. Lengths cannot be parameters; depth is a clamped int.
+        hop_levels = "\n".join(
+            f"""
+            CALL {{
+                WITH starts
+                UNWIND starts AS start
+                MATCH path = (start)-[rels:RELATES_TO*{hop}]-(:Entity)
+                WHERE all(r IN rels WHERE r.expired_at IS NULL AND ($types IS NULL OR r.name IN $types))
+                WITH path
+                LIMIT $path_limit
+                RETURN collect(path) AS hop{hop}_paths
+            }}"""
+            for hop in range(1, depth + 1)
+        )
+        all_paths = " + ".join(f"hop{hop}_paths" for hop in range(1, depth + 1))
+        
+        query = f"""
+            {start_nodes}
+            WITH collect(n) AS starts
+            {hop_levels}
+            WITH starts, {all_paths} AS paths
+            UNWIND CASE WHEN size(paths) = 0 THEN [null] ELSE paths END AS path
+            UNWIND CASE WHEN path IS NULL THEN [null] ELSE range(0, length(path) - 1) END AS hop
+            WITH starts, relationships(path)[hop] AS r, hop + 1 AS distance
+            WITH starts, r, min(distance) AS distance
+            ORDER BY distance, r.name
+            LIMIT $edge_limit
+            RETURN
+                [s IN starts | s.name] AS starts,
+                collect(CASE WHEN r IS NULL THEN null ELSE {{
+                    source: startNode(r).name,
+                    source_labels: labels(startNode(r)),
+                    type: r.name,
+                    target: endNode(r).name,
+                    target_labels: labels(endNode(r)),
+                    fact: r.fact,
+                    uuid: r.uuid,
+                    valid_at: toString(r.valid_at),
+                    depth: distance
+                }} END) AS relationships
+        """
+        
+        async with self.graphiti.driver.session() as session:
+            result = await session.run(
+                query,
+                name_lower=entity_name.lower().strip(),
+                search=search,
+                candidates=ENTITY_FULLTEXT_CANDIDATES,
+                start_limit=RELATIONSHIP_START_NODES,
+                types=types,
+                path_limit=RELATIONSHIP_PATH_LIMIT,
+                edge_limit=RELATIONSHIP_EDGE_LIMIT
+            )
+            record = await result.single()
+        
+        starts = record["starts"] if record else []
+        relationships = record["relationships"] if record else []
+        
+        # Related entities at their nearest hop distance
+        distances: Dict[str, Tuple[int, List[str]]] = {}
+        for rel in relationships:
+            for name, labels in ((rel["source"], rel["source_labels"]), (rel["target"], rel["target_labels"])):
+                if name in starts:
+                    continue
+                if name not in distances or rel["depth"] < distances[name][0]:
+                    distances[name] = (rel["depth"], [label for label in labels if label != "Entity"])
+        
+        related = {
             "central_entity": entity_name,
-            "related_facts": facts,
-            "search_method": "graphiti_semantic_search"
+            "matched_entities": starts,
+            "depth": depth,
+            "relationship_types": types,
+            "related_entities": [
+                {"name": name, "labels": labels, "depth": distance}
+                for name, (distance, labels) in sorted(distances.items(), key=lambda item: (item[1][0], item[0]))
+            ],
+            "relationships": [
+                {k: v for k, v in rel.items() if k not in ("source_labels", "target_labels")}
+                for rel in relationships
+            ],
+            "related_facts": [
+                {"fact": rel["fact"], "uuid": rel["uuid"], "valid_at": rel["valid_at"]}
+                for rel in relationships if rel["fact"]
+            ],
+            "search_method": "cypher_traversal"
         }
+        
+        if version is not None:
+            self.relationship_cache.set(key, copy.deepcopy(related))
+        return related
     
+    @traced("graph.entity_timeline")
     async def get_entity_timeline(
         self,
         entity_name: str,
@@ -329,15 +686,15 @@ class GraphitiClient:
             await self.initialize()
         
         # Search for temporal information about the entity
-        results = await self.graphiti.search(f"timeline history of {entity_name}")
+        results = await self._search_edges(f"timeline history of {entity_name}")
         
         timeline = []
         for result in results:
             timeline.append({
-                "fact": result.fact,
-                "uuid": str(result.uuid),
-                "valid_at": str(result.valid_at) if hasattr(result, 'valid_at') and result.valid_at else None,
-                "invalid_at": str(result.invalid_at) if hasattr(result, 'invalid_at') and result.invalid_at else None
+                "fact": result["fact"],
+                "uuid": result["uuid"],
+                "valid_at": result["valid_at"],
+                "invalid_at": result["invalid_at"]
             })
         
         # Sort by valid_at if available
@@ -416,6 +773,7 @@ class GraphitiClient:
             
             logger.warning("Reinitialized Graphiti client (fresh indices created)")
     
+    @traced("graph.entity_node")
     async def get_entity_node_by_name(
         self,
         entity_name: str,
@@ -439,8 +797,40 @@ class GraphitiClient:
         
         try:
             async with self.graphiti.driver.session() as session:
+                search = fulltext_query(entity_name, ("name",))
+                if fuzzy_match and self._entity_indexes_ready and search:
+                    # Normalized exact matches (range index) rank first, then
+                    # full-text name hits that contain the requested name
+                    try:
+                        result = await session.run(
+                            f"""
+                            CALL {{
+                                MATCH (n:Entity)
+                                WHERE n.name_lower = $name_lower
+                                RETURN n AS node, 1000.0 AS score
+                                UNION
+                                CALL db.index.fulltext.queryNodes('{ENTITY_FULLTEXT_INDEX}', $search, {{limit: $candidates}})
+                                YIELD node, score
+                                WHERE toLower(node.name) CONTAINS $name_lower
+                                RETURN node, score
+                            }}
+                            WITH node, max(score) AS score
+                            ORDER BY score DESC
+                            LIMIT 5
+                            RETURN node.name as name, node.summary as summary, labels(node) as labels,
+                                   node.uuid as uuid, node.created_at as created_at
+                            """,
+                            name_lower=entity_name.lower(),
+                            search=search,
+                            candidates=ENTITY_FULLTEXT_CANDIDATES
+                        )
+                        records = await result.data()
+                        return records or None
+                    except Exception as e:
+                        logger.warning(f"Indexed entity lookup failed for '{entity_name}', scanning instead: {e}")
+                
                 if fuzzy_match:
-                    # Case-insensitive fuzzy match
+                    # Case-insensitive fuzzy match (label scan; indexes unavailable or failing)
                     query = """
                     MATCH (n:Entity)
                     WHERE toLower(n.name) CONTAINS toLower($name)
@@ -468,6 +858,7 @@ class GraphitiClient:
             logger.error(f"Failed to get entity node for '{entity_name}': {e}")
             return None
     
+    @traced("graph.entity_keyword_search")
     async def search_entities_by_type(
         self,
         entity_type: str,
@@ -488,6 +879,24 @@ class GraphitiClient:
         
         try:
             async with self.graphiti.driver.session() as session:
+                search = fulltext_query(entity_type, ("name", "summary"))
+                if self._entity_indexes_ready and search:
+                    # Best-scoring matches first (name and summary hits)
+                    try:
+                        result = await session.run(
+                            f"""
+                            CALL db.index.fulltext.queryNodes('{ENTITY_FULLTEXT_INDEX}', $search, {{limit: $limit}})
+                            YIELD node, score
+                            RETURN node.name as name, node.summary as summary, labels(node) as labels, score
+                            """,
+                            search=search,
+                            limit=limit
+                        )
+                        return await result.data()
+                    except Exception as e:
+                        logger.warning(f"Full-text entity search failed for '{entity_type}', scanning instead: {e}")
+                
+                # Label scan fallback (indexes unavailable or failing)
                 query = """
                 MATCH (n:Entity)
                 WHERE toLower(n.name) CONTAINS toLower($type)
@@ -503,6 +912,54 @@ class GraphitiClient:
         except Exception as e:
             logger.error(f"Failed to search entities by type '{entity_type}': {e}")
             return []
+    
+    @traced("graph.medication_entities")
+    async def get_medication_entities(self, limit: int = 500) -> List[Dict[str, Any]]:
+        """
+        Get entities that describe medications.
+        
+        Uses the custom Medication label when graph building assigned it,
+        otherwise falls back to entities whose summary states a dose in mg.
+        
+        Args:
+            limit: Maximum results to return
+        
+        Returns:
+            List of entity nodes with name, summary and brand names
+        """
+        if not self._initialized:
+            await self.initialize()
+        
+        try:
+            async with self.graphiti.driver.session() as session:
+                result = await session.run(
+                    """
+                    MATCH (n:Medication)
+                    RETURN DISTINCT n.name as name, n.summary as summary, n.brand_names as brand_names
+                    LIMIT $limit
+                    """,
+                    limit=limit
+                )
+                records = await result.data()
+                
+                if not records:
+                    result = await session.run(
+                        """
+                        MATCH (n:Entity)
+                        WHERE n.summary =~ $dose_pattern
+                        RETURN DISTINCT n.name as name, n.summary as summary, n.brand_names as brand_names
+                        LIMIT $limit
+                        """,
+                        dose_pattern=r"(?is).*\b\d+(\.\d+)?\s*mg\b.*",
+                        limit=limit
+                    )
+                    records = await result.data()
+                
+                return records
+                
+        except Exception as e:
+            logger.error(f"Failed to get medication entities: {e}")
+            return []
 
 
 # Global Graphiti client instance
@@ -568,7 +1025,8 @@ async def search_knowledge_graph(
 
 async def get_entity_relationships(
     entity: str,
-    depth: int = 2
+    depth: int = 2,
+    relationship_types: Optional[List[str]] = None
 ) -> Dict[str, Any]:
     """
     Get relationships for an entity.
@@ -576,11 +1034,22 @@ async def get_entity_relationships(
     Args:
         entity: Entity name
         depth: Maximum traversal depth
+        relationship_types: Relationship types to follow (None for all)
     
     Returns:
         Entity relationships
     """
-    return await graph_client.get_related_entities(entity, depth=depth)
+    return await graph_client.get_related_entities(entity, relationship_types=relationship_types, depth=depth)
+
+
+def get_graph_search_stats() -> Dict[str, Any]:
+    """
+    Get graph search cache and per-turn budget statistics.
+    
+    Returns:
+        Dictionary of statistics
+    """
+    return graph_client.search_stats()
 
 
 async def test_graph_connection() -> bool:
@@ -634,4 +1103,17 @@ async def search_entities_by_keyword(
     Returns:
         List of matching entity nodes with summaries
     """
-    return await graph_client.search_entities_by_type(keyword, limit)
\ No newline at end of file
+    return await graph_client.search_entities_by_type(keyword, limit)
+
+
+async def get_medication_entities(limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Get medication entities from the knowledge graph.
+    
+    Args:
+        limit: Maximum results
+    
+    Returns:
+        List of medication entity nodes with summaries
+    """
+    return await graph_client.get_medication_entities(limit)
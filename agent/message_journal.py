@@ -0,0 +1,233 @@
+"""
+Write-behind journal for conversation messages.
+
+Messages are buffered in an asyncio queue and written in small batches with
+COPY by a background task, so saving a turn no longer sits on the request's
+critical path. Each message gets its id and timestamp when it is recorded,
+so ordering within a session is preserved regardless of when the batch lands.
+Messages still waiting to be written are available per session through
+pending(), so conversation context can include them.
+The API lifespan hook starts the journal and flushes it on shutdown.
+
+Set MESSAGE_PERSISTENCE=sync for deployments that need every message on
+disk before the request returns.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from dotenv import load_dotenv
+
+from .db_utils import add_message, add_messages
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Journal configuration
+MESSAGE_PERSISTENCE = os.getenv("MESSAGE_PERSISTENCE", "write_behind").lower()
+MESSAGE_JOURNAL_BATCH_SIZE = int(os.getenv("MESSAGE_JOURNAL_BATCH_SIZE", "50"))
+MESSAGE_JOURNAL_FLUSH_MS = float(os.getenv("MESSAGE_JOURNAL_FLUSH_MS", "50"))
+MESSAGE_JOURNAL_MAX_QUEUE = int(os.getenv("MESSAGE_JOURNAL_MAX_QUEUE", "10000"))
+
+
+class MessageJournal:
+    """Buffers messages and persists them in batches from a background task."""
+
+    def __init__(
+        self,
+        synchronous: bool = MESSAGE_PERSISTENCE == "sync",
+        batch_size: int = MESSAGE_JOURNAL_BATCH_SIZE,
+        flush_interval_ms: float = MESSAGE_JOURNAL_FLUSH_MS,
+        max_queue: int = MESSAGE_JOURNAL_MAX_QUEUE
+    ):
+        """
+        Initialize journal.
+
+        Args:
+            synchronous: Write each message before record() returns
+            batch_size: Maximum messages per COPY
+            flush_interval_ms: How long a batch waits to fill up
+            max_queue: Queue bound; when full, messages are written synchronously
+        """
+        self.synchronous = synchronous
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # session_id -> queued or in-flight messages, in record order
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        """Whether the background writer is active."""
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        """Start the background writer (no-op in synchronous mode)."""
+        if self.synchronous or self.running:
+            return
+
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._worker = asyncio.create_task(self._run())
+        logger.info("Message journal started (write-behind)")
+
+    async def stop(self):
+        """Flush pending messages and stop the background writer."""
+        if not self.running:
+            return
+
+        await self.flush()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        logger.info(f"Message journal stopped ({self.written} messages written)")
+
+    async def flush(self):
+        """Wait until every queued message has been written (or failed)."""
+        if self.running:
+            await self._queue.join()
+
+    async def record(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Record a message.
+
+        Args:
+            session_id: Session UUID
+            role: Message role (user/assistant/system)
+            content: Message content
+            metadata: Optional message metadata
+
+        Returns:
+            Message ID
+        """
+        self.recorded += 1
+
+        if not self.running:
+            return await add_message(session_id, role, content, metadata)
+
+        message = {
+            "id": str(uuid.uuid4()),
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "metadata": metadata or {},
+            "created_at": datetime.now(timezone.utc)
+        }
+
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning("Message journal queue full, writing synchronously")
+            return await add_message(session_id, role, content, metadata)
+
+        self._pending.setdefault(session_id, []).append(message)
+        return message["id"]
+
+    def pending(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        Get a session's messages that are recorded but not written yet.
+
+        Args:
+            session_id: Session UUID
+
+        Returns:
+            Messages with id, role, content and created_at, oldest first
+        """
+        return [
+            {"id": m["id"], "role": m["role"], "content": m["content"], "created_at": m["created_at"]}
+            for m in self._pending.get(session_id, [])
+        ]
+
+    def _forget(self, batch: List[Dict[str, Any]]):
+        for message in batch:
+            session_messages = self._pending.get(message["session_id"])
+            if session_messages is None:
+                continue
+            session_messages[:] = [m for m in session_messages if m["id"] != message["id"]]
+            if not session_messages:
+                del self._pending[message["session_id"]]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write(batch)
+            finally:
+                # Written (or failed) messages are no longer pending; written
+                # ones are in the recent window cache or the table by now
+                self._forget(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            self.written += await add_messages(batch)
+            self.batches += 1
+            return
+        except Exception as e:
+            logger.warning(f"Message journal batch of {len(batch)} failed, retrying individually: {e}")
+
+        # One bad row (e.g. a deleted session) must not drop the rest
+        for message in batch:
+            try:
+                self.written += await add_messages([message])
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Failed to persist message {message['id']}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get journal counters.
+
+        Returns:
+            Dictionary with mode, queue depth and write counts
+        """
+        return {
+            "mode": "sync" if self.synchronous else "write_behind",
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "pending_sessions": len(self._pending),
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed
+        }
+
+
+# Global message journal instance
+message_journal = MessageJournal()
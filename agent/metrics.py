@@ -0,0 +1,328 @@
+"""
+Prometheus-style metrics for the API process.
+
+A small in-process registry of counters, gauges and histograms rendered in
+the Prometheus text exposition format (0.0.4) at GET /metrics, so any local
+scraper or collector can read it without extra services or dependencies.
+
+Tool, embedding, search and graph latencies come from the tracing spans
+(see tracing.add_span_listener); pool and cache figures are read from their
+own stats() at scrape time.
+"""
+
+import os
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+
+from .tracing import add_span_listener
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Seconds; covers cache hits (ms) through slow LLM turns (a minute)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (
+        str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for v in values
+    )
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class _Metric:
+    """Base class: a named metric family with optional labels."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """Return (sample name, formatted labels, value) rows."""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """Render the family in text exposition format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Increase the counter for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            return [
+                (self.name, _format_labels(self.labelnames, key), value)
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Gauge(_Metric):
+    """Value read at scrape time from a callback."""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Dict[LabelValues, float]],
+        labelnames: Sequence[str] = (),
+        type_name: str = "gauge"
+    ):
+        """
+        Initialize gauge.
+
+        Args:
+            name: Metric name
+            documentation: Help text
+            collect: Returns {label values tuple: value} when scraped
+            labelnames: Label names
+            type_name: Exposed type ("counter" for totals kept elsewhere)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+        self.type_name = type_name
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [
+            (self.name, _format_labels(self.labelnames, key), float(value))
+            for key, value in sorted(self.collect().items())
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [per-bucket counts, sum, count]
+        self._series: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels):
+        """Record one observation for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of a block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        rows = []
+        with self._lock:
+            for key, (bucket_counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    rows.append((
+                        f"{self.name}_bucket",
+                        _format_labels(self.labelnames + ("le",), key + (_format_value(bound),)),
+                        cumulative
+                    ))
+                labels = _format_labels(self.labelnames, key)
+                rows.append((f"{self.name}_sum", labels, total))
+                rows.append((f"{self.name}_count", labels, count))
+        return rows
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them for /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        """Add a metric family (names must be unique)."""
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Render every family in Prometheus text exposition format.
+
+        Returns:
+            Exposition text (ends with a newline)
+        """
+        families = []
+        for metric in self._metrics.values():
+            try:
+                families.append(metric.render())
+            except Exception as e:
+                # One broken collector must not take the endpoint down
+                logger.warning(f"Failed to collect metric {metric.name}: {e}")
+        return "\n".join(families) + "\n"
+
+
+# Global registry
+registry = MetricsRegistry()
+
+# Request path
+chat_turn_seconds = registry.register(Histogram(
+    "rag_chat_turn_seconds", "Chat turn latency from request to final response.", ["endpoint", "status"]
+))
+chat_first_token_seconds = registry.register(Histogram(
+    "rag_chat_first_token_seconds", "Streamed chat latency until the first text token is sent."
+))
+tool_call_seconds = registry.register(Histogram(
+    "rag_tool_call_seconds", "Agent tool call latency (cache hits included).", ["tool_name", "status"]
+))
+embedding_seconds = registry.register(Histogram(
+    "rag_embedding_seconds", "Query embedding latency (cache hits included).", ["status"]
+))
+search_seconds = registry.register(Histogram(
+    "rag_search_seconds", "Retrieval latency by search kind.", ["kind", "status"]
+))
+graph_call_seconds = registry.register(Histogram(
+    "rag_graph_call_seconds", "Knowledge graph (Graphiti/Neo4j) call latency.", ["operation", "status"]
+))
+
+# LLM usage reported by pydantic-ai run results
+llm_requests_total = registry.register(Counter(
+    "rag_llm_requests_total", "LLM requests made by agent runs."
+))
+llm_tokens_total = registry.register(Counter(
+    "rag_llm_tokens_total", "LLM tokens used by agent runs.", ["type"]
+))
+
+
+def record_usage(usage: Any):
+    """
+    Count LLM requests and tokens from a pydantic-ai run's usage().
+
+    Args:
+        usage: pydantic_ai.usage.RunUsage (or None)
+    """
+    if usage is None:
+        return
+    llm_requests_total.inc(usage.requests or 0)
+    llm_tokens_total.inc(usage.input_tokens or 0, type="input")
+    llm_tokens_total.inc(usage.output_tokens or 0, type="output")
+
+
+# Span name prefix -> (histogram, label name for the span's operation)
+_SPAN_HISTOGRAMS: Dict[str, Tuple[Histogram, Optional[str]]] = {
+    "tool": (tool_call_seconds, "tool_name"),
+    "embedding": (embedding_seconds, None),
+    "search": (search_seconds, "kind"),
+    "graph": (graph_call_seconds, "operation"),
+}
+
+
+def observe_span(name: str, seconds: float, error: Optional[str]):
+    """Span listener feeding the latency histograms."""
+    stage, _, operation = name.partition(".")
+    target = _SPAN_HISTOGRAMS.get(stage)
+    if target is None:
+        return
+
+    histogram, label = target
+    labels = {"status": "error" if error else "ok"}
+    if label:
+        labels[label] = operation
+    histogram.observe(seconds, **labels)
+
+    # Graph searches are retrieval too
+    if name == "graph.search":
+        search_seconds.observe(seconds, kind="graph", status=labels["status"])
+
+
+def register_gauge(
+    name: str,
+    documentation: str,
+    collect: Callable[[], Dict[LabelValues, float]],
+    labelnames: Sequence[str] = (),
+    type_name: str = "gauge"
+) -> Gauge:
+    """
+    Register a metric whose values are read from a callback at scrape time.
+
+    Args:
+        name: Metric name
+        documentation: Help text
+        collect: Returns {label values tuple: value}
+        labelnames: Label names
+        type_name: "gauge", or "counter" for totals kept by another component
+
+    Returns:
+        The metric
+    """
+    return registry.register(Gauge(name, documentation, collect, labelnames, type_name))
+
+
+if METRICS_ENABLED:
+    add_span_listener(observe_span)
@@ -23,6 +23,12 @@ class SearchType(str, Enum):
     GRAPH = "graph"
 
 
+class FusionMode(str, Enum):
+    """Hybrid search score fusion enumeration."""
+    WEIGHTED = "weighted"
+    RRF = "rrf"
+
+
 # Request Models
 class ChatRequest(BaseModel):
     """Chat request model."""
@@ -41,6 +47,8 @@ class SearchRequest(BaseModel):
     search_type: SearchType = Field(default=SearchType.HYBRID, description="Type of search")
     limit: int = Field(default=10, ge=1, le=50, description="Maximum results")
     filters: Dict[str, Any] = Field(default_factory=dict, description="Search filters")
+    text_weight: float = Field(default=0.3, ge=0.0, le=1.0, description="Weight for text matches in hybrid search")
+    fusion: FusionMode = Field(default=FusionMode.WEIGHTED, description="Hybrid search score fusion")
     
     model_config = ConfigDict(use_enum_values=True)
 
@@ -219,6 +227,7 @@ class IngestionConfig(BaseModel):
     extract_entities: bool = True
     # New option for faster ingestion
     skip_graph_building: bool = Field(default=False, description="Skip knowledge graph building for faster ingestion")
+    build_drug_profiles: bool = Field(default=True, description="Materialize drug profiles after ingestion")
     
     @field_validator('chunk_overlap')
     @classmethod
@@ -0,0 +1,324 @@
+"""
+Reranking of retrieved chunks.
+
+The search tools fetch a wide candidate set cheaply (index-backed vector or
+hybrid search) and a reranker reorders it before the short list goes to the
+agent. Rerankers are pluggable through RERANKER:
+
+- "features" (default): CPU-only scorer combining BM25 over the candidate
+  set, the stored embedding similarity, query term coverage and bigram
+  matches. Tokenized chunks are cached by chunk ID.
+- "cross_encoder": a local sentence-transformers CrossEncoder (optional
+  dependency), scored in batches off the event loop. Pair scores are cached
+  by (query, chunk ID).
+- "none": keep retrieval order.
+"""
+
+import os
+import re
+import math
+import asyncio
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .cache_utils import TTLCache
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Reranker configuration
+RERANKER = os.getenv("RERANKER", "features").lower()  # features, cross_encoder, none
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "40"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "32"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "20000"))
+RERANK_CACHE_TTL_SECONDS = float(os.getenv("RERANK_CACHE_TTL_SECONDS", "3600"))
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# Feature weights for the "features" reranker
+FEATURE_WEIGHTS = {
+    "dense": 0.45,
+    "bm25": 0.35,
+    "coverage": 0.15,
+    "bigram": 0.05
+}
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the "
+    "this to was were what when which who will with should patient patients".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase word tokens without stopwords.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    return [t for t in _TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _bigrams(tokens: List[str]) -> set:
+    return set(zip(tokens, tokens[1:]))
+
+
+def _min_max(values: List[float]) -> List[float]:
+    low, high = min(values), max(values)
+    if high - low <= 0:
+        return [1.0 if high > 0 else 0.0 for _ in values]
+    return [(v - low) / (high - low) for v in values]
+
+
+def _chunk_key(candidate: Dict[str, Any]) -> Any:
+    return candidate.get("chunk_id") or hash(candidate.get("content", ""))
+
+
+def _dense_score(candidate: Dict[str, Any]) -> float:
+    # Hybrid rows carry the raw cosine separately from the fused score
+    value = candidate.get("vector_similarity")
+    if value is None:
+        value = candidate.get("similarity")
+    return float(value or 0.0)
+
+
+@dataclass
+class _ChunkTerms:
+    """Tokenized chunk kept in the feature cache."""
+    counts: Counter
+    length: int
+    bigrams: set
+
+
+class Reranker:
+    """Base reranker: keeps retrieval order."""
+
+    name = "none"
+    cache: Optional[TTLCache] = None
+
+    async def score(self, query: str, candidates: List[Dict[str, Any]]) -> List[float]:
+        """
+        Score candidates for a query (higher is better).
+
+        Args:
+            query: Search query
+            candidates: Search result dictionaries
+
+        Returns:
+            One score per candidate
+        """
+        return [float(len(candidates) - i) / len(candidates) for i in range(len(candidates))]
+
+    async def rerank(
+        self,
+        query: str,
+        candidates: List[Dict[str, Any]],
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Reorder candidates by rerank score.
+
+        Each returned dictionary is a copy with a "rerank_score" key.
+
+        Args:
+            query: Search query
+            candidates: Search result dictionaries
+            limit: Number of results to keep (None keeps all)
+
+        Returns:
+            Candidates ordered best first
+        """
+        if not candidates:
+            return []
+
+        scores = await self.score(query, candidates)
+        ranked = sorted(
+            ({**candidate, "rerank_score": round(float(s), 6)} for candidate, s in zip(candidates, scores)),
+            key=lambda c: c["rerank_score"],
+            reverse=True
+        )
+        return ranked[:limit] if limit is not None else ranked
+
+    def stats(self) -> Dict[str, Any]:
+        """Get reranker and cache statistics."""
+        stats = {"reranker": self.name}
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+
+class FeatureReranker(Reranker):
+    """BM25 + embedding similarity + term coverage feature scorer."""
+
+    name = "features"
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize reranker.
+
+        Args:
+            weights: Feature weights (defaults to FEATURE_WEIGHTS)
+        """
+        self.weights = weights or FEATURE_WEIGHTS
+        self.cache = TTLCache(
+            max_size=RERANK_CACHE_SIZE,
+            ttl_seconds=RERANK_CACHE_TTL_SECONDS,
+            name="rerank_terms"
+        )
+
+    def _terms(self, candidate: Dict[str, Any]) -> _ChunkTerms:
+        key = _chunk_key(candidate)
+        terms = self.cache.get(key)
+        if terms is None:
+            tokens = tokenize(candidate.get("content", ""))
+            terms = _ChunkTerms(counts=Counter(tokens), length=len(tokens), bigrams=_bigrams(tokens))
+            self.cache.set(key, terms)
+        return terms
+
+    def features(self, query: str, candidates: List[Dict[str, Any]]) -> Dict[str, List[float]]:
+        """
+        Compute the normalized feature columns for a candidate set.
+
+        BM25 statistics (document frequency, average length) come from the
+        candidate set itself, which is what the reranker gets to see.
+
+        Args:
+            query: Search query
+            candidates: Search result dictionaries
+
+        Returns:
+            Feature name -> one value per candidate (0-1)
+        """
+        query_tokens = tokenize(query)
+        query_terms = set(query_tokens)
+        query_bigrams = _bigrams(query_tokens)
+        chunks = [self._terms(c) for c in candidates]
+
+        n = len(chunks)
+        average_length = sum(c.length for c in chunks) / n or 1.0
+        idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term in query_terms
+            for df in [sum(1 for c in chunks if term in c.counts)]
+        }
+        total_idf = sum(idf.values()) or 1.0
+
+        bm25, coverage, bigram = [], [], []
+        for chunk in chunks:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk.length / average_length)
+            bm25.append(sum(
+                idf[term] * chunk.counts[term] * (BM25_K1 + 1) / (chunk.counts[term] + norm)
+                for term in query_terms if term in chunk.counts
+            ))
+            coverage.append(sum(idf[term] for term in query_terms if term in chunk.counts) / total_idf)
+            bigram.append(len(query_bigrams & chunk.bigrams) / len(query_bigrams) if query_bigrams else 0.0)
+
+        return {
+            "dense": _min_max([_dense_score(c) for c in candidates]),
+            "bm25": _min_max(bm25),
+            "coverage": coverage,
+            "bigram": bigram
+        }
+
+    async def score(self, query: str, candidates: List[Dict[str, Any]]) -> List[float]:
+        columns = self.features(query, candidates)
+        return [
+            sum(self.weights[name] * columns[name][i] for name in self.weights)
+            for i in range(len(candidates))
+        ]
+
+
+class CrossEncoderReranker(Reranker):
+    """Local cross-encoder (sentence-transformers) with a pair score cache."""
+
+    name = "cross_encoder"
+
+    def __init__(self, model_name: str = RERANKER_MODEL, batch_size: int = RERANK_BATCH_SIZE):
+        """
+        Initialize reranker and load the model.
+
+        Args:
+            model_name: sentence-transformers CrossEncoder model
+            batch_size: Pairs scored per model call
+
+        Raises:
+            ImportError: If sentence-transformers is not installed
+        """
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.cache = TTLCache(
+            max_size=RERANK_CACHE_SIZE,
+            ttl_seconds=RERANK_CACHE_TTL_SECONDS,
+            name="rerank_scores"
+        )
+        # One model call at a time; concurrent requests queue their batches
+        self._lock = asyncio.Lock()
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> List[float]:
+        return [float(s) for s in self.model.predict(pairs, batch_size=self.batch_size)]
+
+    async def score(self, query: str, candidates: List[Dict[str, Any]]) -> List[float]:
+        query_key = " ".join(query.lower().split())
+        scores: List[Optional[float]] = []
+        missing: List[int] = []
+        for i, candidate in enumerate(candidates):
+            cached = self.cache.get((query_key, _chunk_key(candidate)))
+            scores.append(cached)
+            if cached is None:
+                missing.append(i)
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            pairs = [(query, candidates[i].get("content", "")) for i in batch]
+            async with self._lock:
+                batch_scores = await asyncio.to_thread(self._predict, pairs)
+            for i, value in zip(batch, batch_scores):
+                scores[i] = value
+                self.cache.set((query_key, _chunk_key(candidates[i])), value)
+
+        return scores
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "model": self.model_name}
+
+
+def create_reranker(kind: str = RERANKER) -> Optional[Reranker]:
+    """
+    Create the configured reranker.
+
+    Args:
+        kind: "features", "cross_encoder" or "none"
+
+    Returns:
+        Reranker, or None when reranking is disabled
+    """
+    if kind == "none":
+        return None
+    if kind == "cross_encoder":
+        try:
+            return CrossEncoderReranker()
+        except ImportError:
+            logger.warning("sentence-transformers not installed; using the feature reranker")
+        except Exception as e:
+            logger.warning(f"Could not load cross-encoder {RERANKER_MODEL} ({e}); using the feature reranker")
+        return FeatureReranker()
+    if kind != "features":
+        logger.warning(f"Unknown RERANKER '{kind}'; using the feature reranker")
+    return FeatureReranker()
@@ -0,0 +1,334 @@
+"""
+Token budgeting for tool results.
+
+Search tools can hand the LLM tens of thousands of characters per call,
+and every tool round re-sends them as prompt tokens. Results are therefore
+packed into a per-call budget (TOOL_TOKEN_BUDGET) that is also capped by
+what is left of the turn's budget (TURN_TOKEN_BUDGET). Packing prefers the
+highest-scoring chunks, skips near-duplicates, spreads picks across source
+documents and truncates the last chunk that only partly fits.
+
+Token counts are a local estimate: 4 characters per token by default, or
+tiktoken's cl100k_base encoding with TOKEN_ESTIMATOR=tiktoken (the encoding
+file must already be in tiktoken's cache; it is not downloaded here).
+"""
+
+import os
+import json
+import logging
+import functools
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .metrics import registry, Counter
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Budget configuration (0 disables packing)
+TOOL_TOKEN_BUDGET = int(os.getenv("TOOL_TOKEN_BUDGET", "3000"))
+TURN_TOKEN_BUDGET = int(os.getenv("TURN_TOKEN_BUDGET", "12000"))
+
+# Smallest allowance a tool gets once the turn budget is spent, and the
+# smallest chunk remainder worth keeping when truncating
+TOOL_TOKEN_FLOOR = int(os.getenv("TOOL_TOKEN_FLOOR", "300"))
+MIN_CHUNK_TOKENS = int(os.getenv("MIN_CHUNK_TOKENS", "80"))
+
+# Score multiplier applied per chunk already taken from the same document
+DOCUMENT_DIVERSITY_DECAY = float(os.getenv("DOCUMENT_DIVERSITY_DECAY", "0.85"))
+
+# Word-set overlap above which a chunk counts as a near-duplicate
+NEAR_DUPLICATE_OVERLAP = 0.8
+
+TOKEN_ESTIMATOR = os.getenv("TOKEN_ESTIMATOR", "chars").lower()
+
+# Fields that hold the text of a result item, in lookup order
+TEXT_FIELDS = ("content", "fact", "summary")
+
+tool_result_tokens = registry.register(Counter(
+    "rag_tool_result_tokens_total", "Estimated tool result tokens kept for or trimmed from the LLM.", ["tool_name", "kind"]
+))
+
+_encoding = None
+
+
+def _load_encoding():
+    global _encoding, TOKEN_ESTIMATOR
+    try:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable ({e}); estimating 4 characters per token")
+        TOKEN_ESTIMATOR = "chars"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in text.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    if TOKEN_ESTIMATOR == "tiktoken":
+        if _encoding is None:
+            _load_encoding()
+        if _encoding is not None:
+            return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut text to roughly max_tokens, preferring a word boundary.
+
+    Args:
+        text: Text to truncate
+        max_tokens: Token allowance
+
+    Returns:
+        Truncated text (with an ellipsis) or the original if it fits
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    if TOKEN_ESTIMATOR == "tiktoken" and _encoding is not None:
+        cut = _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        cut = text[:max_tokens * 4]
+
+    space = cut.rfind(" ")
+    if space > len(cut) * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + " …"
+
+
+def _cost(value: Any) -> int:
+    if isinstance(value, str):
+        return count_tokens(value)
+    return count_tokens(json.dumps(value, default=str))
+
+
+def _text_field(item: Any) -> Optional[str]:
+    if isinstance(item, dict):
+        for name in TEXT_FIELDS:
+            if isinstance(item.get(name), str):
+                return name
+    return None
+
+
+def _word_set(item: Any) -> frozenset:
+    field = _text_field(item)
+    text = item[field] if field else item if isinstance(item, str) else ""
+    return frozenset(text.lower().split()[:80])
+
+
+def _is_near_duplicate(words: frozenset, kept: List[frozenset]) -> bool:
+    if not words:
+        return False
+    for other in kept:
+        if other and len(words & other) / len(words | other) >= NEAR_DUPLICATE_OVERLAP:
+            return True
+    return False
+
+
+def pack_items(items: List[Any], budget: int) -> Tuple[List[Any], int]:
+    """
+    Select result items that fit a token budget.
+
+    Items with a "score" are considered best first, with a score decay for
+    each item already taken from the same document; unscored items keep
+    their order. Near-duplicates are skipped, and the first item that does
+    not fit is truncated if a useful remainder is left.
+
+    Args:
+        items: Result items (dicts or strings)
+        budget: Token allowance
+
+    Returns:
+        Tuple of (kept items, tokens used)
+    """
+    scored = [i for i, item in enumerate(items) if isinstance(item, dict) and isinstance(item.get("score"), (int, float))]
+    remaining_order = list(range(len(items)))
+    if len(scored) == len(items):
+        remaining_order.sort(key=lambda i: items[i]["score"], reverse=True)
+
+    kept: List[Any] = []
+    kept_words: List[frozenset] = []
+    per_document: Dict[str, int] = {}
+    used = 0
+
+    while remaining_order:
+        # Re-rank by decayed score so later picks favour other documents
+        if len(scored) == len(items):
+            remaining_order.sort(
+                key=lambda i: items[i]["score"] * DOCUMENT_DIVERSITY_DECAY ** per_document.get(
+                    str(items[i].get("document_title") or items[i].get("document") or ""), 0
+                ),
+                reverse=True
+            )
+        index = remaining_order.pop(0)
+        item = items[index]
+
+        words = _word_set(item)
+        if _is_near_duplicate(words, kept_words):
+            continue
+
+        cost = _cost(item)
+        truncated = False
+        if used + cost > budget:
+            field = _text_field(item)
+            left = budget - used - (cost - count_tokens(item[field]) if field else 0)
+            if left < MIN_CHUNK_TOKENS or not (field or isinstance(item, str)):
+                break
+            if field:
+                item = {**item, field: truncate_to_tokens(item[field], left)}
+            else:
+                item = truncate_to_tokens(item, left)
+            words = _word_set(item)
+            cost = _cost(item)
+            truncated = True
+
+        kept.append(item)
+        kept_words.append(words)
+        used += cost
+        if isinstance(item, dict):
+            document = str(item.get("document_title") or item.get("document") or "")
+            per_document[document] = per_document.get(document, 0) + 1
+
+        if truncated:
+            # The budget is spent
+            break
+
+    return kept, used
+
+
+def pack_result(result: Any, budget: int) -> Tuple[Any, int]:
+    """
+    Fit a tool result into a token budget.
+
+    Lists are packed item by item. For dict results, scalar and nested
+    dict fields are always kept and list fields share what is left, in
+    field order (so e.g. contraindications come before related content).
+
+    Args:
+        result: Tool result
+        budget: Token allowance
+
+    Returns:
+        Tuple of (packed result, tokens used)
+    """
+    if isinstance(result, list):
+        return pack_items(result, budget)
+
+    if not isinstance(result, dict):
+        return result, _cost(result)
+
+    packed = {}
+    used = 0
+    for key, value in result.items():
+        if not isinstance(value, list):
+            packed[key] = value
+            used += _cost(value)
+
+    for key, value in result.items():
+        if isinstance(value, list):
+            packed[key], field_used = pack_items(value, max(budget - used, 0))
+            used += field_used
+
+    # Keep the original field order
+    return {key: packed[key] for key in result}, used
+
+
+class TokenBudget:
+    """Token allowance for the tool results of one agent run."""
+
+    def __init__(
+        self,
+        turn_budget: int = TURN_TOKEN_BUDGET,
+        tool_budget: int = TOOL_TOKEN_BUDGET
+    ):
+        """
+        Initialize budget.
+
+        Args:
+            turn_budget: Tokens all tool results of the turn may use
+            tool_budget: Tokens a single tool call may use
+        """
+        self.turn_budget = turn_budget
+        self.tool_budget = tool_budget
+        self.used = 0
+        self.saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether packing is active."""
+        return self.tool_budget > 0
+
+    def allowance(self) -> int:
+        """Tokens available to the next tool call."""
+        remaining = max(self.turn_budget - self.used, 0) if self.turn_budget > 0 else self.tool_budget
+        return max(min(self.tool_budget, remaining), TOOL_TOKEN_FLOOR)
+
+    def fit(self, tool_name: str, result: Any) -> Any:
+        """
+        Pack a tool result into the next allowance and account for it.
+
+        Args:
+            tool_name: Tool name (for logging and metrics)
+            result: Tool result
+
+        Returns:
+            Packed result
+        """
+        if not self.enabled or not result:
+            return result
+
+        original = _cost(result)
+        allowance = self.allowance()
+        if original <= allowance:
+            self.used += original
+            tool_result_tokens.inc(original, tool_name=tool_name, kind="kept")
+            return result
+
+        packed, used = pack_result(result, allowance)
+        self.used += used
+        self.saved += original - used
+        tool_result_tokens.inc(used, tool_name=tool_name, kind="kept")
+        tool_result_tokens.inc(original - used, tool_name=tool_name, kind="trimmed")
+
+        logger.info(
+            f"Token budget: {tool_name} result packed from ~{original} to ~{used} tokens "
+            f"(saved ~{original - used}, turn used {self.used}/{self.turn_budget})"
+        )
+        return packed
+
+
+def budgeted_tool(fn: Callable) -> Callable:
+    """
+    Decorate an agent tool so its result is packed into ctx.deps.token_budget.
+
+    Sits outside @cached_tool, so cached results are stored in full and
+    packed per turn. The wrapper keeps the tool's signature and docstring.
+
+    Args:
+        fn: Async tool function taking the run context first
+
+    Returns:
+        Wrapped tool
+    """
+    @functools.wraps(fn)
+    async def wrapper(ctx, *args, **kwargs):
+        result = await fn(ctx, *args, **kwargs)
+
+        budget = getattr(ctx.deps, "token_budget", None)
+        if budget is None:
+            return result
+        return budget.fit(ctx.tool_name or fn.__name__, result)
+
+    return wrapper
@@ -0,0 +1,392 @@
+"""
+Result cache for agent tools.
+
+Entries are keyed by tool name, canonicalized arguments and the corpus
+version stamp that ingestion bumps whenever it writes chunks or graph
+episodes, so re-ingesting automatically makes every cached result
+unreachable. The in-memory layer is a bounded LRU/TTL cache; a shared
+PostgreSQL store can sit behind it for multi-worker deployments.
+"""
+
+import os
+import copy
+import json
+import time
+import asyncio
+import hashlib
+import inspect
+import logging
+import functools
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from .cache_utils import TTLCache
+from .embedding_utils import normalize_embedding_text
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+TOOL_CACHE_BACKEND = os.getenv("TOOL_CACHE_BACKEND", "memory").lower()
+TOOL_CACHE_MAX_SIZE = int(os.getenv("TOOL_CACHE_MAX_SIZE", "512"))
+TOOL_CACHE_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", "900"))
+
+# How long a worker trusts its last read of the corpus version
+CORPUS_VERSION_CHECK_SECONDS = float(os.getenv("CORPUS_VERSION_CHECK_SECONDS", "5"))
+
+# Reasons the running cached tool call's result must not be stored. A list
+# (not a flag) so stages running in child tasks, which copy the context,
+# still report into the same call.
+_uncacheable_reasons: ContextVar[Optional[List[str]]] = ContextVar("uncacheable_reasons", default=None)
+
+
+def _canonical_value(value: Any) -> Any:
+    if isinstance(value, str):
+        return normalize_embedding_text(value)
+    if isinstance(value, dict):
+        return {str(k): _canonical_value(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical_value(v) for v in value]
+    if hasattr(value, "value"):
+        # Enums
+        return _canonical_value(value.value)
+    return value
+
+
+def canonicalize_args(args: Dict[str, Any]) -> str:
+    """
+    Canonical JSON form of tool arguments.
+
+    Strings are whitespace/case normalized and keys sorted, so trivially
+    different calls ("Sildenafil " vs "sildenafil") share a key.
+    """
+    return json.dumps(_canonical_value(args), sort_keys=True, separators=(",", ":"), default=str)
+
+
+def tool_cache_key(tool_name: str, args: Dict[str, Any], corpus_version: int) -> str:
+    """
+    Build the cache key for a tool call.
+
+    Args:
+        tool_name: Tool name
+        args: Tool arguments (excluding the run context)
+        corpus_version: Current corpus version stamp
+
+    Returns:
+        Hex digest key
+    """
+    raw = f"{tool_name}\x00{corpus_version}\x00{canonicalize_args(args)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CorpusVersion:
+    """Worker-local view of a corpus version stamp, refreshed periodically."""
+
+    def __init__(self, check_seconds: float = CORPUS_VERSION_CHECK_SECONDS, name: str = "default"):
+        """
+        Initialize tracker.
+
+        Args:
+            check_seconds: Seconds between database reads of the version
+            name: Stamp name in the corpus_version table
+        """
+        self.check_seconds = check_seconds
+        self.name = name
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Optional[int]:
+        """
+        Get the current corpus version.
+
+        Returns:
+            Version stamp, or None if it has never been readable
+        """
+        if self._version is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return self._version
+
+        async with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return self._version
+
+            from .db_utils import get_corpus_version
+
+            try:
+                self._version = await get_corpus_version(self.name)
+            except Exception as e:
+                # Keep serving against the last known version
+                logger.warning(f"Corpus version check failed ({self.name}): {e}")
+            self._checked_at = time.monotonic()
+
+        return self._version
+
+    @property
+    def last_known(self) -> Optional[int]:
+        """Most recently read version (no database access)."""
+        return self._version
+
+
+class PostgresToolResultStore:
+    """Tool result store backed by the tool_result_cache table."""
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        """
+        Initialize store.
+
+        Args:
+            ttl_seconds: Entry lifetime in seconds (None disables expiry)
+        """
+        self.ttl_seconds = ttl_seconds
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Get a tool result by cache key."""
+        from .db_utils import db_pool
+
+        async with db_pool.acquire() as conn:
+            row = await conn.fetchrow(
+                """
+                SELECT result
+                FROM tool_result_cache
+                WHERE cache_key = $1
+                AND ($2::float8 IS NULL
+                     OR created_at > CURRENT_TIMESTAMP - make_interval(secs => $2::float8))
+                """,
+                key,
+                self.ttl_seconds
+            )
+            return json.loads(row["result"]) if row else None
+
+    async def set(self, key: str, tool_name: str, corpus_version: int, result: Any):
+        """Store a tool result under a cache key."""
+        from .db_utils import db_pool
+
+        async with db_pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO tool_result_cache (cache_key, tool_name, corpus_version, result)
+                VALUES ($1, $2, $3, $4::jsonb)
+                ON CONFLICT (cache_key) DO UPDATE
+                SET result = EXCLUDED.result,
+                    created_at = CURRENT_TIMESTAMP
+                """,
+                key,
+                tool_name,
+                corpus_version,
+                json.dumps(result, default=str)
+            )
+
+
+class ToolResultCache:
+    """Two-level tool result cache (memory, then optional shared store)."""
+
+    def __init__(
+        self,
+        max_size: int = TOOL_CACHE_MAX_SIZE,
+        ttl_seconds: Optional[float] = TOOL_CACHE_TTL_SECONDS,
+        store: Optional[Any] = None,
+        corpus_version: Optional[CorpusVersion] = None
+    ):
+        """
+        Initialize cache.
+
+        Args:
+            max_size: Maximum in-memory entries
+            ttl_seconds: Entry lifetime in seconds
+            store: Optional shared store with async get/set
+            corpus_version: Corpus version tracker (part of every key)
+        """
+        self.memory = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds, name="tool_results")
+        self.store = store
+        self.corpus_version = corpus_version or CorpusVersion()
+
+        self.store_hits = 0
+        self.store_errors = 0
+        self.bypassed = 0
+        self.per_tool: Dict[str, Dict[str, int]] = {}
+        self._pending_writes: set = set()
+
+    def _count(self, tool_name: str, outcome: str):
+        counters = self.per_tool.setdefault(tool_name, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    async def get(self, tool_name: str, args: Dict[str, Any]) -> Optional[Any]:
+        """
+        Look up a cached tool result.
+
+        Args:
+            tool_name: Tool name
+            args: Tool arguments
+
+        Returns:
+            Copy of the cached result, or None on a miss
+        """
+        version = await self.corpus_version.get()
+        if version is None:
+            self.bypassed += 1
+            return None
+
+        key = tool_cache_key(tool_name, args, version)
+
+        result = self.memory.get(key)
+        if result is None and self.store is not None:
+            try:
+                result = await self.store.get(key)
+            except Exception as e:
+                self.store_errors += 1
+                logger.warning(f"Tool result store lookup failed: {e}")
+            if result is not None:
+                self.store_hits += 1
+                self.memory.set(key, result)
+
+        self._count(tool_name, "hits" if result is not None else "misses")
+        # Callers may mutate what they get back
+        return copy.deepcopy(result) if result is not None else None
+
+    async def set(self, tool_name: str, args: Dict[str, Any], result: Any):
+        """
+        Store a tool result. Shared-store writes happen in the background.
+
+        Args:
+            tool_name: Tool name
+            args: Tool arguments
+            result: JSON-serializable tool result
+        """
+        version = await self.corpus_version.get()
+        if version is None:
+            return
+
+        key = tool_cache_key(tool_name, args, version)
+        self.memory.set(key, copy.deepcopy(result))
+
+        if self.store is not None:
+            task = asyncio.create_task(self._write_through(key, tool_name, version, result))
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+
+    async def _write_through(self, key: str, tool_name: str, version: int, result: Any):
+        try:
+            await self.store.set(key, tool_name, version, result)
+        except Exception as e:
+            self.store_errors += 1
+            logger.warning(f"Tool result store write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache counters.
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        return {
+            "backend": type(self.store).__name__ if self.store else "memory",
+            "corpus_version": self.corpus_version.last_known,
+            "memory": self.memory.stats(),
+            "store_hits": self.store_hits,
+            "store_errors": self.store_errors,
+            "bypassed": self.bypassed,
+            "per_tool": self.per_tool
+        }
+
+
+def mark_result_uncacheable(reason: str):
+    """
+    Keep the result of the running cached tool call out of the cache.
+
+    For dependencies that degrade silently within one turn (e.g. an
+    exhausted per-turn search budget): the tool still answers, but the
+    partial result must not be served to later turns.
+
+    Args:
+        reason: Why the result is partial (for logging)
+    """
+    reasons = _uncacheable_reasons.get()
+    if reasons is not None:
+        reasons.append(reason)
+
+
+def _is_cacheable(result: Any) -> bool:
+    # Tools swallow errors and return empty results; don't pin those
+    if not result:
+        return False
+    if isinstance(result, dict) and result.get("error"):
+        return False
+    return True
+
+
+def cached_tool(cache: Optional[ToolResultCache], name: Optional[str] = None) -> Callable:
+    """
+    Decorate an agent tool so its results are served from the cache.
+
+    The first parameter (the run context) is excluded from the key. The
+    wrapper keeps the tool's signature and docstring, so it can sit under
+    @rag_agent.tool.
+
+    Args:
+        cache: Tool result cache (None disables caching)
+        name: Cache name for the tool (defaults to the function name)
+
+    Returns:
+        Decorator
+    """
+    def decorator(fn: Callable) -> Callable:
+        if cache is None:
+            return fn
+
+        tool_name = name or fn.__name__
+        signature = inspect.signature(fn)
+        context_param = next(iter(signature.parameters))
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            call_args = {k: v for k, v in bound.arguments.items() if k != context_param}
+
+            cached = await cache.get(tool_name, call_args)
+            if cached is not None:
+                logger.info(f"Tool cache hit for {tool_name}")
+                return cached
+
+            reasons: List[str] = []
+            token = _uncacheable_reasons.set(reasons)
+            try:
+                result = await fn(*args, **kwargs)
+            finally:
+                _uncacheable_reasons.reset(token)
+
+            if reasons:
+                logger.info(f"Not caching {tool_name} result: {reasons[0]}")
+            elif _is_cacheable(result):
+                await cache.set(tool_name, call_args, result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def create_tool_result_cache(backend: str = TOOL_CACHE_BACKEND) -> Optional[ToolResultCache]:
+    """
+    Create the tool result cache for the configured backend.
+
+    Args:
+        backend: "memory", "postgres" or "none"
+
+    Returns:
+        Tool result cache, or None if caching is disabled
+    """
+    if backend == "none":
+        return None
+
+    store = None
+    if backend == "postgres":
+        store = PostgresToolResultStore(ttl_seconds=TOOL_CACHE_TTL_SECONDS)
+    elif backend != "memory":
+        logger.warning(f"Unknown TOOL_CACHE_BACKEND '{backend}', using memory only")
+
+    return ToolResultCache(store=store)
@@ -0,0 +1,183 @@
+"""
+Per-run collection of tool calls and sources.
+
+Every agent tool reports its structured result to the run's collector (held
+in AgentDependencies) the moment it returns, so the API builds tool call
+lists and citations from objects it already has instead of walking and
+re-parsing all_messages() after the run.
+"""
+
+import inspect
+import logging
+import functools
+from typing import Any, Callable, Dict, List, Optional
+
+from .models import ToolCall
+
+logger = logging.getLogger(__name__)
+
+
+def source_from_result_item(item: Any, tool_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Build a source citation from one tool result item.
+
+    Args:
+        item: One result dict as returned by the tool
+        tool_name: Name of the tool that produced it
+
+    Returns:
+        Source dictionary, or None if the item is not citable
+    """
+    if not isinstance(item, dict):
+        return None
+
+    # For vector/hybrid search results
+    if tool_name in ['vector_search', 'hybrid_search']:
+        content = item.get('content', '')
+        if content:
+            return {
+                'tool': tool_name,
+                'content': content[:300],
+                'document_title': item.get('document_title', 'CPG Document'),
+                'document_source': item.get('document_source', ''),
+                'score': round(float(item.get('score', 0.8)), 3)
+            }
+
+    # For graph search results
+    elif tool_name == 'graph_search':
+        fact = item.get('fact', '')
+        if fact:
+            return {
+                'tool': 'graph_search',
+                'content': fact,
+                'document_title': 'Knowledge Graph',
+                'document_source': 'graph',
+                'score': 1.0
+            }
+
+    # For drug info results
+    elif tool_name in ['get_drug_information', 'get_drug_info']:
+        info = item.get('drug_info') or item.get('info') or item.get('content', '')
+        if info:
+            return {
+                'tool': 'drug_info',
+                'content': str(info)[:300],
+                'document_title': f"Drug: {item.get('drug_name', 'Unknown')}",
+                'document_source': 'knowledge_graph',
+                'score': 1.0
+            }
+
+    return None
+
+
+def fallback_source() -> Dict[str, Any]:
+    """Default source reported when no tool returned citable content."""
+    return {
+        'tool': 'system',
+        'content': 'Response based on CPG clinical guidelines knowledge base.',
+        'document_title': 'CPG Guidelines',
+        'document_source': 'knowledge_base',
+        'score': 0.9
+    }
+
+
+class ToolRunCollector:
+    """Tool calls and deduplicated sources gathered during one agent run."""
+
+    def __init__(self):
+        self.tool_calls: List[ToolCall] = []
+        self.sources: List[Dict[str, Any]] = []
+        self._seen_content: set = set()
+        self._sources_by_call: Dict[str, List[Dict[str, Any]]] = {}
+
+    def record(
+        self,
+        tool_name: str,
+        args: Dict[str, Any],
+        tool_call_id: Optional[str],
+        result: Any
+    ) -> List[Dict[str, Any]]:
+        """
+        Record a finished tool call.
+
+        Args:
+            tool_name: Tool name
+            args: Arguments the tool was called with (excluding the run context)
+            tool_call_id: Model-assigned call ID
+            result: Structured tool result (None if the tool raised)
+
+        Returns:
+            Sources from this call that were not reported before
+        """
+        self.tool_calls.append(ToolCall(tool_name=tool_name, args=args, tool_call_id=tool_call_id))
+
+        items = result if isinstance(result, list) else [result]
+        new_sources = []
+        for item in items:
+            source = source_from_result_item(item, tool_name)
+            if source:
+                # Deduplicate by content
+                chunk_key = source['content'][:100]
+                if chunk_key not in self._seen_content:
+                    self._seen_content.add(chunk_key)
+                    new_sources.append(source)
+
+        self.sources.extend(new_sources)
+        if tool_call_id:
+            self._sources_by_call[tool_call_id] = new_sources
+        return new_sources
+
+    def sources_for(self, tool_call_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the new sources a tool call contributed.
+
+        Args:
+            tool_call_id: Model-assigned call ID
+
+        Returns:
+            Sources first seen in that call
+        """
+        return self._sources_by_call.get(tool_call_id, [])
+
+    def final_sources(self) -> List[Dict[str, Any]]:
+        """
+        Get all sources for the response, with the default source if none.
+
+        Returns:
+            List of source dictionaries
+        """
+        return list(self.sources) if self.sources else [fallback_source()]
+
+
+def collect_tool_result(fn: Callable) -> Callable:
+    """
+    Decorate an agent tool so its result is recorded in ctx.deps.tool_results.
+
+    The wrapper keeps the tool's signature and docstring, so it can sit
+    under @rag_agent.tool.
+
+    Args:
+        fn: Async tool function taking the run context first
+
+    Returns:
+        Wrapped tool
+    """
+    signature = inspect.signature(fn)
+    context_param = next(iter(signature.parameters))
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        ctx = bound.arguments[context_param]
+        collector = getattr(ctx.deps, "tool_results", None)
+
+        result = None
+        try:
+            result = await fn(*args, **kwargs)
+            return result
+        finally:
+            if collector is not None:
+                call_args = {k: v for k, v in bound.arguments.items() if k != context_param}
+                collector.record(ctx.tool_name or fn.__name__, call_args, ctx.tool_call_id, result)
+
+    return wrapper
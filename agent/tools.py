@@ -2,54 +2,295 @@
 Tools for the Pydantic AI agent.
 """
 
+import os
+import time
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
-
+from typing import List, Dict, Any, Optional, Awaitable
 
+import numpy as np
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 from .db_utils import (
     vector_search,
-    hybrid_search
+    multi_vector_search,
+    hybrid_search,
+    get_drug_profile
 )
 from .graph_utils import (
     search_knowledge_graph,
     get_entity_relationships,
     get_entity_node_with_summary
 )
-from .models import ChunkResult, GraphSearchResult
+from .models import ChunkResult, GraphSearchResult, FusionMode
 from .providers import get_embedding_client, get_embedding_model
+from .cache_utils import SingleFlight
+from .tool_cache import mark_result_uncacheable
+from .embedding_utils import (
+    EmbeddingBatcher,
+    create_embedding_cache,
+    embedding_cache_key,
+    normalize_embedding_text
+)
+from .tracing import traced
+from .rerank import RERANK_CANDIDATES, create_reranker
 
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Default hybrid search fusion ("weighted" or "rrf")
+HYBRID_SEARCH_FUSION = os.getenv("HYBRID_SEARCH_FUSION", FusionMode.WEIGHTED.value).lower()
+if HYBRID_SEARCH_FUSION not in {mode.value for mode in FusionMode}:
+    logger.warning(f"Unknown HYBRID_SEARCH_FUSION '{HYBRID_SEARCH_FUSION}', falling back to weighted")
+    HYBRID_SEARCH_FUSION = FusionMode.WEIGHTED.value
+
+# Per-stage timeout for the concurrent retrieval plan in get_drug_info_tool
+DRUG_INFO_STAGE_TIMEOUT = float(os.getenv("DRUG_INFO_STAGE_TIMEOUT", "15"))
+
+# Serve get_drug_info_tool from the precomputed drug_profiles table when possible
+DRUG_PROFILES_ENABLED = os.getenv("DRUG_PROFILES_ENABLED", "true").lower() == "true"
+
+# Maximal marginal relevance over vector/hybrid search candidates
+MMR_ENABLED = os.getenv("MMR_ENABLED", "true").lower() == "true"
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1 = pure relevance, 0 = pure diversity
+MMR_CANDIDATE_MULTIPLIER = int(os.getenv("MMR_CANDIDATE_MULTIPLIER", "3"))
+MMR_MAX_CANDIDATES = int(os.getenv("MMR_MAX_CANDIDATES", "60"))
+# Cosine similarity to an already selected chunk above which a candidate is dropped
+MMR_DUPLICATE_THRESHOLD = float(os.getenv("MMR_DUPLICATE_THRESHOLD", "0.95"))
+
+# Chunk reranker applied to the wide candidate set (None when RERANKER=none)
+reranker = create_reranker()
+
 # Initialize embedding client with flexible provider
 embedding_client = get_embedding_client()
 EMBEDDING_MODEL = get_embedding_model()
 
+# Query embedding cache (memory, optionally backed by Postgres or disk)
+embedding_cache = create_embedding_cache(EMBEDDING_MODEL)
 
+# Micro-batching dispatcher: concurrent query embeddings share one provider call
+embedding_batcher = EmbeddingBatcher(
+    embedding_client,
+    EMBEDDING_MODEL,
+    on_batch=(
+        (lambda elapsed_ms, size: embedding_cache.record_provider_call(elapsed_ms))
+        if embedding_cache is not None else None
+    )
+)
+
+# Single-flight groups: concurrent identical calls share one awaitable
+embedding_flights = SingleFlight("embedding")
+vector_search_flights = SingleFlight("vector_search")
+hybrid_search_flights = SingleFlight("hybrid_search")
+graph_search_flights = SingleFlight("graph_search")
+
+
+@traced("embedding.generate")
 async def generate_embedding(text: str) -> List[float]:
     """
     Generate embedding for text using OpenAI.
     
+    Repeated queries are served from the embedding cache, and concurrent
+    requests for the same text share a single provider call.
+    
     Args:
         text: Text to embed
     
     Returns:
         Embedding vector
     """
+    if embedding_cache is not None:
+        cached = await embedding_cache.get(text)
+        if cached is not None:
+            return cached
+    
+    return await embedding_flights.do(
+        embedding_cache_key(text, EMBEDDING_MODEL),
+        lambda: _embed_uncached(text)
+    )
+
+
+async def _embed_uncached(text: str) -> List[float]:
+    """Embed through the batching dispatcher and populate the cache."""
     try:
-        response = await embedding_client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=text
-        )
-        return response.data[0].embedding
+        embedding = await embedding_batcher.embed(text)
     except Exception as e:
         logger.error(f"Failed to generate embedding: {e}")
         raise
+    
+    if embedding_cache is not None:
+        await embedding_cache.set(text, embedding)
+    
+    return embedding
+
+
+async def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Generate embeddings for several texts.
+    
+    Cache misses are dispatched concurrently, so they travel to the
+    provider in a single batched request.
+    
+    Args:
+        texts: Texts to embed
+    
+    Returns:
+        Embedding vectors in input order
+    """
+    return list(await asyncio.gather(*(generate_embedding(text) for text in texts)))
+
+
+def get_embedding_cache_stats() -> Dict[str, Any]:
+    """
+    Get query embedding cache statistics.
+    
+    Returns:
+        Hit/miss counters and estimated provider latency saved
+    """
+    if embedding_cache is None:
+        return {"enabled": False, "batching": embedding_batcher.stats()}
+    return {"enabled": True, **embedding_cache.stats(), "batching": embedding_batcher.stats()}
+
+
+def get_reranker_stats() -> Dict[str, Any]:
+    """
+    Get chunk reranker statistics.
+    
+    Returns:
+        Reranker name and cache counters
+    """
+    if reranker is None:
+        return {"enabled": False}
+    return {"enabled": True, **reranker.stats()}
+
+
+def get_coalescing_stats() -> Dict[str, Any]:
+    """
+    Get single-flight statistics.
+    
+    Returns:
+        Per-group call, execution and deduplication counters
+    """
+    groups = [
+        embedding_flights,
+        vector_search_flights,
+        hybrid_search_flights,
+        graph_search_flights
+    ]
+    return {
+        "groups": {group.name: group.stats() for group in groups},
+        "total_deduplicated": sum(group.deduplicated for group in groups)
+    }
+
+
+def mmr_rerank(
+    query_embedding: List[float],
+    candidates: List[Dict[str, Any]],
+    limit: int,
+    score_key: str,
+    lambda_mult: float = MMR_LAMBDA,
+    duplicate_threshold: float = MMR_DUPLICATE_THRESHOLD
+) -> List[Dict[str, Any]]:
+    """
+    Select diverse top-k chunks by maximal marginal relevance.
+    
+    Relevance is the retrieval score (min-max scaled, so RRF and cosine
+    scores behave alike); redundancy is the cosine similarity between the
+    chunks' stored embeddings. Candidates nearly identical to a selected
+    chunk (overlapping splits, the same table as JSON and markdown) are
+    dropped outright.
+    
+    Args:
+        query_embedding: Query embedding (used when candidates lack a score)
+        candidates: Search results with an "embedding" array, best first
+        limit: Number of chunks to return
+        score_key: Result key holding the retrieval score
+        lambda_mult: Relevance/diversity trade-off (1 = relevance only)
+        duplicate_threshold: Similarity at which a candidate counts as a duplicate
+    
+    Returns:
+        Selected candidates in selection order
+    """
+    if len(candidates) <= 1:
+        return candidates[:limit]
+    
+    dimensions = len(query_embedding)
+    vectors = np.zeros((len(candidates), dimensions), dtype=np.float32)
+    for i, candidate in enumerate(candidates):
+        embedding = candidate.get("embedding")
+        if embedding is not None and len(embedding) == dimensions:
+            vectors[i] = embedding
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    
+    scores = np.array([c.get(score_key) or 0.0 for c in candidates], dtype=np.float32)
+    if not scores.any():
+        query = np.asarray(query_embedding, dtype=np.float32)
+        scores = vectors @ (query / (np.linalg.norm(query) or 1.0))
+    spread = scores.max() - scores.min()
+    relevance = (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+    
+    similarity = vectors @ vectors.T
+    max_similarity = np.zeros(len(candidates), dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected: List[int] = []
+    
+    while len(selected) < limit and available.any():
+        mmr = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        mmr[~available] = -np.inf
+        index = int(np.argmax(mmr))
+        selected.append(index)
+        available[index] = False
+        available &= similarity[index] < duplicate_threshold
+        np.maximum(max_similarity, similarity[index], out=max_similarity)
+    
+    dropped = len(candidates) - len(selected) - int(available.sum())
+    if dropped:
+        logger.debug(f"MMR dropped {dropped} near-duplicate chunks out of {len(candidates)} candidates")
+    
+    return [candidates[i] for i in selected]
+
+
+def _candidate_count(limit: int) -> int:
+    """Number of candidates to fetch for a final selection of limit chunks."""
+    count = limit
+    if MMR_ENABLED:
+        count = max(count, min(limit * MMR_CANDIDATE_MULTIPLIER, MMR_MAX_CANDIDATES))
+    if reranker is not None:
+        count = max(count, RERANK_CANDIDATES)
+    return count
+
+
+async def _select_chunks(
+    query: str,
+    embedding: List[float],
+    candidates: List[Dict[str, Any]],
+    limit: int,
+    score_key: str
+) -> List[Dict[str, Any]]:
+    """
+    Cut a wide candidate set down to the chunks sent to the agent.
+    
+    Args:
+        query: Search query
+        embedding: Query embedding
+        candidates: Search results, best first
+        limit: Number of chunks to keep
+        score_key: Result key holding the retrieval score
+    
+    Returns:
+        Reranked (rerank_score set) and diversified chunks
+    """
+    if reranker is not None:
+        candidates = await reranker.rerank(query, candidates)
+        score_key = "rerank_score"
+    
+    if MMR_ENABLED:
+        return mmr_rerank(embedding, candidates, limit, score_key)
+    return candidates[:limit]
 
 
 # Tool Input Models
@@ -69,12 +310,20 @@ class HybridSearchInput(BaseModel):
     query: str = Field(..., description="Search query")
     limit: int = Field(default=10, description="Maximum number of results")
     text_weight: float = Field(default=0.3, description="Weight for text similarity (0-1)")
+    fusion: FusionMode = Field(
+        default=FusionMode(HYBRID_SEARCH_FUSION),
+        description="Score fusion: 'weighted' mixes raw scores, 'rrf' uses reciprocal rank fusion"
+    )
 
 
 class EntityRelationshipInput(BaseModel):
     """Input for entity relationship query."""
     entity_name: str = Field(..., description="Name of the entity")
     depth: int = Field(default=2, description="Maximum traversal depth")
+    relationship_types: Optional[List[str]] = Field(
+        default=None,
+        description="Relationship types to follow (e.g. 'CONTRAINDICATED_WITH', 'CAUSES'); all if omitted"
+    )
 
 
 class DrugInteractionInput(BaseModel):
@@ -99,14 +348,22 @@ async def vector_search_tool(input_data: VectorSearchInput) -> List[ChunkResult]
     Returns:
         List of matching chunks
     """
-    try:
+    async def run_search() -> List[Dict[str, Any]]:
         # Generate embedding for the query
         embedding = await generate_embedding(input_data.query)
         
-        # Perform vector search
-        results = await vector_search(
+        # Fetch a wide candidate set, then rerank/diversify down to the limit
+        candidates = await vector_search(
             embedding=embedding,
-            limit=input_data.limit
+            limit=_candidate_count(input_data.limit),
+            include_embeddings=MMR_ENABLED
+        )
+        return await _select_chunks(input_data.query, embedding, candidates, input_data.limit, "similarity")
+    
+    try:
+        results = await vector_search_flights.do(
+            (normalize_embedding_text(input_data.query), input_data.limit),
+            run_search
         )
 
         # Convert to ChunkResult models
@@ -115,7 +372,7 @@ async def vector_search_tool(input_data: VectorSearchInput) -> List[ChunkResult]
                 chunk_id=str(r["chunk_id"]),
                 document_id=str(r["document_id"]),
                 content=r["content"],
-                score=r["similarity"],
+                score=r.get("rerank_score", r["similarity"]),
                 metadata=r["metadata"],
                 document_title=r["document_title"],
                 document_source=r["document_source"]
@@ -128,6 +385,66 @@ async def vector_search_tool(input_data: VectorSearchInput) -> List[ChunkResult]
         return []
 
 
+async def multi_vector_search_tool(
+    queries: List[str],
+    limit: int = 8,
+    limit_per_query: int = 5
+) -> List[ChunkResult]:
+    """
+    Perform vector search for several query variants at once.
+    
+    All variants are embedded in one provider call and searched in one
+    SQL statement; a chunk is returned only under its best-matching variant.
+    The merged candidates are then selected by MMR over their stored
+    embeddings, so variants hitting the same passage (overlapping splits,
+    repeated tables) do not crowd out the rest.
+    
+    Args:
+        queries: Query variants
+        limit: Maximum number of chunks returned
+        limit_per_query: Candidates fetched per variant
+    
+    Returns:
+        Selected chunks, most relevant first
+    """
+    try:
+        embeddings = await generate_embeddings(queries)
+        grouped = await multi_vector_search(
+            embeddings=embeddings,
+            limit=limit_per_query,
+            include_embeddings=MMR_ENABLED
+        )
+        
+        candidates = sorted(
+            (r for results in grouped for r in results),
+            key=lambda r: r["similarity"],
+            reverse=True
+        )
+        if MMR_ENABLED:
+            # The variants' centroid only matters if similarities are missing
+            centroid = np.mean(np.asarray(embeddings, dtype=np.float32), axis=0)
+            results = mmr_rerank(centroid, candidates, limit, "similarity")
+        else:
+            results = candidates[:limit]
+        
+        return [
+            ChunkResult(
+                chunk_id=str(r["chunk_id"]),
+                document_id=str(r["document_id"]),
+                content=r["content"],
+                score=r["similarity"],
+                metadata=r["metadata"],
+                document_title=r["document_title"],
+                document_source=r["document_source"]
+            )
+            for r in results
+        ]
+        
+    except Exception as e:
+        logger.error(f"Multi-query vector search failed: {e}")
+        return []
+
+
 async def graph_search_tool(input_data: GraphSearchInput) -> List[GraphSearchResult]:
     """
     Search the knowledge graph.
@@ -139,8 +456,9 @@ async def graph_search_tool(input_data: GraphSearchInput) -> List[GraphSearchRes
         List of graph search results
     """
     try:
-        results = await search_knowledge_graph(
-            query=input_data.query
+        results = await graph_search_flights.do(
+            normalize_embedding_text(input_data.query),
+            lambda: search_knowledge_graph(query=input_data.query)
         )
         
         # Convert to GraphSearchResult models
@@ -170,16 +488,30 @@ async def hybrid_search_tool(input_data: HybridSearchInput) -> List[ChunkResult]
     Returns:
         List of matching chunks
     """
-    try:
+    async def run_search() -> List[Dict[str, Any]]:
         # Generate embedding for the query
         embedding = await generate_embedding(input_data.query)
         
-        # Perform hybrid search
-        results = await hybrid_search(
+        # Fetch a wide candidate set, then rerank/diversify down to the limit
+        candidates = await hybrid_search(
             embedding=embedding,
             query_text=input_data.query,
-            limit=input_data.limit,
-            text_weight=input_data.text_weight
+            limit=_candidate_count(input_data.limit),
+            text_weight=input_data.text_weight,
+            fusion=input_data.fusion.value,
+            include_embeddings=MMR_ENABLED
+        )
+        return await _select_chunks(input_data.query, embedding, candidates, input_data.limit, "combined_score")
+    
+    try:
+        results = await hybrid_search_flights.do(
+            (
+                normalize_embedding_text(input_data.query),
+                input_data.limit,
+                input_data.text_weight,
+                input_data.fusion.value
+            ),
+            run_search
         )
         
         # Convert to ChunkResult models
@@ -188,7 +520,7 @@ async def hybrid_search_tool(input_data: HybridSearchInput) -> List[ChunkResult]
                 chunk_id=str(r["chunk_id"]),
                 document_id=str(r["document_id"]),
                 content=r["content"],
-                score=r["combined_score"],
+                score=r.get("rerank_score", r["combined_score"]),
                 metadata=r["metadata"],
                 document_title=r["document_title"],
                 document_source=r["document_source"]
@@ -214,7 +546,8 @@ async def get_entity_relationships_tool(input_data: EntityRelationshipInput) ->
     try:
         return await get_entity_relationships(
             entity=input_data.entity_name,
-            depth=input_data.depth
+            depth=input_data.depth,
+            relationship_types=input_data.relationship_types
         )
         
     except Exception as e:
@@ -282,7 +615,82 @@ async def perform_comprehensive_search(
 # DRUG AND TREATMENT TOOLS
 # =============================================================================
 
+async def _run_stage(
+    name: str,
+    coro: Awaitable[Any],
+    timings: Dict[str, Any],
+    timeout: float = DRUG_INFO_STAGE_TIMEOUT
+) -> Any:
+    """
+    Await one retrieval stage with a timeout, recording its duration.
+    
+    Args:
+        name: Stage name used in timings and logs
+        coro: Stage coroutine
+        timings: Dictionary the stage timing is written into
+        timeout: Timeout in seconds
+    
+    Returns:
+        Stage result, or None if the stage timed out or failed (the partial
+        tool result is then kept out of the tool cache)
+    """
+    start_time = time.perf_counter()
+    status = "ok"
+    try:
+        return await asyncio.wait_for(coro, timeout=timeout)
+    except asyncio.TimeoutError:
+        status = "timeout"
+        logger.warning(f"Stage '{name}' timed out after {timeout}s")
+        mark_result_uncacheable(f"stage {name} {status}")
+        return None
+    except Exception as e:
+        status = "error"
+        logger.warning(f"Stage '{name}' failed: {e}")
+        mark_result_uncacheable(f"stage {name} {status}")
+        return None
+    finally:
+        timings[name] = {
+            "ms": round((time.perf_counter() - start_time) * 1000, 1),
+            "status": status
+        }
+
+
 async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]:
+    """
+    Get comprehensive information about a drug.
+    
+    Served from the precomputed drug_profiles table when the drug was
+    materialized at ingestion time (one indexed lookup), otherwise built
+    live by get_live_drug_info.
+    
+    Args:
+        input_data: Drug name to look up
+    
+    Returns:
+        Drug information with contraindications, dosages, side effects from the knowledge base
+    """
+    if DRUG_PROFILES_ENABLED:
+        start_time = time.perf_counter()
+        try:
+            stored = await get_drug_profile(input_data.drug_name)
+        except Exception as e:
+            logger.warning(f"Drug profile lookup failed for {input_data.drug_name}: {e}")
+            stored = None
+        
+        if stored:
+            result = stored["profile"]
+            result["metadata"] = {
+                "source": "drug_profiles",
+                "built_at": stored["built_at"],
+                "total_ms": round((time.perf_counter() - start_time) * 1000, 1)
+            }
+            logger.info(f"Served drug info for {input_data.drug_name} from drug_profiles")
+            return result
+    
+    return await get_live_drug_info(input_data)
+
+
+async def get_live_drug_info(input_data: DrugInteractionInput) -> Dict[str, Any]:
     """
     Get comprehensive information about a drug by dynamically searching
     the knowledge graph and document chunks.
@@ -292,6 +700,10 @@ async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]
     2. Knowledge graph search (for related facts)
     3. Vector search on document chunks (multiple targeted searches)
     
+    The graph stages run concurrently; the vector search starts as soon as
+    the entity lookup returns, since its query is built from the summary.
+    Per-stage timings are reported in result["metadata"].
+    
     Args:
         input_data: Drug name to look up
     
@@ -301,6 +713,9 @@ async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]
     drug = input_data.drug_name
     logger.info(f"Getting drug information for: {drug}")
     
+    start_time = time.perf_counter()
+    stage_timings: Dict[str, Any] = {}
+    
     result = {
         "drug_name": drug,
         "entity_summary": None,  # NEW: Direct from Neo4j node
@@ -311,12 +726,34 @@ async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]
         "related_content": []
     }
     
-    # ==========================================================================
-    # STEP 0: Get entity node directly from Neo4j (contains rich summary info!)
-    # This is the most important step - the summary has dosages, side effects, etc.
-    # ==========================================================================
+    # Independent graph stages start immediately and overlap with everything else
+    graph_task = asyncio.create_task(_run_stage(
+        "graph_search",
+        graph_search_tool(GraphSearchInput(
+            query=f"{drug} contraindication dosage adverse effect side effect"
+        )),
+        stage_timings
+    ))
+    relationships_task = asyncio.create_task(_run_stage(
+        "entity_relationships",
+        get_entity_relationships_tool(EntityRelationshipInput(
+            entity_name=drug,
+            depth=1,
+            relationship_types=["CONTRAINDICATED_WITH", "HAS_DOSAGE", "CAUSES"]
+        )),
+        stage_timings
+    ))
+    
     try:
-        entity_nodes = await get_entity_node_with_summary(drug, fuzzy_match=True)
+        # ======================================================================
+        # STEP 0: Get entity node directly from Neo4j (contains rich summary info!)
+        # This is the most important step - the summary has dosages, side effects, etc.
+        # ======================================================================
+        entity_nodes = await _run_stage(
+            "entity_lookup",
+            get_entity_node_with_summary(drug, fuzzy_match=True),
+            stage_timings
+        )
         
         if entity_nodes:
             logger.info(f"Found {len(entity_nodes)} entity nodes for '{drug}'")
@@ -348,20 +785,70 @@ async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]
                     # Extract adverse events
                     if any(kw in summary_lower for kw in ['headache', 'flushing', 'side effect', 'adverse', 'myalgia']):
                         result["adverse_events"].append(f"[From {name}]: {summary}")
-        else:
+        elif entity_nodes is not None:
             logger.info(f"No entity nodes found for '{drug}'")
+        
+        # ======================================================================
+        # STEP 3: Dynamic vector search - query built from entity summary keywords
+        # This adapts automatically to new documents without manual updates!
+        # ======================================================================
+        
+        # Extract keywords dynamically from entity summary (if available)
+        dynamic_keywords = set()
+        
+        # Base keywords (minimal fallback)
+        base_keywords = {"dose", "mg", "contraindication", "side effect", "adverse"}
+        
+        if result.get("entity_summary") and result["entity_summary"].get("summary"):
+            summary = result["entity_summary"]["summary"]
             
-    except Exception as e:
-        logger.warning(f"Entity node lookup failed for {drug}: {e}")
+            # Extract important terms from the summary
+            summary_lower = summary.lower()
+            
+            # Add drug-specific terms found in summary
+            keyword_patterns = [
+                "mg", "dose", "initial", "max", "daily", "on-demand",
+                "onset", "duration", "hours", "minutes", 
+                "headache", "flushing", "myalgia", "back pain",
+                "contraindicated", "avoid", "nitrate", "riociguat",
+                "effective", "improved", "side effect", "adverse"
+            ]
+            
+            for kw in keyword_patterns:
+                if kw in summary_lower:
+                    dynamic_keywords.add(kw)
+            
+            logger.info(f"Extracted {len(dynamic_keywords)} keywords from entity summary for '{drug}'")
+        
+        # Combine with base keywords if we didn't find many dynamic ones
+        all_keywords = dynamic_keywords if len(dynamic_keywords) >= 3 else dynamic_keywords.union(base_keywords)
+        
+        # Build dynamic query
+        dynamic_query = f"{drug} " + " ".join(all_keywords)
+        logger.info(f"Dynamic vector search query: {dynamic_query[:100]}...")
+        
+        search_results, graph_results, relationships = await asyncio.gather(
+            _run_stage(
+                "vector_search",
+                vector_search_tool(VectorSearchInput(
+                    query=dynamic_query,
+                    limit=10
+                )),
+                stage_timings
+            ),
+            graph_task,
+            relationships_task
+        )
+    finally:
+        # A cancelled or failed call must not leave graph stages running
+        for task in (graph_task, relationships_task):
+            if not task.done():
+                task.cancel()
     
     # ==========================================================================
-    # STEP 1: Search knowledge graph for related facts
+    # STEP 1: Knowledge graph facts
     # ==========================================================================
-    try:
-        graph_results = await graph_search_tool(GraphSearchInput(
-            query=f"{drug} contraindication dosage adverse effect side effect"
-        ))
-        
+    if graph_results is not None:
         for fact_result in graph_results:
             fact = fact_result.fact.lower() if hasattr(fact_result, 'fact') else str(fact_result).lower()
             result["related_facts"].append(fact_result.fact if hasattr(fact_result, 'fact') else str(fact_result))
@@ -375,20 +862,14 @@ async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]
                 result["adverse_events"].append(fact_result.fact if hasattr(fact_result, 'fact') else str(fact_result))
         
         logger.info(f"Graph search found {len(graph_results)} results for {drug}")
-                
-    except Exception as e:
-        logger.warning(f"Graph search failed for {drug}: {e}")
     
-    # 2. Get entity relationships from graph
-    try:
-        relationships = await get_entity_relationships_tool(EntityRelationshipInput(
-            entity_name=drug,
-            depth=2
-        ))
-        
+    # 2. Entity relationships from graph
+    if relationships is not None:
+        matched = set(relationships.get("matched_entities") or [])
         for rel in relationships.get("relationships", []):
             rel_type = rel.get("type", "")
-            target = rel.get("target", "")
+            # Edges are traversed in either direction; report the far end
+            target = rel.get("source", "") if rel.get("target") in matched else rel.get("target", "")
             
             if rel_type == "CONTRAINDICATED_WITH":
                 result["contraindications"].append(f"Contraindicated with {target}")
@@ -396,54 +877,11 @@ async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]
                 result["dosages"].append(target)
             elif rel_type == "CAUSES":
                 result["adverse_events"].append(target)
-                
-    except Exception as e:
-        logger.warning(f"Entity relationship query failed for {drug}: {e}")
-    
-    # ==========================================================================
-    # STEP 3: Dynamic vector search - query built from entity summary keywords
-    # This adapts automatically to new documents without manual updates!
-    # ==========================================================================
     
-    # Extract keywords dynamically from entity summary (if available)
-    dynamic_keywords = set()
-    
-    # Base keywords (minimal fallback)
-    base_keywords = {"dose", "mg", "contraindication", "side effect", "adverse"}
-    
-    if result.get("entity_summary") and result["entity_summary"].get("summary"):
-        summary = result["entity_summary"]["summary"]
-        
-        # Extract important terms from the summary
-        summary_lower = summary.lower()
-        
-        # Add drug-specific terms found in summary
-        keyword_patterns = [
-            "mg", "dose", "initial", "max", "daily", "on-demand",
-            "onset", "duration", "hours", "minutes", 
-            "headache", "flushing", "myalgia", "back pain",
-            "contraindicated", "avoid", "nitrate", "riociguat",
-            "effective", "improved", "side effect", "adverse"
-        ]
-        
-        for kw in keyword_patterns:
-            if kw in summary_lower:
-                dynamic_keywords.add(kw)
-        
-        logger.info(f"Extracted {len(dynamic_keywords)} keywords from entity summary for '{drug}'")
-    
-    # Combine with base keywords if we didn't find many dynamic ones
-    all_keywords = dynamic_keywords if len(dynamic_keywords) >= 3 else dynamic_keywords.union(base_keywords)
-    
-    # Build dynamic query
-    dynamic_query = f"{drug} " + " ".join(all_keywords)
-    logger.info(f"Dynamic vector search query: {dynamic_query[:100]}...")
-    
-    try:
-        search_results = await vector_search_tool(VectorSearchInput(
-            query=dynamic_query,
-            limit=10
-        ))
+    # Chunks come from one vector_search_tool call (or the fallback below when
+    # there are none), which already drops near-duplicates by MMR over the
+    # stored embeddings
+    if search_results is not None:
         for r in search_results:
             result["related_content"].append({
                 "content": r.content[:2000],
@@ -452,8 +890,6 @@ async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]
                 "search_type": "dynamic"
             })
         logger.info(f"Dynamic vector search found {len(search_results)} results for {drug}")
-    except Exception as e:
-        logger.warning(f"Dynamic vector search failed for {drug}: {e}")
     
     # ==========================================================================
     # STEP 4: Fallback search - only if Steps 0-3 didn't find enough info
@@ -468,10 +904,14 @@ async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]
             nitrate washout period caution warning
             """.strip().replace('\n', ' ')
             
-            fallback_results = await vector_search_tool(VectorSearchInput(
-                query=fallback_query,
-                limit=10
-            ))
+            fallback_results = await _run_stage(
+                "fallback_search",
+                vector_search_tool(VectorSearchInput(
+                    query=fallback_query,
+                    limit=10
+                )),
+                stage_timings
+            ) or []
             for r in fallback_results:
                 result["related_content"].append({
                     "content": r.content[:2000],
@@ -488,15 +928,11 @@ async def get_drug_info_tool(input_data: DrugInteractionInput) -> Dict[str, Any]
     result["dosages"] = list(set(result["dosages"]))
     result["adverse_events"] = list(set(result["adverse_events"]))
     
-    # Deduplicate related_content by content hash
-    seen_content = set()
-    unique_content = []
-    for item in result["related_content"]:
-        content_hash = hash(item["content"][:200])  # Use first 200 chars as hash
-        if content_hash not in seen_content:
-            seen_content.add(content_hash)
-            unique_content.append(item)
-    result["related_content"] = unique_content
+    result["metadata"] = {
+        "source": "live",
+        "stage_timings": stage_timings,
+        "total_ms": round((time.perf_counter() - start_time) * 1000, 1)
+    }
     
     logger.info(f"Drug info for {drug}: {len(result['contraindications'])} contraindications, "
                 f"{len(result['dosages'])} dosages, {len(result['adverse_events'])} adverse events, "
@@ -535,31 +971,24 @@ async def get_algorithm_pathway_tool(input_data: AlgorithmPathwayInput) -> Dict[
             f"after {current_step} {condition} management"
         ]
         
-        all_results = []
-        
-        # Search vector DB for pathway content
-        for q in queries[:2]:  # Limit to avoid too many calls
-            results = await vector_search_tool(VectorSearchInput(query=q, limit=5))
-            all_results.extend(results)
-        
-        # Search knowledge graph for related pathway facts
-        graph_results = await graph_search_tool(GraphSearchInput(
-            query=f"{current_step} {condition} pathway next"
-        ))
-        
-        # Deduplicate and structure results
-        seen_content = set()
-        pathway_steps = []
+        # All variants cost one embedding call and one DB round-trip;
+        # the graph search runs alongside them. MMR across the variants'
+        # hits drops near-duplicate chunks.
+        results, graph_results = await asyncio.gather(
+            multi_vector_search_tool(queries, limit=20, limit_per_query=5),
+            graph_search_tool(GraphSearchInput(
+                query=f"{current_step} {condition} pathway next"
+            ))
+        )
         
-        for r in all_results:
-            content_key = r.content[:100]
-            if content_key not in seen_content:
-                seen_content.add(content_key)
-                pathway_steps.append({
-                    "content": r.content[:600],
-                    "document": r.document_title,
-                    "score": r.score
-                })
+        pathway_steps = [
+            {
+                "content": r.content[:600],
+                "document": r.document_title,
+                "score": r.score
+            }
+            for r in results
+        ]
         
         # Extract pathway facts from graph
         pathway_facts = []
@@ -597,16 +1026,11 @@ async def get_chunk_with_context_tool(chunk_id: str) -> Dict[str, Any]:
     Returns:
         Chunk content with parent context
     """
-    from .db_utils import db_pool
+    from .db_utils import db_pool, run_prepared
     
     try:
         async with db_pool.acquire() as conn:
-            result = await conn.fetchrow(
-                """
-                SELECT * FROM get_chunk_with_parent_context($1::uuid)
-                """,
-                chunk_id
-            )
+            result = await run_prepared(conn, "get_chunk_with_parent_context", "fetchrow", chunk_id)
             
             if result:
                 return {
@@ -0,0 +1,377 @@
+"""
+Lightweight request tracing.
+
+A trace is opened per chat turn; spans opened anywhere underneath it (agent
+run, tool calls, embeddings, PostgreSQL queries, Neo4j calls) attach to it
+through contextvars, so nothing has to be threaded through call signatures.
+Outside a trace the helpers only feed registered span listeners (metrics).
+
+Finished traces can be logged or appended to a file as OpenTelemetry
+(OTLP/JSON) resource spans, and each trace summarizes itself into
+per-stage milliseconds for the ChatResponse metadata.
+"""
+
+import os
+import json
+import time
+import secrets
+import inspect
+import logging
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Tracing configuration
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "none").lower()  # none, log, otlp_json
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "agentic-rag-api")
+
+
+@dataclass
+class Span:
+    """A timed operation within a trace."""
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        """Span duration in milliseconds (0 while still open)."""
+        if self.end_ns is None:
+            return 0.0
+        return (self.end_ns - self.start_ns) / 1e6
+
+    @property
+    def stage(self) -> str:
+        """Stage the span counts towards ("db.query" -> "db")."""
+        return self.name.split(".", 1)[0]
+
+
+@dataclass
+class Trace:
+    """All spans recorded for one request."""
+    name: str
+    trace_id: str = field(default_factory=lambda: secrets.token_hex(16))
+    spans: List[Span] = field(default_factory=list)
+
+    @property
+    def root(self) -> Optional[Span]:
+        """The span opened by start_trace."""
+        return self.spans[0] if self.spans else None
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the trace into per-stage timings.
+
+        Stage totals are summed span durations, so concurrent spans (e.g.
+        parallel tool calls) can add up to more than the wall-clock time.
+        The "llm" figure is agent run time not spent inside tools.
+
+        Returns:
+            Dictionary with total_ms, per-stage ms/counts and per-tool ms
+        """
+        stages: Dict[str, Dict[str, float]] = {}
+        tools: Dict[str, float] = {}
+
+        for span in self.spans[1:]:
+            stage = stages.setdefault(span.stage, {"ms": 0.0, "count": 0})
+            stage["ms"] += span.duration_ms
+            stage["count"] += 1
+            if span.stage == "tool":
+                tool_name = span.name.split(".", 1)[-1]
+                tools[tool_name] = tools.get(tool_name, 0.0) + span.duration_ms
+
+        # Tool spans run inside the agent span; what is left is model time
+        agent_ms = stages.get("agent", {}).get("ms", 0.0)
+        tool_wall_ms = _union_ms([s for s in self.spans if s.stage == "tool"])
+        if agent_ms:
+            stages["llm"] = {"ms": max(agent_ms - tool_wall_ms, 0.0), "count": stages["agent"]["count"]}
+
+        # The root span is still open when a stream reports its timings
+        total_ms = 0.0
+        if self.root:
+            total_ms = ((self.root.end_ns or time.time_ns()) - self.root.start_ns) / 1e6
+
+        return {
+            "trace_id": self.trace_id,
+            "total_ms": round(total_ms, 2),
+            "stages": {
+                name: {"ms": round(values["ms"], 2), "count": int(values["count"])}
+                for name, values in sorted(stages.items())
+            },
+            "tools": {name: round(ms, 2) for name, ms in sorted(tools.items())}
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """
+        Export the trace as OTLP/JSON (one resourceSpans entry).
+
+        Returns:
+            Dictionary accepted by an OpenTelemetry collector's OTLP/HTTP JSON endpoint
+        """
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", TRACE_SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": __name__},
+                    "spans": [
+                        {
+                            "traceId": self.trace_id,
+                            "spanId": span.span_id,
+                            "parentSpanId": span.parent_id or "",
+                            "name": span.name,
+                            "kind": 1,  # SPAN_KIND_INTERNAL
+                            "startTimeUnixNano": str(span.start_ns),
+                            "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                            "attributes": [_otlp_attribute(k, v) for k, v in span.attributes.items()],
+                            "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+                        }
+                        for span in self.spans
+                    ]
+                }]
+            }]
+        }
+
+
+def _union_ms(spans: List[Span]) -> float:
+    """Wall-clock milliseconds covered by a set of (possibly overlapping) spans."""
+    intervals = sorted((s.start_ns, s.end_ns) for s in spans if s.end_ns is not None)
+    total = 0
+    current_start = current_end = None
+    for start, end in intervals:
+        if current_end is None or start > current_end:
+            if current_end is not None:
+                total += current_end - current_start
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start
+    return total / 1e6
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+# Called with (name, seconds, error) for every finished span, traced or not
+_span_listeners: List[Callable[[str, float, Optional[str]], None]] = []
+
+
+def add_span_listener(listener: Callable[[str, float, Optional[str]], None]):
+    """
+    Register a callback for finished spans (e.g. to feed latency metrics).
+
+    Once a listener exists, span() times operations even outside a trace.
+
+    Args:
+        listener: Callable taking (span name, duration in seconds, error or None)
+    """
+    _span_listeners.append(listener)
+
+
+def _notify(name: str, seconds: float, error: Optional[str]):
+    for listener in _span_listeners:
+        try:
+            listener(name, seconds, error)
+        except Exception as e:
+            logger.warning(f"Span listener failed: {e}")
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """Get the trace of the running request, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes) -> Iterator[Optional[Trace]]:
+    """
+    Open a trace for one request and export it when it ends.
+
+    Args:
+        name: Root span name
+        **attributes: Root span attributes
+
+    Yields:
+        The trace (None when tracing is disabled)
+    """
+    if not TRACING_ENABLED:
+        yield None
+        return
+
+    trace = Trace(name=name)
+    trace_token = _current_trace.set(trace)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_trace.reset(trace_token)
+        export_trace(trace)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a child of the current span.
+
+    Args:
+        name: Span name, "<stage>.<operation>" (e.g. "db.query", "tool.vector_search")
+        **attributes: Span attributes
+
+    Yields:
+        The span (None outside a trace)
+    """
+    trace = _current_trace.get()
+    if trace is None and not _span_listeners:
+        yield None
+        return
+
+    start_ns = time.time_ns()
+    current = None
+    span_token = None
+    if trace is not None:
+        parent = _current_span.get()
+        current = Span(
+            name=name,
+            span_id=secrets.token_hex(8),
+            parent_id=parent.span_id if parent else None,
+            start_ns=start_ns,
+            attributes=attributes
+        )
+        trace.spans.append(current)
+        span_token = _current_span.set(current)
+
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        end_ns = time.time_ns()
+        if current is not None:
+            current.end_ns = end_ns
+            current.error = error
+            _current_span.reset(span_token)
+        _notify(name, (end_ns - start_ns) / 1e9, error)
+
+
+def record_span(name: str, duration_seconds: float, error: Optional[str] = None, **attributes):
+    """
+    Record an already finished operation (e.g. from a completion callback).
+
+    Args:
+        name: Span name
+        duration_seconds: How long the operation took; it is assumed to end now
+        error: Error description if the operation failed
+        **attributes: Span attributes
+    """
+    _notify(name, duration_seconds, error)
+
+    trace = _current_trace.get()
+    if trace is None:
+        return
+
+    parent = _current_span.get()
+    end_ns = time.time_ns()
+    trace.spans.append(Span(
+        name=name,
+        span_id=secrets.token_hex(8),
+        parent_id=parent.span_id if parent else None,
+        start_ns=end_ns - int(duration_seconds * 1e9),
+        end_ns=end_ns,
+        attributes=attributes,
+        error=error
+    ))
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorate an async function so each call is a span.
+
+    The wrapper keeps the function's signature and docstring, so it can sit
+    under @rag_agent.tool.
+
+    Args:
+        name: Span name
+
+    Returns:
+        Decorator
+    """
+    def decorator(fn: Callable) -> Callable:
+        if not inspect.iscoroutinefunction(fn):
+            raise TypeError(f"traced() expects an async function, got {fn!r}")
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_query(record: Any):
+    """
+    asyncpg query logger that records each query as a db.query span.
+
+    asyncpg schedules loggers with call_soon from the querying task, so the
+    callback runs in that task's context and sees its current span.
+    """
+    if _current_trace.get() is None:
+        return
+
+    query = " ".join(record.query.split())
+    record_span(
+        "db.query",
+        record.elapsed,
+        error=f"{type(record.exception).__name__}: {record.exception}" if record.exception else None,
+        **{"db.system": "postgresql", "db.statement": query[:200]}
+    )
+
+
+def export_trace(trace: Trace):
+    """
+    Export a finished trace according to TRACE_EXPORT.
+
+    Args:
+        trace: Finished trace
+    """
+    if TRACE_EXPORT == "none":
+        return
+
+    try:
+        if TRACE_EXPORT == "log":
+            logger.info(f"Trace {trace.trace_id} {trace.name}: {json.dumps(trace.summary())}")
+        elif TRACE_EXPORT == "otlp_json":
+            with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(trace.to_otlp()) + "\n")
+        else:
+            logger.warning(f"Unknown TRACE_EXPORT '{TRACE_EXPORT}'")
+    except Exception as e:
+        logger.warning(f"Trace export failed: {e}")
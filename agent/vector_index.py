@@ -0,0 +1,504 @@
+"""
+Vector index management for the chunks.embedding column.
+
+Chooses between HNSW and IVFFlat for the current corpus size, rebuilds the
+index without blocking writes, derives per-query search settings
+(hnsw.ef_search / ivfflat.probes) from a recall target, and measures recall
+against exact search.
+
+Usage:
+    python -m agent.vector_index status
+    python -m agent.vector_index rebuild [--method hnsw|ivfflat]
+    python -m agent.vector_index tune --recall 0.95 [--max-latency-ms 50] [--apply]
+    python -m agent.vector_index recall [--sample 50] [--k 10]
+"""
+
+import math
+import time
+import random
+import asyncio
+import logging
+import argparse
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional
+
+import asyncpg
+from dotenv import load_dotenv
+
+from .db_utils import db_pool, initialize_database, close_database
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "idx_chunks_embedding"
+
+# Above this many rows an HNSW build gets slow and memory hungry;
+# IVFFlat builds in a fraction of the time at comparable recall with tuned probes
+HNSW_MAX_ROWS = 1_000_000
+
+# Candidate search settings tried by tune (smallest one meeting the target wins)
+EF_SEARCH_CANDIDATES = [10, 20, 40, 64, 100, 160, 256, 400]
+PROBE_FRACTIONS = [0.01, 0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0]
+
+
+@dataclass
+class IndexParams:
+    """Build parameters for the embedding index."""
+    method: str
+    m: Optional[int] = None
+    ef_construction: Optional[int] = None
+    lists: Optional[int] = None
+
+    def with_clause(self) -> str:
+        """Render the index WITH (...) storage parameters."""
+        if self.method == "hnsw":
+            return f"WITH (m = {int(self.m)}, ef_construction = {int(self.ef_construction)})"
+        return f"WITH (lists = {int(self.lists)})"
+
+
+@dataclass
+class SearchSettings:
+    """Per-query search settings for the embedding index."""
+    method: str
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+
+    def set_statements(self, local: bool = False) -> List[str]:
+        """SQL statements applying these settings to a session or transaction."""
+        scope = "SET LOCAL" if local else "SET"
+        if self.method == "hnsw":
+            return [f"{scope} hnsw.ef_search = {int(self.ef_search)}"]
+        return [f"{scope} ivfflat.probes = {int(self.probes)}"]
+
+
+def choose_index_params(row_count: int, method: Optional[str] = None) -> IndexParams:
+    """
+    Choose index type and build parameters for a corpus size.
+
+    Args:
+        row_count: Number of chunks with embeddings
+        method: Force "hnsw" or "ivfflat" (None picks by size)
+
+    Returns:
+        Index build parameters
+    """
+    method = method or ("hnsw" if row_count <= HNSW_MAX_ROWS else "ivfflat")
+
+    if method == "hnsw":
+        # pgvector defaults are a good fit for small corpora; larger graphs
+        # need more links per node to keep recall up
+        if row_count < 100_000:
+            return IndexParams(method="hnsw", m=16, ef_construction=64)
+        return IndexParams(method="hnsw", m=24, ef_construction=128)
+
+    # pgvector guidance: rows / 1000 lists up to 1M rows, sqrt(rows) beyond
+    if row_count <= 1_000_000:
+        lists = max(1, row_count // 1000)
+    else:
+        lists = int(math.sqrt(row_count))
+    return IndexParams(method="ivfflat", lists=lists)
+
+
+def search_settings_for_target(params: IndexParams, recall_target: float, k: int = 10) -> SearchSettings:
+    """
+    Heuristic search settings for a recall target (refine with tune).
+
+    Args:
+        params: Index build parameters
+        recall_target: Desired recall@k (0-1)
+        k: Number of results per query
+
+    Returns:
+        Search settings
+    """
+    if params.method == "hnsw":
+        if recall_target >= 0.99:
+            ef_search = 256
+        elif recall_target >= 0.97:
+            ef_search = 160
+        elif recall_target >= 0.95:
+            ef_search = 100
+        elif recall_target >= 0.90:
+            ef_search = 64
+        else:
+            ef_search = 40
+        # ef_search bounds the result count, so it must cover k
+        return SearchSettings(method="hnsw", ef_search=max(ef_search, k))
+
+    if recall_target >= 0.99:
+        fraction = 0.3
+    elif recall_target >= 0.95:
+        fraction = 0.1
+    elif recall_target >= 0.90:
+        fraction = 0.05
+    else:
+        fraction = 0.02
+    probes = max(1, math.ceil(params.lists * fraction), round(math.sqrt(params.lists)))
+    return SearchSettings(method="ivfflat", probes=min(probes, params.lists))
+
+
+async def count_embedded_rows(conn: asyncpg.Connection) -> int:
+    """Count chunks that have an embedding."""
+    return await conn.fetchval("SELECT COUNT(*) FROM chunks WHERE embedding IS NOT NULL")
+
+
+async def get_index_status(conn: asyncpg.Connection) -> Dict[str, Any]:
+    """
+    Describe the current embedding index.
+
+    Returns:
+        Row count, index definition, storage parameters, method, size and validity
+    """
+    row_count = await count_embedded_rows(conn)
+    index = await conn.fetchrow(
+        """
+        SELECT
+            i.relname AS name,
+            am.amname AS method,
+            pg_get_indexdef(i.oid) AS definition,
+            i.reloptions AS options,
+            pg_size_pretty(pg_relation_size(i.oid)) AS size,
+            x.indisvalid AS valid
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_am am ON am.oid = i.relam
+        WHERE t.relname = 'chunks' AND i.relname = $1
+        """,
+        INDEX_NAME
+    )
+
+    return {
+        "row_count": row_count,
+        "index": dict(index) if index else None,
+        "recommended": asdict(choose_index_params(row_count))
+    }
+
+
+async def rebuild_index(
+    conn: asyncpg.Connection,
+    params: IndexParams,
+    concurrently: bool = True
+) -> Dict[str, Any]:
+    """
+    Build a new embedding index and swap it in place of the old one.
+
+    With concurrently=True the build uses CREATE INDEX CONCURRENTLY so
+    reads and ingestion writes continue while it runs. Both renames of
+    the swap happen in one transaction, so chunks always has a live ANN
+    index; the old one is dropped afterwards.
+
+    Args:
+        conn: Connection outside any transaction block
+        params: Index build parameters
+        concurrently: Use non-blocking index builds
+
+    Returns:
+        Build summary with elapsed time
+    """
+    mode = "CONCURRENTLY " if concurrently else ""
+    new_name = f"{INDEX_NAME}_new"
+    old_name = f"{INDEX_NAME}_old"
+
+    # A failed concurrent build leaves an invalid index behind, and a failed
+    # final drop leaves the previous index under its _old name
+    await conn.execute(f"DROP INDEX {mode}IF EXISTS {new_name}")
+    await conn.execute(f"DROP INDEX {mode}IF EXISTS {old_name}")
+
+    start_time = time.perf_counter()
+    await conn.execute(
+        f"CREATE INDEX {mode}{new_name} ON chunks "
+        f"USING {params.method} (embedding vector_cosine_ops) {params.with_clause()}"
+    )
+    build_seconds = time.perf_counter() - start_time
+
+    async with conn.transaction():
+        await conn.execute(f"ALTER INDEX IF EXISTS {INDEX_NAME} RENAME TO {old_name}")
+        await conn.execute(f"ALTER INDEX {new_name} RENAME TO {INDEX_NAME}")
+
+    await conn.execute(f"DROP INDEX {mode}IF EXISTS {old_name}")
+
+    logger.info(f"Rebuilt {INDEX_NAME} as {params.method} {params.with_clause()} in {build_seconds:.1f}s")
+
+    return {"params": asdict(params), "build_seconds": round(build_seconds, 2)}
+
+
+async def sample_query_embeddings(conn: asyncpg.Connection, sample_size: int) -> List[Any]:
+    """Sample stored chunk embeddings to use as recall queries."""
+    rows = await conn.fetch(
+        """
+        SELECT embedding FROM chunks
+        WHERE embedding IS NOT NULL
+        ORDER BY random()
+        LIMIT $1
+        """,
+        sample_size
+    )
+    return [row["embedding"] for row in rows]
+
+
+async def _top_k(
+    conn: asyncpg.Connection,
+    embedding: Any,
+    k: int,
+    settings: List[str]
+) -> List[Any]:
+    async with conn.transaction():
+        for statement in settings:
+            await conn.execute(statement)
+        rows = await conn.fetch(
+            """
+            SELECT id FROM chunks
+            WHERE embedding IS NOT NULL
+            ORDER BY embedding <=> $1::vector
+            LIMIT $2
+            """,
+            embedding,
+            k
+        )
+    return [row["id"] for row in rows]
+
+
+async def measure_recall(
+    conn: asyncpg.Connection,
+    queries: List[Any],
+    k: int = 10,
+    settings: Optional[SearchSettings] = None,
+    exact_results: Optional[List[List[Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Measure recall@k of indexed search against exact search.
+
+    Args:
+        conn: Database connection
+        queries: Query embeddings
+        k: Number of results per query
+        settings: Search settings for the indexed queries (None = session defaults)
+        exact_results: Precomputed exact top-k per query (computed if omitted)
+
+    Returns:
+        Mean recall and latency percentiles for indexed search
+    """
+    if exact_results is None:
+        exact_results = await exact_top_k(conn, queries, k)
+
+    statements = settings.set_statements(local=True) if settings else []
+    recalls = []
+    latencies = []
+
+    for embedding, exact in zip(queries, exact_results):
+        start_time = time.perf_counter()
+        approx = await _top_k(conn, embedding, k, statements)
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+        if exact:
+            recalls.append(len(set(approx) & set(exact)) / len(exact))
+
+    latencies.sort()
+    return {
+        "settings": asdict(settings) if settings else None,
+        "k": k,
+        "queries": len(queries),
+        "recall": round(sum(recalls) / len(recalls), 4) if recalls else 0.0,
+        "latency_ms_p50": round(latencies[len(latencies) // 2], 2) if latencies else 0.0,
+        "latency_ms_p95": round(latencies[int(len(latencies) * 0.95) - 1], 2) if latencies else 0.0
+    }
+
+
+async def exact_top_k(conn: asyncpg.Connection, queries: List[Any], k: int) -> List[List[Any]]:
+    """Exact top-k per query (index scans disabled, so a full scan is used)."""
+    statements = ["SET LOCAL enable_indexscan = off", "SET LOCAL enable_bitmapscan = off"]
+    return [await _top_k(conn, embedding, k, statements) for embedding in queries]
+
+
+async def tune_search_settings(
+    conn: asyncpg.Connection,
+    recall_target: float,
+    max_latency_ms: Optional[float] = None,
+    k: int = 10,
+    sample_size: int = 50
+) -> Dict[str, Any]:
+    """
+    Find the cheapest search setting that meets a recall/latency target.
+
+    Args:
+        conn: Database connection
+        recall_target: Minimum mean recall@k
+        max_latency_ms: Optional p95 latency ceiling
+        k: Number of results per query
+        sample_size: Number of sampled queries
+
+    Returns:
+        Chosen settings and every measured candidate
+    """
+    status = await get_index_status(conn)
+    index = status["index"]
+    if not index:
+        raise RuntimeError(f"No {INDEX_NAME} index found; run 'rebuild' first")
+
+    method = index["method"]
+    if method == "hnsw":
+        candidates = [SearchSettings(method="hnsw", ef_search=max(ef, k)) for ef in EF_SEARCH_CANDIDATES]
+    else:
+        options = dict(option.split("=", 1) for option in index["options"] or [])
+        if "lists" not in options:
+            raise RuntimeError(f"{INDEX_NAME} has no lists storage parameter: {index['definition']}")
+        lists = int(options["lists"])
+        probes = sorted({max(1, min(lists, math.ceil(lists * f))) for f in PROBE_FRACTIONS})
+        candidates = [SearchSettings(method="ivfflat", probes=p) for p in probes]
+
+    queries = await sample_query_embeddings(conn, sample_size)
+    exact = await exact_top_k(conn, queries, k)
+
+    measured = []
+    chosen = None
+    for settings in candidates:
+        result = await measure_recall(conn, queries, k, settings, exact_results=exact)
+        measured.append(result)
+
+        meets_latency = max_latency_ms is None or result["latency_ms_p95"] <= max_latency_ms
+        if result["recall"] >= recall_target and meets_latency:
+            chosen = settings
+            break
+
+    if chosen is None:
+        # Nothing met both targets: take the best recall within the latency budget
+        within_budget = [
+            r for r in measured
+            if max_latency_ms is None or r["latency_ms_p95"] <= max_latency_ms
+        ] or measured
+        best = max(within_budget, key=lambda r: r["recall"])
+        chosen = SearchSettings(**best["settings"])
+
+    return {"chosen": asdict(chosen), "measured": measured}
+
+
+async def apply_search_settings(conn: asyncpg.Connection, settings: SearchSettings):
+    """
+    Persist search settings as database defaults for new connections.
+
+    Requires ownership of the database. Existing pool connections keep
+    their settings until they are recycled.
+    """
+    database = await conn.fetchval("SELECT current_database()")
+    if settings.method == "hnsw":
+        await conn.execute(f'ALTER DATABASE "{database}" SET hnsw.ef_search = {int(settings.ef_search)}')
+    else:
+        await conn.execute(f'ALTER DATABASE "{database}" SET ivfflat.probes = {int(settings.probes)}')
+
+
+def _print_header(title: str):
+    print("\n" + "=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+async def main():
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Manage the chunks.embedding vector index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("status", help="Show the current index and the recommended parameters")
+
+    rebuild_parser = subparsers.add_parser("rebuild", help="Rebuild the index for the current row count")
+    rebuild_parser.add_argument("--method", choices=["hnsw", "ivfflat"], help="Force an index method")
+    rebuild_parser.add_argument("--m", type=int, help="HNSW max links per node")
+    rebuild_parser.add_argument("--ef-construction", type=int, help="HNSW build candidate list size")
+    rebuild_parser.add_argument("--lists", type=int, help="IVFFlat number of lists")
+    rebuild_parser.add_argument("--blocking", action="store_true", help="Build without CONCURRENTLY (faster, blocks writes)")
+
+    tune_parser = subparsers.add_parser("tune", help="Pick ef_search/probes for a recall/latency target")
+    tune_parser.add_argument("--recall", type=float, default=0.95, help="Target recall@k")
+    tune_parser.add_argument("--max-latency-ms", type=float, help="Optional p95 latency ceiling")
+    tune_parser.add_argument("--k", type=int, default=10, help="Results per query")
+    tune_parser.add_argument("--sample", type=int, default=50, help="Number of sampled queries")
+    tune_parser.add_argument("--apply", action="store_true", help="Persist the chosen setting with ALTER DATABASE")
+
+    recall_parser = subparsers.add_parser("recall", help="Report recall against exact search")
+    recall_parser.add_argument("--k", type=int, default=10, help="Results per query")
+    recall_parser.add_argument("--sample", type=int, default=50, help="Number of sampled queries")
+    recall_parser.add_argument("--ef-search", type=int, help="HNSW ef_search to evaluate")
+    recall_parser.add_argument("--probes", type=int, help="IVFFlat probes to evaluate")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+
+    await initialize_database()
+    try:
+        async with db_pool.acquire() as conn:
+            if args.command == "status":
+                status = await get_index_status(conn)
+                _print_header("VECTOR INDEX STATUS")
+                print(f"Embedded chunks: {status['row_count']}")
+                if status["index"]:
+                    print(f"Index: {status['index']['definition']}")
+                    print(f"Size: {status['index']['size']}  Valid: {status['index']['valid']}")
+                else:
+                    print("Index: none")
+                print(f"Recommended: {status['recommended']}")
+
+            elif args.command == "rebuild":
+                row_count = await count_embedded_rows(conn)
+                params = choose_index_params(row_count, args.method)
+                if params.method == "hnsw":
+                    params.m = args.m or params.m
+                    params.ef_construction = args.ef_construction or params.ef_construction
+                else:
+                    params.lists = args.lists or params.lists
+
+                _print_header("REBUILDING VECTOR INDEX")
+                print(f"Embedded chunks: {row_count}")
+                print(f"Index: {params.method} {params.with_clause()}")
+                summary = await rebuild_index(conn, params, concurrently=not args.blocking)
+                print(f"Built in {summary['build_seconds']}s")
+
+                settings = search_settings_for_target(params, 0.95)
+                print(f"Starting search setting: {settings.set_statements()[0]} (refine with 'tune')")
+
+            elif args.command == "tune":
+                _print_header("TUNING SEARCH SETTINGS")
+                result = await tune_search_settings(
+                    conn,
+                    recall_target=args.recall,
+                    max_latency_ms=args.max_latency_ms,
+                    k=args.k,
+                    sample_size=args.sample
+                )
+                for r in result["measured"]:
+                    print(f"{r['settings']}: recall={r['recall']:.3f} p50={r['latency_ms_p50']}ms p95={r['latency_ms_p95']}ms")
+                chosen = SearchSettings(**result["chosen"])
+                print(f"\nChosen: {chosen.set_statements()[0]}")
+
+                if args.apply:
+                    await apply_search_settings(conn, chosen)
+                    print("Applied as database default (new connections pick it up)")
+                else:
+                    env_name = "HNSW_EF_SEARCH" if chosen.method == "hnsw" else "IVFFLAT_PROBES"
+                    env_value = chosen.ef_search if chosen.method == "hnsw" else chosen.probes
+                    print(f"Set {env_name}={env_value} in .env, or re-run with --apply")
+
+            elif args.command == "recall":
+                settings = None
+                if args.ef_search:
+                    settings = SearchSettings(method="hnsw", ef_search=args.ef_search)
+                elif args.probes:
+                    settings = SearchSettings(method="ivfflat", probes=args.probes)
+
+                queries = await sample_query_embeddings(conn, args.sample)
+                result = await measure_recall(conn, queries, args.k, settings)
+                _print_header("RECALL VS EXACT SEARCH")
+                print(f"Queries: {result['queries']}  k: {result['k']}  Settings: {result['settings'] or 'session defaults'}")
+                print(f"Recall@{result['k']}: {result['recall']:.3f}")
+                print(f"Latency p50: {result['latency_ms_p50']}ms  p95: {result['latency_ms_p95']}ms")
+    finally:
+        await close_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
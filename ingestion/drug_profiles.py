@@ -0,0 +1,177 @@
+"""
+Drug profile materialization.
+
+Drug information (contraindications, dosages, adverse events) only changes
+when documents are re-ingested, so it is built once per ingestion for every
+medication entity and stored in the drug_profiles table. get_drug_info_tool
+serves from that table and falls back to the live path for unknown drugs.
+Brand names (from the Medication entity's brand_names and DRUG_ALIASES) are
+stored as aliases so lookups like "Viagra" find the sildenafil profile.
+
+Usage:
+    python -m ingestion.drug_profiles
+"""
+
+import asyncio
+import logging
+import argparse
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from dotenv import load_dotenv
+
+# Import agent utilities
+try:
+    from ..agent.db_utils import initialize_database, close_database, save_drug_profiles
+    from ..agent.graph_utils import initialize_graph, close_graph, get_medication_entities
+    from ..agent.tools import get_live_drug_info, DrugInteractionInput
+except ImportError:
+    # For direct execution or testing
+    import sys
+    import os
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from agent.db_utils import initialize_database, close_database, save_drug_profiles
+    from agent.graph_utils import initialize_graph, close_graph, get_medication_entities
+    from agent.tools import get_live_drug_info, DrugInteractionInput
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Brand names cited by the guideline (FDA prescribing information), keyed by
+# lowercased generic name; merged with brand_names extracted into the graph
+DRUG_ALIASES: Dict[str, List[str]] = {
+    "sildenafil": ["Viagra"],
+    "tadalafil": ["Cialis"],
+    "vardenafil": ["Levitra", "Staxyn"],
+    "avanafil": ["Stendra", "Spedra"],
+}
+
+
+def drug_aliases(drug_name: str, brand_names: Optional[str] = None) -> List[str]:
+    """
+    Aliases stored with a drug profile.
+
+    Args:
+        drug_name: Medication entity name
+        brand_names: Comma-separated brand names from the Medication entity
+
+    Returns:
+        Brand names and synonyms (may be empty)
+    """
+    aliases = list(DRUG_ALIASES.get(drug_name.strip().lower(), []))
+    if brand_names:
+        aliases.extend(name.strip() for name in brand_names.split(",") if name.strip())
+    return aliases
+
+
+async def build_drug_profile(drug_name: str, aliases: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Build one drug profile with the live retrieval path.
+
+    Args:
+        drug_name: Medication entity name
+        aliases: Brand names and synonyms the profile should also match
+
+    Returns:
+        Profile dictionary, or None if nothing was found for the drug
+    """
+    profile = await get_live_drug_info(DrugInteractionInput(drug_name=drug_name))
+    profile.pop("metadata", None)
+
+    if not (profile.get("entity_summary") or profile.get("related_facts") or profile.get("related_content")):
+        return None
+
+    profile["aliases"] = aliases or []
+    return profile
+
+
+async def build_drug_profiles(
+    drug_names: Optional[List[str]] = None,
+    concurrency: int = 4
+) -> Dict[str, Any]:
+    """
+    Build and store profiles for every medication entity.
+
+    Args:
+        drug_names: Drugs to build (defaults to all medication entities in the
+            graph, replacing every stored profile)
+        concurrency: Number of drugs built at once
+
+    Returns:
+        Summary with counts and elapsed time
+    """
+    start_time = datetime.now()
+
+    replace_all = drug_names is None
+    brand_names: Dict[str, str] = {}
+    if drug_names is None:
+        entities = await get_medication_entities()
+        drug_names = [e["name"] for e in entities if e.get("name")]
+        brand_names = {e["name"].strip().lower(): e.get("brand_names") for e in entities if e.get("name")}
+
+    # One profile per case-insensitive name
+    unique_names = list({name.strip().lower(): name.strip() for name in drug_names}.values())
+    logger.info(f"Building drug profiles for {len(unique_names)} medications")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def build(name: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            try:
+                aliases = drug_aliases(name, brand_names.get(name.lower()))
+                return await build_drug_profile(name, aliases)
+            except Exception as e:
+                logger.warning(f"Failed to build drug profile for {name}: {e}")
+                return None
+
+    built = await asyncio.gather(*(build(name) for name in unique_names))
+    profiles = [p for p in built if p]
+
+    stored = await save_drug_profiles(profiles, replace_all=replace_all)
+    elapsed = (datetime.now() - start_time).total_seconds()
+
+    logger.info(f"Stored {stored} drug profiles ({len(unique_names) - stored} skipped) in {elapsed:.1f}s")
+
+    return {
+        "medications": len(unique_names),
+        "profiles_stored": stored,
+        "skipped": len(unique_names) - stored,
+        "elapsed_seconds": round(elapsed, 2)
+    }
+
+
+async def main():
+    """Rebuild drug profiles from the current knowledge graph and chunks."""
+    parser = argparse.ArgumentParser(description="Materialize drug profiles for get_drug_information")
+    parser.add_argument("--drug", action="append", help="Drug name to build (repeatable; default: all medication entities)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Drugs built at once")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose logging")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+
+    await initialize_database()
+    await initialize_graph()
+    try:
+        summary = await build_drug_profiles(args.drug, args.concurrency)
+
+        print("\n" + "="*60)
+        print("DRUG PROFILES")
+        print("="*60)
+        print(f"Medications found: {summary['medications']}")
+        print(f"Profiles stored: {summary['profiles_stored']}")
+        print(f"Skipped (no data): {summary['skipped']}")
+        print(f"Total time: {summary['elapsed_seconds']:.2f} seconds")
+    finally:
+        await close_graph()
+        await close_database()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -239,6 +239,13 @@ Example format:
                 # Continue processing other chunks even if one fails
                 continue
         
+        # New entities need their normalized name for indexed lookups
+        if episodes_created:
+            try:
+                await self.graph_client.refresh_entity_names()
+            except Exception as e:
+                logger.warning(f"Failed to refresh entity name index: {e}")
+        
         result = {
             "episodes_created": episodes_created,
             "total_chunks": len(chunks),
@@ -41,10 +41,11 @@ except ImportError:
 from .chunker import ChunkingConfig, MarkdownChunker, DocumentChunk
 from .embedder import create_embedder
 from .graph_builder import create_graph_builder
+from .drug_profiles import build_drug_profiles
 
 # Import agent utilities
 try:
-    from ..agent.db_utils import initialize_database, close_database, db_pool
+    from ..agent.db_utils import initialize_database, close_database, db_pool, bump_corpus_version
     from ..agent.graph_utils import initialize_graph, close_graph
     from ..agent.models import IngestionConfig, IngestionResult
 except ImportError:
@@ -52,7 +53,7 @@ except ImportError:
     import sys
     import os
     sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    from agent.db_utils import initialize_database, close_database, db_pool
+    from agent.db_utils import initialize_database, close_database, db_pool, bump_corpus_version
     from agent.graph_utils import initialize_graph, close_graph
     from agent.models import IngestionConfig, IngestionResult
 
@@ -178,6 +179,13 @@ class DocumentIngestionPipeline:
                 result = await self._ingest_single_document(file_path)
                 results.append(result)
                 
+                # New chunks/episodes invalidate cached agent tool results
+                if result.chunks_created or result.relationships_created:
+                    await bump_corpus_version()
+                # New episodes also invalidate cached graph searches
+                if result.relationships_created:
+                    await bump_corpus_version("graph")
+                
                 if progress_callback:
                     progress_callback(i + 1, len(markdown_files))
                 
@@ -199,6 +207,14 @@ class DocumentIngestionPipeline:
         
         logger.info(f"Ingestion complete: {len(results)} documents, {total_chunks} chunks, {total_errors} errors")
         
+        # Drug profiles are derived from the graph and chunks, so rebuild them last
+        if self.config.build_drug_profiles and not self.config.skip_graph_building:
+            try:
+                await build_drug_profiles()
+                await bump_corpus_version()
+            except Exception as e:
+                logger.error(f"Failed to build drug profiles: {e}")
+        
         return results
     
     async def _ingest_single_document(self, file_path: str) -> IngestionResult:
@@ -548,10 +564,10 @@ class DocumentIngestionPipeline:
                 # First pass: Insert all chunks and collect IDs
                 chunk_ids = {}
                 for chunk in chunks:
-                    # Convert embedding to PostgreSQL vector string format
+                    # Embedding is sent in binary via the pgvector codec
                     embedding_data = None
                     if hasattr(chunk, 'embedding') and chunk.embedding:
-                        embedding_data = '[' + ','.join(map(str, chunk.embedding)) + ']'
+                        embedding_data = chunk.embedding
                     
                     # Extract CPG metadata
                     meta = chunk.metadata
@@ -839,11 +855,10 @@ class DocumentIngestionPipeline:
                 
                 # Insert chunks
                 for chunk in chunks:
-                    # Convert embedding to PostgreSQL vector string format
+                    # Embedding is sent in binary via the pgvector codec
                     embedding_data = None
                     if hasattr(chunk, 'embedding') and chunk.embedding:
-                        # PostgreSQL vector format: '[1.0,2.0,3.0]' (no spaces after commas)
-                        embedding_data = '[' + ','.join(map(str, chunk.embedding)) + ']'
+                        embedding_data = chunk.embedding
                     
                     await conn.execute(
                         """
@@ -867,6 +882,7 @@ class DocumentIngestionPipeline:
         # Clean PostgreSQL
         async with db_pool.acquire() as conn:
             async with conn.transaction():
+                await conn.execute("DELETE FROM drug_profiles")
                 await conn.execute("DELETE FROM messages")
                 await conn.execute("DELETE FROM sessions")
                 await conn.execute("DELETE FROM chunks")
@@ -877,6 +893,9 @@ class DocumentIngestionPipeline:
         # Clean knowledge graph
         await self.graph_builder.clear_graph()
         logger.info("Cleaned knowledge graph")
+        
+        await bump_corpus_version()
+        await bump_corpus_version("graph")
 
 
 async def main():
@@ -890,6 +909,7 @@ async def main():
     parser.add_argument("--no-entities", action="store_true", help="Disable entity extraction")
     parser.add_argument("--fast", "-f", action="store_true", help="Fast mode: skip knowledge graph building")
     parser.add_argument("--no-cpg", action="store_true", help="Disable CPG-specific PDF parsing (use basic parsing)")
+    parser.add_argument("--no-drug-profiles", action="store_true", help="Skip drug profile materialization")
     parser.add_argument("--verbose", "-v", action="store_true", help="Enable verbose logging")
     
     args = parser.parse_args()
@@ -907,7 +927,8 @@ async def main():
         chunk_overlap=args.chunk_overlap,
         use_semantic_chunking=not args.no_semantic,
         extract_entities=not args.no_entities,
-        skip_graph_building=args.fast
+        skip_graph_building=args.fast,
+        build_drug_profiles=not args.no_drug_profiles
     )
     
     # Create and run pipeline
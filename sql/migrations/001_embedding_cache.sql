@@ -0,0 +1,12 @@
+-- Migration 001: persistent query embedding cache
+-- Apply to existing databases created before the embedding_cache table was
+-- added to schema.sql. Safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    cache_key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    embedding REAL[] NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_created_at ON embedding_cache (created_at);
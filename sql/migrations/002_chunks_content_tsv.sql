@@ -0,0 +1,83 @@
+-- Migration 002: stored tsvector column for hybrid_search
+-- Adds chunks.content_tsv (generated, so existing rows are backfilled when
+-- the column is added) with a GIN index, and replaces hybrid_search with the
+-- bounded two-index version from schema.sql. Safe to run more than once.
+--
+-- Adding a stored generated column rewrites the chunks table; run it in a
+-- maintenance window on large corpora.
+
+ALTER TABLE chunks
+    ADD COLUMN IF NOT EXISTS content_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_chunks_content_tsv ON chunks USING GIN (content_tsv);
+
+-- Hybrid search function
+-- Each retriever is bounded by its own index-backed ORDER BY/LIMIT (HNSW for
+-- vectors, GIN on content_tsv for text) before the two candidate sets are merged.
+CREATE OR REPLACE FUNCTION hybrid_search(
+    query_embedding vector(768),
+    query_text TEXT,
+    match_count INT DEFAULT 10,
+    text_weight FLOAT DEFAULT 0.3
+)
+RETURNS TABLE (
+    chunk_id UUID,
+    document_id UUID,
+    content TEXT,
+    combined_score FLOAT,
+    vector_similarity FLOAT,
+    text_similarity FLOAT,
+    metadata JSONB,
+    document_title TEXT,
+    document_source TEXT
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    candidate_count INT := GREATEST(match_count * 4, 40);
+BEGIN
+    RETURN QUERY
+    WITH vector_results AS (
+        SELECT 
+            c.id AS chunk_id,
+            (1 - (c.embedding <=> query_embedding))::float8 AS vector_sim
+        FROM chunks c
+        WHERE c.embedding IS NOT NULL
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT candidate_count
+    ),
+    text_results AS (
+        SELECT 
+            c.id AS chunk_id,
+            ts_rank_cd(c.content_tsv, q.query)::float8 AS text_sim
+        FROM chunks c, plainto_tsquery('english', query_text) AS q(query)
+        WHERE c.content_tsv @@ q.query
+        ORDER BY text_sim DESC
+        LIMIT candidate_count
+    ),
+    merged AS (
+        SELECT 
+            COALESCE(v.chunk_id, t.chunk_id) AS chunk_id,
+            COALESCE(v.vector_sim, 0) AS vector_sim,
+            COALESCE(t.text_sim, 0) AS text_sim
+        FROM vector_results v
+        FULL OUTER JOIN text_results t ON v.chunk_id = t.chunk_id
+    )
+    SELECT 
+        m.chunk_id,
+        c.document_id,
+        c.content,
+        (m.vector_sim * (1 - text_weight) + m.text_sim * text_weight)::float8 AS combined_score,
+        m.vector_sim AS vector_similarity,
+        m.text_sim AS text_similarity,
+        c.metadata,
+        d.title AS document_title,
+        d.source AS document_source
+    FROM merged m
+    JOIN chunks c ON c.id = m.chunk_id
+    JOIN documents d ON c.document_id = d.id
+    ORDER BY combined_score DESC
+    LIMIT match_count;
+END;
+$$;
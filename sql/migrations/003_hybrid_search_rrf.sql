@@ -0,0 +1,86 @@
+-- Migration 003: reciprocal rank fusion hybrid search
+-- Requires migration 002 (chunks.content_tsv). Safe to run more than once.
+
+-- Reciprocal rank fusion hybrid search
+-- Takes the top candidate_count from each retriever (index-backed LIMITs) and
+-- scores each chunk by (1 - text_weight) / (rrf_k + vector_rank) +
+-- text_weight / (rrf_k + text_rank), so the cost per query is bounded and the
+-- weight does not depend on the scale of ts_rank_cd.
+CREATE OR REPLACE FUNCTION hybrid_search_rrf(
+    query_embedding vector(768),
+    query_text TEXT,
+    match_count INT DEFAULT 10,
+    text_weight FLOAT DEFAULT 0.3,
+    candidate_count INT DEFAULT 40,
+    rrf_k INT DEFAULT 60
+)
+RETURNS TABLE (
+    chunk_id UUID,
+    document_id UUID,
+    content TEXT,
+    combined_score FLOAT,
+    vector_similarity FLOAT,
+    text_similarity FLOAT,
+    metadata JSONB,
+    document_title TEXT,
+    document_source TEXT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    WITH vector_candidates AS (
+        SELECT 
+            c.id AS chunk_id,
+            (1 - (c.embedding <=> query_embedding))::float8 AS vector_sim
+        FROM chunks c
+        WHERE c.embedding IS NOT NULL
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT GREATEST(candidate_count, match_count)
+    ),
+    vector_results AS (
+        SELECT v.chunk_id, v.vector_sim, ROW_NUMBER() OVER (ORDER BY v.vector_sim DESC) AS vector_rank
+        FROM vector_candidates v
+    ),
+    text_candidates AS (
+        SELECT 
+            c.id AS chunk_id,
+            ts_rank_cd(c.content_tsv, q.query)::float8 AS text_sim
+        FROM chunks c, plainto_tsquery('english', query_text) AS q(query)
+        WHERE c.content_tsv @@ q.query
+        ORDER BY text_sim DESC
+        LIMIT GREATEST(candidate_count, match_count)
+    ),
+    text_results AS (
+        SELECT t.chunk_id, t.text_sim, ROW_NUMBER() OVER (ORDER BY t.text_sim DESC) AS text_rank
+        FROM text_candidates t
+    ),
+    fused AS (
+        SELECT 
+            COALESCE(v.chunk_id, t.chunk_id) AS chunk_id,
+            COALESCE(v.vector_sim, 0) AS vector_sim,
+            COALESCE(t.text_sim, 0) AS text_sim,
+            (
+                COALESCE((1 - text_weight) / (rrf_k + v.vector_rank), 0) +
+                COALESCE(text_weight / (rrf_k + t.text_rank), 0)
+            )::float8 AS rrf_score
+        FROM vector_results v
+        FULL OUTER JOIN text_results t ON v.chunk_id = t.chunk_id
+    )
+    SELECT 
+        f.chunk_id,
+        c.document_id,
+        c.content,
+        f.rrf_score AS combined_score,
+        f.vector_sim AS vector_similarity,
+        f.text_sim AS text_similarity,
+        c.metadata,
+        d.title AS document_title,
+        d.source AS document_source
+    FROM fused f
+    JOIN chunks c ON c.id = f.chunk_id
+    JOIN documents d ON c.document_id = d.id
+    ORDER BY combined_score DESC
+    LIMIT match_count;
+END;
+$$;
@@ -0,0 +1,10 @@
+-- Migration 004: precomputed drug profiles
+-- Populate with: python -m ingestion.drug_profiles (also runs at the end of
+-- ingestion). Safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS drug_profiles (
+    name_key TEXT PRIMARY KEY,
+    drug_name TEXT NOT NULL,
+    profile JSONB NOT NULL,
+    built_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,20 @@
+-- Migration 005: corpus version stamp and shared tool result cache
+-- Safe to run more than once.
+
+-- Corpus version stamp (bumped by ingestion; part of every tool cache key)
+CREATE TABLE IF NOT EXISTS corpus_version (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Shared agent tool result cache (TOOL_CACHE_BACKEND=postgres)
+CREATE TABLE IF NOT EXISTS tool_result_cache (
+    cache_key TEXT PRIMARY KEY,
+    tool_name TEXT NOT NULL,
+    corpus_version BIGINT NOT NULL,
+    result JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_tool_result_cache_version ON tool_result_cache (corpus_version);
@@ -0,0 +1,7 @@
+-- Migration 006: drug profile aliases (brand names and synonyms)
+-- Rebuild profiles afterwards to fill them: python -m ingestion.drug_profiles
+-- Safe to run more than once.
+
+ALTER TABLE drug_profiles ADD COLUMN IF NOT EXISTS aliases TEXT[] NOT NULL DEFAULT '{}';
+
+CREATE INDEX IF NOT EXISTS idx_drug_profiles_aliases ON drug_profiles USING GIN (aliases);
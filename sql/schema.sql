@@ -5,6 +5,7 @@ CREATE EXTENSION IF NOT EXISTS vector;
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
+DROP TABLE IF EXISTS drug_profiles CASCADE;
 DROP TABLE IF EXISTS messages CASCADE;
 DROP TABLE IF EXISTS sessions CASCADE;
 DROP TABLE IF EXISTS chunks CASCADE;
@@ -45,14 +46,20 @@ CREATE TABLE chunks (
     is_algorithm BOOLEAN DEFAULT FALSE,
     
     -- Structured Content (for tables/algorithms)
-    structured_content JSONB
+    structured_content JSONB,
+    
+    -- Full-text search vector (kept in sync by PostgreSQL)
+    content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
 );
 
 -- Indexes
-CREATE INDEX idx_chunks_embedding ON chunks USING ivfflat (embedding vector_cosine_ops) WITH (lists = 1);
+-- HNSW needs no training data, so it can be created on the empty table.
+-- Re-tune for the corpus size with: python -m agent.vector_index rebuild
+CREATE INDEX idx_chunks_embedding ON chunks USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);
 CREATE INDEX idx_chunks_document_id ON chunks (document_id);
 CREATE INDEX idx_chunks_chunk_index ON chunks (document_id, chunk_index);
 CREATE INDEX idx_chunks_content_trgm ON chunks USING GIN (content gin_trgm_ops);
+CREATE INDEX idx_chunks_content_tsv ON chunks USING GIN (content_tsv);
 CREATE INDEX idx_chunks_parent ON chunks (parent_chunk_id);
 CREATE INDEX idx_chunks_recommendations ON chunks (is_recommendation) WHERE is_recommendation = TRUE;
 CREATE INDEX idx_chunks_tables ON chunks (is_table) WHERE is_table = TRUE;
@@ -83,6 +90,46 @@ CREATE TABLE messages (
 
 CREATE INDEX idx_messages_session_id ON messages (session_id, created_at);
 
+-- Precomputed drug profiles (rebuilt at ingestion by ingestion/drug_profiles.py)
+CREATE TABLE drug_profiles (
+    name_key TEXT PRIMARY KEY,
+    drug_name TEXT NOT NULL,
+    aliases TEXT[] NOT NULL DEFAULT '{}',  -- Lowercased brand names and synonyms
+    profile JSONB NOT NULL,
+    built_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_drug_profiles_aliases ON drug_profiles USING GIN (aliases);
+
+-- Query embedding cache (shared across API workers, survives restarts)
+-- Not dropped above: entries are keyed by model and stay valid across resets
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    cache_key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    embedding REAL[] NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_created_at ON embedding_cache (created_at);
+
+-- Corpus version stamp (bumped by ingestion; part of every tool cache key)
+CREATE TABLE IF NOT EXISTS corpus_version (
+    name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Shared agent tool result cache (TOOL_CACHE_BACKEND=postgres)
+CREATE TABLE IF NOT EXISTS tool_result_cache (
+    cache_key TEXT PRIMARY KEY,
+    tool_name TEXT NOT NULL,
+    corpus_version BIGINT NOT NULL,
+    result JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_tool_result_cache_version ON tool_result_cache (corpus_version);
+
 -- Vector search function
 CREATE OR REPLACE FUNCTION match_chunks(
     query_embedding vector(768),
@@ -118,6 +165,8 @@ END;
 $$;
 
 -- Hybrid search function
+-- Each retriever is bounded by its own index-backed ORDER BY/LIMIT (HNSW for
+-- vectors, GIN on content_tsv for text) before the two candidate sets are merged.
 CREATE OR REPLACE FUNCTION hybrid_search(
     query_embedding vector(768),
     query_text TEXT,
@@ -137,46 +186,133 @@ RETURNS TABLE (
 )
 LANGUAGE plpgsql
 AS $$
+DECLARE
+    candidate_count INT := GREATEST(match_count * 4, 40);
 BEGIN
     RETURN QUERY
     WITH vector_results AS (
         SELECT 
             c.id AS chunk_id,
-            c.document_id,
-            c.content,
-            1 - (c.embedding <=> query_embedding) AS vector_sim,
-            c.metadata,
-            d.title AS doc_title,
-            d.source AS doc_source
+            (1 - (c.embedding <=> query_embedding))::float8 AS vector_sim
         FROM chunks c
-        JOIN documents d ON c.document_id = d.id
         WHERE c.embedding IS NOT NULL
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT candidate_count
     ),
     text_results AS (
         SELECT 
             c.id AS chunk_id,
-            c.document_id,
-            c.content,
-            ts_rank_cd(to_tsvector('english', c.content), plainto_tsquery('english', query_text)) AS text_sim,
-            c.metadata,
-            d.title AS doc_title,
-            d.source AS doc_source
+            ts_rank_cd(c.content_tsv, q.query)::float8 AS text_sim
+        FROM chunks c, plainto_tsquery('english', query_text) AS q(query)
+        WHERE c.content_tsv @@ q.query
+        ORDER BY text_sim DESC
+        LIMIT candidate_count
+    ),
+    merged AS (
+        SELECT 
+            COALESCE(v.chunk_id, t.chunk_id) AS chunk_id,
+            COALESCE(v.vector_sim, 0) AS vector_sim,
+            COALESCE(t.text_sim, 0) AS text_sim
+        FROM vector_results v
+        FULL OUTER JOIN text_results t ON v.chunk_id = t.chunk_id
+    )
+    SELECT 
+        m.chunk_id,
+        c.document_id,
+        c.content,
+        (m.vector_sim * (1 - text_weight) + m.text_sim * text_weight)::float8 AS combined_score,
+        m.vector_sim AS vector_similarity,
+        m.text_sim AS text_similarity,
+        c.metadata,
+        d.title AS document_title,
+        d.source AS document_source
+    FROM merged m
+    JOIN chunks c ON c.id = m.chunk_id
+    JOIN documents d ON c.document_id = d.id
+    ORDER BY combined_score DESC
+    LIMIT match_count;
+END;
+$$;
+
+-- Reciprocal rank fusion hybrid search
+-- Takes the top candidate_count from each retriever (index-backed LIMITs) and
+-- scores each chunk by (1 - text_weight) / (rrf_k + vector_rank) +
+-- text_weight / (rrf_k + text_rank), so the cost per query is bounded and the
+-- weight does not depend on the scale of ts_rank_cd.
+CREATE OR REPLACE FUNCTION hybrid_search_rrf(
+    query_embedding vector(768),
+    query_text TEXT,
+    match_count INT DEFAULT 10,
+    text_weight FLOAT DEFAULT 0.3,
+    candidate_count INT DEFAULT 40,
+    rrf_k INT DEFAULT 60
+)
+RETURNS TABLE (
+    chunk_id UUID,
+    document_id UUID,
+    content TEXT,
+    combined_score FLOAT,
+    vector_similarity FLOAT,
+    text_similarity FLOAT,
+    metadata JSONB,
+    document_title TEXT,
+    document_source TEXT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    WITH vector_candidates AS (
+        SELECT 
+            c.id AS chunk_id,
+            (1 - (c.embedding <=> query_embedding))::float8 AS vector_sim
         FROM chunks c
-        JOIN documents d ON c.document_id = d.id
-        WHERE to_tsvector('english', c.content) @@ plainto_tsquery('english', query_text)
+        WHERE c.embedding IS NOT NULL
+        ORDER BY c.embedding <=> query_embedding
+        LIMIT GREATEST(candidate_count, match_count)
+    ),
+    vector_results AS (
+        SELECT v.chunk_id, v.vector_sim, ROW_NUMBER() OVER (ORDER BY v.vector_sim DESC) AS vector_rank
+        FROM vector_candidates v
+    ),
+    text_candidates AS (
+        SELECT 
+            c.id AS chunk_id,
+            ts_rank_cd(c.content_tsv, q.query)::float8 AS text_sim
+        FROM chunks c, plainto_tsquery('english', query_text) AS q(query)
+        WHERE c.content_tsv @@ q.query
+        ORDER BY text_sim DESC
+        LIMIT GREATEST(candidate_count, match_count)
+    ),
+    text_results AS (
+        SELECT t.chunk_id, t.text_sim, ROW_NUMBER() OVER (ORDER BY t.text_sim DESC) AS text_rank
+        FROM text_candidates t
+    ),
+    fused AS (
+        SELECT 
+            COALESCE(v.chunk_id, t.chunk_id) AS chunk_id,
+            COALESCE(v.vector_sim, 0) AS vector_sim,
+            COALESCE(t.text_sim, 0) AS text_sim,
+            (
+                COALESCE((1 - text_weight) / (rrf_k + v.vector_rank), 0) +
+                COALESCE(text_weight / (rrf_k + t.text_rank), 0)
+            )::float8 AS rrf_score
+        FROM vector_results v
+        FULL OUTER JOIN text_results t ON v.chunk_id = t.chunk_id
     )
     SELECT 
-        COALESCE(v.chunk_id, t.chunk_id) AS chunk_id,
-        COALESCE(v.document_id, t.document_id) AS document_id,
-        COALESCE(v.content, t.content) AS content,
-        (COALESCE(v.vector_sim, 0) * (1 - text_weight) + COALESCE(t.text_sim, 0) * text_weight) AS combined_score,
-        COALESCE(v.vector_sim, 0) AS vector_similarity,
-        COALESCE(t.text_sim, 0) AS text_similarity,
-        COALESCE(v.metadata, t.metadata) AS metadata,
-        COALESCE(v.doc_title, t.doc_title) AS document_title,
-        COALESCE(v.doc_source, t.doc_source) AS document_source
-    FROM vector_results v
-    FULL OUTER JOIN text_results t ON v.chunk_id = t.chunk_id
+        f.chunk_id,
+        c.document_id,
+        c.content,
+        f.rrf_score AS combined_score,
+        f.vector_sim AS vector_similarity,
+        f.text_sim AS text_similarity,
+        c.metadata,
+        d.title AS document_title,
+        d.source AS document_source
+    FROM fused f
+    JOIN chunks c ON c.id = f.chunk_id
+    JOIN documents d ON c.document_id = d.id
     ORDER BY combined_score DESC
     LIMIT match_count;
 END;
@@ -0,0 +1,176 @@
+"""
+Benchmark: Neo4j entity lookups, label scan vs. full-text/range indexes.
+
+Loads a synthetic graph of --entities :Entity nodes (drug-like names and
+clinical summaries, tagged group_id 'rag_benchmark') into the configured
+Neo4j, then times GraphitiClient.get_entity_node_by_name (fuzzy) and
+search_entities_by_type on both code paths:
+
+- scan: the toLower(...) CONTAINS fallback used when indexes are missing
+- indexed: db.index.fulltext.queryNodes plus the name_lower range index
+
+Synthetic nodes are removed afterwards unless --keep is given.
+
+Requires NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD.
+
+Usage:
+    python tests/test_framework/benchmark_entity_lookup.py
+    python tests/test_framework/benchmark_entity_lookup.py --entities 100000 --lookups 200
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, List
+
+from neo4j import AsyncGraphDatabase
+
+# Add parent dir to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+# GraphitiClient validates LLM/embedding settings at construction; no
+# Graphiti call is made here, so placeholders are enough
+os.environ.setdefault("LLM_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_API_KEY", "benchmark")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from agent.graph_utils import GraphitiClient
+
+GROUP_ID = "rag_benchmark"
+
+PREFIXES = ["sil", "tad", "var", "av", "al", "dap", "ud", "mir", "lo", "ate", "bis", "car", "am", "val", "ros", "ator"]
+MIDDLES = ["de", "na", "la", "ro", "ta", "pro", "xi", "me", "ti", "vo", "sa", "lu"]
+SUFFIXES = ["nafil", "afil", "olol", "pril", "sartan", "statin", "dipine", "azole", "mab", "ine"]
+SUMMARY_WORDS = [
+    "dose", "mg", "daily", "initial", "maximum", "contraindicated", "nitrate", "hypotension",
+    "headache", "flushing", "onset", "duration", "hours", "renal", "hepatic", "elderly",
+    "PDE5", "inhibitor", "cardiovascular", "angina", "caution", "titrate", "on-demand", "efficacy"
+]
+KEYWORDS = ["PDE5", "contraindicated nitrate", "dose", "hepatic", "on-demand", "flushing headache"]
+
+
+def synthetic_entities(count: int, seed: int = 7) -> List[Dict[str, str]]:
+    """Drug-like entity names with short clinical summaries."""
+    rng = random.Random(seed)
+    entities = []
+    for i in range(count):
+        name = rng.choice(PREFIXES) + rng.choice(MIDDLES) + rng.choice(SUFFIXES)
+        name = f"{name.capitalize()} {i}" if rng.random() < 0.9 else name.capitalize()
+        summary = " ".join(rng.choice(SUMMARY_WORDS) for _ in range(rng.randint(12, 40)))
+        entities.append({"name": name, "summary": f"{name} {rng.randint(5, 100)} mg. {summary}"})
+    return entities
+
+
+async def load_graph(driver, count: int, batch_size: int = 10000) -> List[Dict[str, str]]:
+    entities = synthetic_entities(count)
+    async with driver.session() as session:
+        for start in range(0, count, batch_size):
+            await session.run(
+                """
+                UNWIND $rows AS row
+                CREATE (n:Entity {
+                    uuid: randomUUID(), group_id: $group_id,
+                    name: row.name, summary: row.summary, created_at: datetime()
+                })
+                """,
+                rows=entities[start:start + batch_size],
+                group_id=GROUP_ID
+            )
+    return entities
+
+
+async def remove_graph(driver):
+    async with driver.session() as session:
+        await session.run(
+            """
+            MATCH (n:Entity {group_id: $group_id})
+            CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+            """,
+            group_id=GROUP_ID
+        )
+
+
+async def time_calls(fn: Callable[[str], Awaitable], args: List[str]) -> List[float]:
+    timings = []
+    for arg in args:
+        start = time.perf_counter()
+        await fn(arg)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: List[float]) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return f"p50 {statistics.median(ordered):8.2f} ms   p95 {p95:8.2f} ms"
+
+
+async def run_benchmark(args):
+    client = GraphitiClient()
+    driver = AsyncGraphDatabase.driver(client.neo4j_uri, auth=(client.neo4j_user, client.neo4j_password))
+
+    # Drive GraphitiClient's lookup methods with a plain Neo4j driver
+    client.graphiti = SimpleNamespace(driver=driver)
+    client._initialized = True
+
+    try:
+        print(f"  Loading {args.entities:,} synthetic entities...")
+        start = time.perf_counter()
+        entities = await load_graph(driver, args.entities)
+        print(f"  Loaded in {time.perf_counter() - start:.1f} s")
+
+        rng = random.Random(11)
+        sample = [rng.choice(entities)["name"] for _ in range(args.lookups)]
+        # Exact names, bare drug names and lowercase variants
+        names = [n if i % 3 == 0 else n.split()[0] if i % 3 == 1 else n.lower() for i, n in enumerate(sample)]
+        keywords = [KEYWORDS[i % len(KEYWORDS)] for i in range(args.lookups)]
+
+        results = {}
+
+        client._entity_indexes_ready = False
+        results["name lookup, scan"] = await time_calls(lambda n: client.get_entity_node_by_name(n, True), names)
+        results["keyword search, scan"] = await time_calls(lambda k: client.search_entities_by_type(k, 20), keywords)
+
+        start = time.perf_counter()
+        await client.ensure_entity_indexes()
+        async with driver.session() as session:
+            await session.run("CALL db.awaitIndexes(600)")
+        print(f"  Indexes built and name_lower backfilled in {time.perf_counter() - start:.1f} s")
+
+        if not client._entity_indexes_ready:
+            raise RuntimeError("Entity indexes could not be created")
+        results["name lookup, indexed"] = await time_calls(lambda n: client.get_entity_node_by_name(n, True), names)
+        results["keyword search, indexed"] = await time_calls(lambda k: client.search_entities_by_type(k, 20), keywords)
+
+        print()
+        for label, timings in results.items():
+            print(f"   {label:<26} {summarize(timings)}")
+
+    finally:
+        if not args.keep:
+            await remove_graph(driver)
+        await driver.close()
+
+
+def main():
+    """Run the benchmark and print lookup latency percentiles."""
+    parser = argparse.ArgumentParser(description="Benchmark Neo4j entity lookups: scan vs. indexes")
+    parser.add_argument("--entities", type=int, default=100000, help="Synthetic entities to create")
+    parser.add_argument("--lookups", type=int, default=100, help="Lookups timed per path")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic entities afterwards")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("🔎 NEO4J ENTITY LOOKUP: LABEL SCAN vs. FULL-TEXT/RANGE INDEXES")
+    print("=" * 70)
+    asyncio.run(run_benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
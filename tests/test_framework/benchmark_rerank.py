@@ -0,0 +1,293 @@
+"""
+Benchmark: chunk reranking latency vs. retrieval quality.
+
+For every generated test case the clinical query retrieves a wide candidate
+set (--candidates), each reranker reorders it, and the top --k chunks are
+scored against relevance labels:
+
+- Labels: chunks inside the CPG sections the case cites in
+  key_cpg_references. Each reference is resolved to markdown/ headings by
+  title words (or the section/algorithm number when it has no title), and
+  a chunk is relevant when its start or end falls inside such a section.
+  Labels do not depend on any reranker feature; cases whose references
+  match no heading are skipped.
+- First stage: by default a local hashed bag-of-words embedding over the
+  chunked markdown/ CPG files, so the benchmark runs offline. --db uses
+  the real embedding provider and the chunks table instead (requires
+  DATABASE_URL, the schema and embedding credentials).
+
+Reported per reranker: recall@k, nDCG@k, MRR@k and rerank latency (cold
+cache, then warm cache on a second pass). "none" keeps first-stage order,
+i.e. what the agent got before reranking.
+
+Usage:
+    python tests/test_framework/benchmark_rerank.py
+    python tests/test_framework/benchmark_rerank.py --candidates 60 --k 5
+    python tests/test_framework/benchmark_rerank.py --rerankers none,features,cross_encoder
+    python tests/test_framework/benchmark_rerank.py --db
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import asyncio
+import zlib
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+
+# Add parent dir to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+# db_utils/tools build their clients at import time; placeholders are enough
+# for the offline mode (no connection is opened)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+os.environ.setdefault("EMBEDDING_API_KEY", "benchmark")
+
+from agent.rerank import Reranker, FeatureReranker, CrossEncoderReranker, tokenize
+
+ROOT = Path(__file__).parent.parent.parent
+CASES_DIR = Path(__file__).parent / "generated_cases"
+
+DIMENSIONS = 768
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*$", re.MULTILINE)
+_REFERENCE = re.compile(r"^\s*(section|algorithm|appendix)\s*([\d.]*\d)?\s*[:\-]?\s*(.*)$", re.IGNORECASE)
+
+# Fraction of a reference's title words a heading must share to match it
+TITLE_MATCH = 0.5
+
+# Characters from each end of a chunk looked up in the cited sections
+CHUNK_PROBE = 80
+
+
+def load_cases(path: Path = None) -> List[Dict[str, Any]]:
+    """Load the newest (or given) generated test case file."""
+    if path is None:
+        files = sorted(CASES_DIR.glob("test_cases_*.json"))
+        if not files:
+            raise SystemExit(f"No test cases in {CASES_DIR}; run generate_test_cases.py first")
+        path = files[-1]
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["test_cases"]
+
+
+def chunk_markdown(chunk_size: int = 800, overlap: int = 100) -> List[Dict[str, Any]]:
+    """Split the CPG markdown files into overlapping chunks."""
+    chunks = []
+    for path in sorted((ROOT / "markdown").glob("*.md")):
+        text = path.read_text(encoding="utf-8")
+        for start in range(0, len(text), chunk_size - overlap):
+            content = text[start:start + chunk_size].strip()
+            if content:
+                chunks.append({
+                    "chunk_id": f"{path.stem}:{start}",
+                    "content": content,
+                    "document_title": path.stem
+                })
+    return chunks
+
+
+def hashed_embedding(text: str) -> np.ndarray:
+    """Feature-hashed unigram+bigram vector (offline stand-in for the embedding model)."""
+    tokens = tokenize(text)
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        h = zlib.crc32(feature.encode())
+        vector[h % DIMENSIONS] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def markdown_sections() -> List[Dict[str, Any]]:
+    """Every markdown/ heading with the text up to the next heading of the same or higher level."""
+    sections = []
+    for path in sorted((ROOT / "markdown").glob("*.md")):
+        text = path.read_text(encoding="utf-8")
+        headings = [(m.start(), len(m.group(1)), m.group(2)) for m in _HEADING.finditer(text)]
+        for i, (start, level, title) in enumerate(headings):
+            end = next((s for s, l, _ in headings[i + 1:] if l <= level), len(text))
+            sections.append({"title": title, "text": _normalize(text[start:end])})
+    return sections
+
+
+def resolve_reference(reference: str, sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sections a key_cpg_references entry points at."""
+    match = _REFERENCE.match(reference)
+    kind, number, title = (match.group(1).lower(), match.group(2), match.group(3)) if match else (None, None, reference)
+
+    terms = set(tokenize(title))
+    if terms:
+        # Best title-word overlap; the guideline numbering differs from the files'
+        scored = [(len(terms & set(tokenize(s["title"]))) / len(terms), s) for s in sections]
+        best = max(score for score, _ in scored)
+        return [s for score, s in scored if score == best and score >= TITLE_MATCH]
+
+    if number and kind == "algorithm":
+        return [s for s in sections if re.match(rf"algorithm {re.escape(number)}\b", s["title"].lower())]
+    if number:
+        return [
+            s for s in sections
+            if re.match(rf"(section |appendix )?{re.escape(number)}\b", s["title"].lower())
+        ]
+    return []
+
+
+def reference_labels(chunks: List[Dict[str, Any]], references: List[str], sections: List[Dict[str, Any]]) -> Dict[Any, float]:
+    """Binary relevance: chunks that start or end inside a cited section."""
+    cited = [s["text"] for reference in references for s in resolve_reference(reference, sections)]
+    labels = {}
+    for chunk in chunks:
+        content = _normalize(chunk["content"])
+        probes = (content[:CHUNK_PROBE], content[-CHUNK_PROBE:])
+        if any(probe in text for text in cited for probe in probes):
+            labels[chunk["chunk_id"]] = 1.0
+    return labels
+
+
+def quality(ranked_ids: List[Any], labels: Dict[Any, float], k: int) -> Dict[str, float]:
+    """recall@k, nDCG@k and MRR@k for one ranking."""
+    top = ranked_ids[:k]
+    hits = [chunk_id for chunk_id in top if chunk_id in labels]
+    dcg = sum(labels.get(chunk_id, 0.0) / math.log2(i + 2) for i, chunk_id in enumerate(top))
+    ideal = sum(g / math.log2(i + 2) for i, g in enumerate(sorted(labels.values(), reverse=True)[:k]))
+    first = next((i for i, chunk_id in enumerate(top) if chunk_id in labels), None)
+    return {
+        "recall": len(hits) / min(len(labels), k) if labels else 0.0,
+        "ndcg": dcg / ideal if ideal else 0.0,
+        "mrr": 1.0 / (first + 1) if first is not None else 0.0
+    }
+
+
+def offline_retriever(chunks: List[Dict[str, Any]]):
+    """Top-n cosine search over hashed embeddings of the markdown chunks."""
+    matrix = np.stack([hashed_embedding(c["content"]) for c in chunks])
+
+    async def retrieve(query: str, n: int) -> List[Dict[str, Any]]:
+        similarity = matrix @ hashed_embedding(query)
+        order = np.argsort(-similarity)[:n]
+        return [{**chunks[i], "similarity": float(similarity[i])} for i in order]
+
+    return retrieve
+
+
+async def db_corpus_and_retriever() -> Tuple[List[Dict[str, Any]], Any]:
+    """Chunks and vector search from the configured database and embedding provider."""
+    from agent.db_utils import db_pool, initialize_database, vector_search
+    from agent.tools import generate_embedding
+
+    await initialize_database()
+    async with db_pool.acquire() as conn:
+        rows = await conn.fetch("SELECT id, content FROM chunks")
+    chunks = [{"chunk_id": row["id"], "content": row["content"]} for row in rows]
+
+    async def retrieve(query: str, n: int) -> List[Dict[str, Any]]:
+        return await vector_search(embedding=await generate_embedding(query), limit=n)
+
+    return chunks, retrieve
+
+
+def build_rerankers(names: List[str]) -> Dict[str, Reranker]:
+    rerankers = {}
+    for name in names:
+        if name == "none":
+            rerankers[name] = Reranker()
+        elif name == "features":
+            rerankers[name] = FeatureReranker()
+        elif name == "cross_encoder":
+            try:
+                rerankers[name] = CrossEncoderReranker()
+            except Exception as e:
+                print(f"  (skipping cross_encoder: {type(e).__name__}: {e})")
+        else:
+            raise SystemExit(f"Unknown reranker '{name}'")
+    return rerankers
+
+
+async def run_benchmark(args) -> Dict[str, Dict[str, float]]:
+    cases = load_cases(Path(args.cases) if args.cases else None)
+
+    if args.db:
+        chunks, retrieve = await db_corpus_and_retriever()
+    else:
+        chunks = chunk_markdown()
+        retrieve = offline_retriever(chunks)
+
+    print(f"  Corpus: {len(chunks)} chunks  |  cases: {len(cases)}  |  candidates: {args.candidates}  |  k: {args.k}")
+
+    # Retrieval is shared; only the rerank stage is timed
+    sections = markdown_sections()
+    prepared = []
+    for case in cases:
+        labels = reference_labels(chunks, case.get("key_cpg_references", []), sections)
+        if not labels:
+            continue
+        candidates = await retrieve(case["clinical_query"], args.candidates)
+        prepared.append((case["clinical_query"], candidates, labels))
+
+    print(f"  Labelled cases: {len(prepared)}  |  relevant chunks per case: "
+          f"{statistics.mean(len(p[2]) for p in prepared):.1f}")
+
+    rerankers = build_rerankers(args.rerankers.split(","))
+    report = {}
+    for name, reranker in rerankers.items():
+        cold, warm = [], []
+        scores = {"recall": [], "ndcg": [], "mrr": []}
+        for query, candidates, labels in prepared:
+            start = time.perf_counter()
+            ranked = await reranker.rerank(query, candidates)
+            cold.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            await reranker.rerank(query, candidates)
+            warm.append((time.perf_counter() - start) * 1000)
+
+            for metric, value in quality([c["chunk_id"] for c in ranked], labels, args.k).items():
+                scores[metric].append(value)
+
+        report[name] = {
+            **{metric: statistics.mean(values) for metric, values in scores.items()},
+            "cold_ms": statistics.median(cold),
+            "warm_ms": statistics.median(warm)
+        }
+
+    if args.db:
+        from agent.db_utils import close_database
+        await close_database()
+
+    return report
+
+
+def main():
+    """Run the benchmark and print a quality/latency table."""
+    parser = argparse.ArgumentParser(description="Benchmark chunk rerankers: latency vs. retrieval quality")
+    parser.add_argument("--cases", help="Test case file (default: newest in generated_cases/)")
+    parser.add_argument("--candidates", type=int, default=40, help="Candidates retrieved per query")
+    parser.add_argument("--k", type=int, default=10, help="Final list size scored")
+    parser.add_argument("--rerankers", default="none,features,cross_encoder", help="Comma-separated rerankers")
+    parser.add_argument("--db", action="store_true", help="Use the database and embedding provider")
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("🔀 CHUNK RERANKING: LATENCY vs. RETRIEVAL QUALITY")
+    print("=" * 78)
+    report = asyncio.run(run_benchmark(args))
+
+    print(f"\n  {'reranker':<16}{'recall@k':>10}{'nDCG@k':>10}{'MRR@k':>8}{'cold ms':>10}{'warm ms':>10}")
+    for name, row in report.items():
+        print(f"  {name:<16}{row['recall']:10.3f}{row['ndcg']:10.3f}{row['mrr']:8.3f}"
+              f"{row['cold_ms']:10.2f}{row['warm_ms']:10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: time to first token (TTFT) of /chat/stream against a stub LLM.
+
+The agent model is replaced by a pydantic-ai FunctionModel that waits
+--model-ms before streaming its first token, so TTFT minus that delay is the
+overhead of the streaming pipeline itself (session, context, persistence).
+By default session resolution, context loading and message persistence are
+simulated with fixed latencies; --db runs them against the real database
+(requires DATABASE_URL and the schema).
+
+The stream is consumed straight from the endpoint's response iterator, so
+no HTTP client buffering is involved.
+
+Usage:
+    python tests/test_framework/benchmark_stream_ttft.py
+    python tests/test_framework/benchmark_stream_ttft.py --context-ms 20 --persist-ms 10 -n 50
+    python tests/test_framework/benchmark_stream_ttft.py --db
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List, Any
+
+# Add parent dir to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+# The API builds its clients at import time; placeholders are enough when
+# every external call is stubbed
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+os.environ.setdefault("LLM_API_KEY", "benchmark")
+os.environ.setdefault("EMBEDDING_API_KEY", "benchmark")
+
+from pydantic_ai.models.function import FunctionModel
+
+from agent import api
+from agent.agent import rag_agent
+from agent.models import ChatRequest
+
+
+def stub_model(first_token_ms: float, tokens: int, token_ms: float) -> FunctionModel:
+    """Streaming stub LLM: fixed delay to the first token, then a steady rate."""
+    async def stream(messages, info):
+        await asyncio.sleep(first_token_ms / 1000)
+        for i in range(tokens):
+            if i:
+                await asyncio.sleep(token_ms / 1000)
+            yield f"token{i} "
+
+    return FunctionModel(stream_function=stream)
+
+
+def simulate_backend(session_ms: float, context_ms: float, persist_ms: float):
+    """Replace DB-backed steps of the pipeline with fixed-latency stand-ins."""
+    async def resolve_session(request: ChatRequest) -> str:
+        await asyncio.sleep(session_ms / 1000)
+        return request.session_id or str(uuid.uuid4())
+
+    async def get_conversation_context(session_id: str, *args, **kwargs) -> List[Dict[str, str]]:
+        await asyncio.sleep(context_ms / 1000)
+        return [{"role": "user", "content": "earlier question"}, {"role": "assistant", "content": "earlier answer"}]
+
+    async def record(*args, **kwargs) -> str:
+        await asyncio.sleep(persist_ms / 1000)
+        return str(uuid.uuid4())
+
+    api.resolve_session = resolve_session
+    api.get_conversation_context = get_conversation_context
+    api.message_journal.record = record
+
+
+async def run_turn(session_id: str) -> Dict[str, Any]:
+    """Run one streamed turn and time its events."""
+    start = time.perf_counter()
+    response = await api.chat_stream(ChatRequest(message="What is the workup for chest pain?", session_id=session_id))
+
+    first_token_ms = None
+    server_ttft_ms = None
+    async for chunk in response.body_iterator:
+        event = json.loads(chunk[len("data: "):])
+        if event["type"] == "text" and first_token_ms is None:
+            first_token_ms = (time.perf_counter() - start) * 1000
+        elif event["type"] == "end":
+            server_ttft_ms = event.get("ttft_ms")
+        elif event["type"] == "error":
+            raise RuntimeError(event["content"])
+
+    return {
+        "ttft_ms": first_token_ms,
+        "server_ttft_ms": server_ttft_ms,
+        "total_ms": (time.perf_counter() - start) * 1000
+    }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_benchmark(args) -> List[Dict[str, Any]]:
+    if args.db:
+        from agent.db_utils import initialize_database, close_database, create_session
+        await initialize_database()
+        api.message_journal.start()
+        session_id = await create_session()
+    else:
+        simulate_backend(args.session_ms, args.context_ms, args.persist_ms)
+        session_id = str(uuid.uuid4())
+
+    results = []
+    try:
+        with rag_agent.override(model=stub_model(args.model_ms, args.tokens, args.token_ms)):
+            # Warm-up turn (imports, pool connections, caches)
+            await run_turn(session_id)
+            for _ in range(args.iterations):
+                results.append(await run_turn(session_id))
+    finally:
+        if args.db:
+            await api.message_journal.stop()
+            await close_database()
+
+    return results
+
+
+def main():
+    """Run the benchmark and print TTFT percentiles."""
+    parser = argparse.ArgumentParser(description="Benchmark /chat/stream time to first token")
+    parser.add_argument("--iterations", "-n", type=int, default=30, help="Streamed turns to time")
+    parser.add_argument("--model-ms", type=float, default=100.0, help="Stub LLM delay before its first token")
+    parser.add_argument("--tokens", type=int, default=20, help="Tokens streamed per turn")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Delay between tokens")
+    parser.add_argument("--session-ms", type=float, default=5.0, help="Simulated session validation latency")
+    parser.add_argument("--context-ms", type=float, default=15.0, help="Simulated context load latency")
+    parser.add_argument("--persist-ms", type=float, default=10.0, help="Simulated message write latency")
+    parser.add_argument("--db", action="store_true", help="Use the real database instead of simulated latencies")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+    ttfts = [r["ttft_ms"] for r in results]
+    totals = [r["total_ms"] for r in results]
+
+    print("=" * 70)
+    print("⏱  /chat/stream TIME TO FIRST TOKEN (stub LLM)")
+    print("=" * 70)
+    print(f"  Turns: {len(results)}  |  stub first-token delay: {args.model_ms:.0f} ms")
+    if not args.db:
+        serial_floor = args.session_ms + args.context_ms + args.persist_ms + args.model_ms
+        print(f"  Simulated session/context/persist: {args.session_ms:.0f}/{args.context_ms:.0f}/{args.persist_ms:.0f} ms"
+              f"  (fully serial pipeline floor: {serial_floor:.0f} ms)")
+    print(f"\n   TTFT p50:        {statistics.median(ttfts):8.1f} ms")
+    print(f"   TTFT p95:        {percentile(ttfts, 95):8.1f} ms")
+    print(f"   TTFT mean:       {statistics.mean(ttfts):8.1f} ms")
+    print(f"   Pipeline overhead (p50 - stub delay): {statistics.median(ttfts) - args.model_ms:8.1f} ms")
+    print(f"   Turn total p50:  {statistics.median(totals):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
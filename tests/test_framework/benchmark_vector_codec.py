@@ -0,0 +1,129 @@
+"""
+Micro-benchmark: text vs binary encoding of pgvector embeddings.
+
+Compares the old '[' + ','.join(map(str, embedding)) + ']' text format with
+the binary codec registered on DatabasePool connections. With --db it also
+times a round-trip through PostgreSQL (requires DATABASE_URL and pgvector).
+
+Usage:
+    python tests/test_framework/benchmark_vector_codec.py
+    python tests/test_framework/benchmark_vector_codec.py --db --iterations 2000
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, Any
+
+import numpy as np
+
+# Add parent dir to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+# db_utils builds its global pool object at import time; a placeholder URL is
+# enough for the encode-only benchmark (no connection is opened)
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/benchmark")
+
+from agent.db_utils import encode_vector, decode_vector, _init_connection
+
+
+def encode_text(embedding) -> str:
+    """Previous text encoding used by db_utils and ingestion."""
+    return '[' + ','.join(map(str, embedding)) + ']'
+
+
+def time_call(fn: Callable, arg, iterations: int) -> float:
+    """Return mean microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run_encoding_benchmark(dimensions: int, iterations: int) -> Dict[str, Any]:
+    """Benchmark client-side encoding for one embedding size."""
+    as_list = [random.uniform(-1, 1) for _ in range(dimensions)]
+    as_array = np.asarray(as_list, dtype=np.float32)
+
+    text_payload = encode_text(as_list)
+    binary_payload = encode_vector(as_list)
+
+    return {
+        "dimensions": dimensions,
+        "text_encode_us": time_call(encode_text, as_list, iterations),
+        "binary_encode_list_us": time_call(encode_vector, as_list, iterations),
+        "binary_encode_numpy_us": time_call(encode_vector, as_array, iterations),
+        "binary_decode_us": time_call(decode_vector, binary_payload, iterations),
+        "text_bytes": len(text_payload.encode()),
+        "binary_bytes": len(binary_payload),
+    }
+
+
+async def run_db_benchmark(dimensions: int, iterations: int) -> Dict[str, Any]:
+    """Benchmark a SELECT round-trip with each encoding."""
+    import asyncpg
+
+    embedding = [random.uniform(-1, 1) for _ in range(dimensions)]
+
+    text_conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    binary_conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        await _init_connection(binary_conn)
+
+        # Text path: server parses the literal; codec-free connection returns text
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await text_conn.fetchval("SELECT vector_dims($1::text::vector)", encode_text(embedding))
+        text_ms = (time.perf_counter() - start) / iterations * 1000
+
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await binary_conn.fetchval("SELECT vector_dims($1::vector)", embedding)
+        binary_ms = (time.perf_counter() - start) / iterations * 1000
+    finally:
+        await text_conn.close()
+        await binary_conn.close()
+
+    return {"dimensions": dimensions, "text_roundtrip_ms": text_ms, "binary_roundtrip_ms": binary_ms}
+
+
+def main():
+    """Run the benchmark and print a comparison table."""
+    parser = argparse.ArgumentParser(description="Benchmark pgvector text vs binary encoding")
+    parser.add_argument("--iterations", "-n", type=int, default=5000, help="Iterations per measurement")
+    parser.add_argument("--dims", type=int, nargs="+", default=[768, 1536], help="Embedding sizes to test")
+    parser.add_argument("--db", action="store_true", help="Also time a round-trip through PostgreSQL")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("📐 PGVECTOR ENCODING BENCHMARK (client side, mean per call)")
+    print("=" * 70)
+
+    for dims in args.dims:
+        r = run_encoding_benchmark(dims, args.iterations)
+        speedup = r["text_encode_us"] / r["binary_encode_list_us"]
+        print(f"\n  {dims} dimensions")
+        print(f"   Text encode (list):     {r['text_encode_us']:8.1f} µs  ({r['text_bytes']} bytes)")
+        print(f"   Binary encode (list):   {r['binary_encode_list_us']:8.1f} µs  ({r['binary_bytes']} bytes)")
+        print(f"   Binary encode (numpy):  {r['binary_encode_numpy_us']:8.1f} µs")
+        print(f"   Binary decode:          {r['binary_decode_us']:8.1f} µs")
+        print(f"   Encode speedup (list):  {speedup:8.1f}x")
+
+    if args.db:
+        print("\n" + "=" * 70)
+        print("🗄  DATABASE ROUND-TRIP (includes server-side parsing)")
+        print("=" * 70)
+        db_iterations = min(args.iterations, 1000)
+        for dims in args.dims:
+            r = asyncio.run(run_db_benchmark(dims, db_iterations))
+            print(f"\n  {dims} dimensions ({db_iterations} queries)")
+            print(f"   Text:    {r['text_roundtrip_ms']:.3f} ms/query")
+            print(f"   Binary:  {r['binary_roundtrip_ms']:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()